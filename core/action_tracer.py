@@ -0,0 +1,287 @@
+"""
+操作时间线追踪
+为每个用例记录Playwright操作、断言、导航和等待的时间段（开始、耗时、选择器、结果），
+写入本次执行的追踪文件，报告中按用例绘制时间线，用于定位耗时较长的用例把时间花在了哪里
+
+@File  : action_tracer.py
+@Author: shenyuan
+"""
+import functools
+import json
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+import yaml
+
+from core.run_context import get_worker_id, strip_xdist_group
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
+# 需要追踪的Playwright方法：{类名: {方法名: 类型}}
+# 类型：action（页面操作）/ navigation（导航）/ wait（等待）/ expect（断言）
+TRACED_METHODS = {
+    'Locator': {
+        'click': 'action', 'dblclick': 'action', 'fill': 'action', 'press': 'action', 'type': 'action',
+        'check': 'action', 'uncheck': 'action', 'hover': 'action', 'select_option': 'action',
+        'set_input_files': 'action', 'inner_text': 'action', 'text_content': 'action',
+        'wait_for': 'wait',
+    },
+    'Page': {
+        'goto': 'navigation', 'reload': 'navigation', 'go_back': 'navigation', 'go_forward': 'navigation',
+        'wait_for_url': 'navigation', 'wait_for_load_state': 'navigation',
+        'click': 'action', 'dblclick': 'action', 'fill': 'action', 'press': 'action',
+        'wait_for_selector': 'wait', 'wait_for_timeout': 'wait', 'screenshot': 'action',
+    },
+}
+
+# 单个用例最多记录的时间段数（超出后只计数，避免死循环轮询撑大追踪文件）
+DEFAULT_MAX_SPANS = 2000
+
+# 追踪文件中每个时间段的字段顺序（按数组保存，文件更紧凑）
+SPAN_FIELDS = ('name', 'target', 'start_ms', 'duration_ms', 'ok', 'depth', 'kind')
+
+_SELECTOR_PATTERN = re.compile(r"selector='(.*)'>$")
+
+_installed = False
+
+
+class ActionTrace:
+    """单个用例的追踪记录"""
+
+    def __init__(self, nodeid: str, attempt: int = 1, max_spans: int = DEFAULT_MAX_SPANS):
+        """初始化追踪记录
+
+        Args:
+            nodeid: 用例nodeid
+            attempt: 第几次执行（重试时递增）
+            max_spans: 最多记录的时间段数
+        """
+        self.nodeid = strip_xdist_group(nodeid)
+        self.attempt = attempt
+        self.max_spans = max_spans
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self.spans: List[list] = []
+        self.dropped = 0
+        self._depth = 0
+
+    def open(self, name: str, target: str, kind: str) -> Optional[list]:
+        """开始一个时间段
+
+        Returns:
+            时间段（传给close），超出上限时返回None
+        """
+        if len(self.spans) >= self.max_spans:
+            self.dropped += 1
+            return None
+        span = [name, target[:200], round((time.perf_counter() - self._origin) * 1000, 1), 0.0, 1, self._depth, kind]
+        self.spans.append(span)
+        self._depth += 1
+        return span
+
+    def close(self, span: Optional[list], ok: bool):
+        """结束一个时间段"""
+        if span is None:
+            return
+        self._depth = max(self._depth - 1, 0)
+        span[3] = round((time.perf_counter() - self._origin) * 1000 - span[2], 1)
+        span[4] = 1 if ok else 0
+
+    def to_record(self) -> Dict[str, Any]:
+        """转换为追踪文件中的一行"""
+        return {
+            'nodeid': self.nodeid,
+            'attempt': self.attempt,
+            'worker': get_worker_id(),
+            'started_at': round(self.started_at, 3),
+            'duration_ms': round((time.perf_counter() - self._origin) * 1000, 1),
+            'dropped': self.dropped,
+            'spans': self.spans
+        }
+
+
+def _trace_of(obj) -> Optional[ActionTrace]:
+    """获取对象（Page或Locator）所属页面当前的追踪记录"""
+    page = obj if type(obj).__name__ == 'Page' else getattr(obj, 'page', None)
+    return getattr(page, '_webui_trace', None)
+
+
+def _describe(obj, args: tuple) -> str:
+    """生成时间段的目标描述：定位器取选择器，页面方法取第一个参数（选择器、URL或时长）"""
+    if type(obj).__name__ == 'Locator':
+        match = _SELECTOR_PATTERN.search(repr(obj))
+        return match.group(1) if match else repr(obj)
+    return str(args[0]) if args else ''
+
+
+def _traced(method, name: str, kind: str):
+    """包装一个Playwright方法：页面没有追踪记录时直接调用，开销只有一次属性查找"""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        trace = _trace_of(self)
+        if trace is None:
+            return await method(self, *args, **kwargs)
+        span = trace.open(name, _describe(self, args), kind)
+        try:
+            result = await method(self, *args, **kwargs)
+        except BaseException:
+            trace.close(span, False)
+            raise
+        trace.close(span, True)
+        return result
+    wrapper.__webui_traced__ = True
+    return wrapper
+
+
+def install_tracing():
+    """在Playwright的Page/Locator类上安装追踪包装（每个进程只安装一次）"""
+    global _installed
+    if _installed:
+        return
+    from playwright import async_api
+    for class_name, methods in TRACED_METHODS.items():
+        cls = getattr(async_api, class_name)
+        for method_name, kind in methods.items():
+            method = getattr(cls, method_name, None)
+            if method is None or getattr(method, '__webui_traced__', False):
+                continue
+            setattr(cls, method_name, _traced(method, f"{class_name.lower()}.{method_name}", kind))
+    _installed = True
+
+
+@asynccontextmanager
+async def trace_span(page, name: str, target: str = '', kind: str = 'action'):
+    """手动记录一个时间段（用于断言、页面稳定等待等非Playwright方法）
+
+    Args:
+        page: 当前页面（没有追踪记录时不记录）
+        name: 名称（如 expect.to_be_visible）
+        target: 目标描述
+        kind: 类型
+    """
+    trace = getattr(page, '_webui_trace', None)
+    if trace is None:
+        yield
+        return
+    span = trace.open(name, target, kind)
+    try:
+        yield
+    except BaseException:
+        trace.close(span, False)
+        raise
+    trace.close(span, True)
+
+
+class ActionTracer:
+    """操作追踪器（每个进程一个实例）
+
+    配置（config/settings.yaml 的 execution.action_tracing）：
+    - enabled: 是否启用（默认启用，没有追踪记录的页面几乎没有额外开销）
+    - max_spans: 单个用例最多记录的时间段数
+
+    追踪文件与结果流放在一起：<结果流文件名>.trace.<worker>.jsonl，每个用例一行，
+    每个worker写自己的文件，不需要加锁。
+    """
+
+    def __init__(self, trace_path: Path, max_spans: int = DEFAULT_MAX_SPANS):
+        """初始化追踪器
+
+        Args:
+            trace_path: 本进程的追踪文件路径
+            max_spans: 单个用例最多记录的时间段数
+        """
+        self.trace_path = Path(trace_path)
+        self.max_spans = max_spans
+        install_tracing()
+
+    @classmethod
+    def from_config(cls, stream_path: Optional[str], config_path: str = "config/settings.yaml") -> Optional['ActionTracer']:
+        """根据配置创建追踪器
+
+        Args:
+            stream_path: 本次执行的结果流路径（追踪文件放在同一目录），为None时不追踪
+            config_path: 配置文件路径
+
+        Returns:
+            追踪器实例，未启用或没有结果流时返回None
+        """
+        if not stream_path:
+            return None
+        config_file = Path(config_path)
+        config = {}
+        if config_file.exists():
+            with open(config_file, 'r', encoding='utf-8') as f:
+                config = yaml.safe_load(f) or {}
+        tracing_config = config.get('execution', {}).get('action_tracing', {}) or {}
+        if not tracing_config.get('enabled', True):
+            return None
+        return cls(trace_file_for(stream_path, get_worker_id()), tracing_config.get('max_spans', DEFAULT_MAX_SPANS))
+
+    def start(self, page, nodeid: str, attempt: int = 1) -> ActionTrace:
+        """开始追踪一个用例（追踪记录挂在页面上）
+
+        Args:
+            page: 用例使用的页面
+            nodeid: 用例nodeid
+            attempt: 第几次执行
+
+        Returns:
+            追踪记录
+        """
+        trace = ActionTrace(nodeid, attempt=attempt, max_spans=self.max_spans)
+        page._webui_trace = trace
+        return trace
+
+    def finish(self, page, trace: ActionTrace):
+        """结束追踪并写入追踪文件
+
+        Args:
+            page: 用例使用的页面
+            trace: start() 返回的追踪记录
+        """
+        if page is not None and getattr(page, '_webui_trace', None) is trace:
+            page._webui_trace = None
+        try:
+            self.trace_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.trace_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(trace.to_record(), ensure_ascii=False, separators=(',', ':')) + '\n')
+        except OSError as e:
+            logger.warning(f"[Tracer] 写入追踪文件失败: {e}")
+
+
+def trace_file_for(stream_path: str, worker: str) -> Path:
+    """结果流对应的追踪文件路径"""
+    stream = Path(stream_path)
+    return stream.with_name(f"{stream.stem}.trace.{worker}.jsonl")
+
+
+def load_traces(stream_path: str) -> Dict[str, Dict[str, Any]]:
+    """读取结果流对应的所有追踪文件（重试的用例保留最后一次执行）
+
+    Args:
+        stream_path: 结果流路径
+
+    Returns:
+        {nodeid: 追踪记录}，时间段转换为字典
+    """
+    stream = Path(stream_path)
+    traces: Dict[str, Dict[str, Any]] = {}
+    for trace_file in sorted(stream.parent.glob(f"{stream.stem}.trace.*.jsonl")):
+        with open(trace_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                previous = traces.get(record['nodeid'])
+                if previous and previous['attempt'] > record.get('attempt', 1):
+                    continue
+                record['spans'] = [dict(zip(SPAN_FIELDS, span)) for span in record.get('spans', [])]
+                traces[record['nodeid']] = record
+    return traces
@@ -0,0 +1,375 @@
+"""
+产物存储与清理
+截图按内容哈希保存（相同的截图只保存一份），索引记录每张截图属于哪次执行、哪个用例和步骤；
+按保留策略（最长保留天数、总大小上限、失败用例保留更久）清理截图、视频和报告，
+可以在控制台手动执行，也可以由测试调度器定时执行
+
+@File  : artifact_store.py
+@Author: shenyuan
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+import yaml
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
+# 失败用例产物（视频、追踪文件等）的文件名标记（见 VideoRecorder.path_for、TraceRecorder.path_for），清理时保留更久
+FAILED_MARKER = '_FAILED'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    blob TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    blob TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    nodeid TEXT NOT NULL,
+    step TEXT NOT NULL,
+    failed INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_blob ON artifacts (blob);
+CREATE INDEX IF NOT EXISTS idx_artifacts_test ON artifacts (run_id, nodeid);
+"""
+
+_store_lock = threading.Lock()
+_default_store: Optional['ArtifactStore'] = None
+_default_store_loaded = False
+
+
+def _load_config(config_path: str) -> dict:
+    """读取 settings.yaml 的 artifacts 配置"""
+    config_file = Path(config_path)
+    if not config_file.exists():
+        return {}
+    with open(config_file, 'r', encoding='utf-8') as f:
+        return (yaml.safe_load(f) or {}).get('artifacts', {}) or {}
+
+
+class ArtifactStore:
+    """内容寻址的产物存储
+
+    - 文件按内容的sha256保存在 <dir>/blobs/<前两位>/<哈希><扩展名>，内容相同的产物只保存一份
+    - 索引（SQLite）记录 执行/用例/步骤 -> 文件，并行worker共用同一个存储
+    - 清理时先删除过期的索引记录，再删除没有任何记录引用的文件
+    """
+
+    def __init__(self, store_dir: str = "artifacts"):
+        """初始化存储
+
+        Args:
+            store_dir: 存储目录
+        """
+        self.store_dir = Path(store_dir)
+        self.blob_dir = self.store_dir / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.store_dir / "index.db"
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """打开一个连接，正常结束时提交，异常时回滚"""
+        conn = sqlite3.connect(str(self.db_path), timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        """计算内容哈希"""
+        return hashlib.sha256(data).hexdigest()
+
+    def blob_path(self, digest: str, extension: str) -> Path:
+        """内容哈希对应的文件路径（按前两位分目录，避免单个目录文件过多）
+
+        Args:
+            digest: 内容哈希
+            extension: 扩展名（如 .jpg）
+
+        Returns:
+            文件路径（目录已创建）
+        """
+        path = self.blob_dir / digest[:2] / f"{digest}{extension}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def put_bytes(self, data: bytes, extension: str, kind: str, step: str = '',
+                  nodeid: str = '', run_id: str = '') -> Path:
+        """保存内容并记录索引（内容已存在时只记录索引）
+
+        Args:
+            data: 文件内容
+            extension: 扩展名
+            kind: 产物类型（如 screenshot）
+            step: 步骤名称
+            nodeid: 用例nodeid
+            run_id: 执行标识
+
+        Returns:
+            文件路径
+        """
+        digest = self.digest(data)
+        path = self.blob_path(digest, extension)
+        if not path.exists():
+            # 先写临时文件再替换，并行worker不会读到写了一半的文件
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        self.register(digest, path, kind, step=step, nodeid=nodeid, run_id=run_id)
+        return path
+
+    def register(self, digest: str, path: Path, kind: str, step: str = '', nodeid: str = '', run_id: str = ''):
+        """记录一个已写入存储目录的文件（由调用方按 blob_path 写入）
+
+        Args:
+            digest: 内容哈希
+            path: 文件路径
+            kind: 产物类型
+            step: 步骤名称
+            nodeid: 用例nodeid
+            run_id: 执行标识
+        """
+        now = time.time()
+        size = path.stat().st_size if path.exists() else 0
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO blobs (blob, path, size, created_at) VALUES (?, ?, ?, ?)",
+                (digest, str(path.relative_to(self.store_dir)), size, now)
+            )
+            conn.execute(
+                "INSERT INTO artifacts (blob, kind, run_id, nodeid, step, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, kind, run_id, nodeid, step, now)
+            )
+
+    def mark_failed(self, nodeid: str, run_id: str = ''):
+        """标记用例失败（失败用例的产物按 failed_max_age_days 保留）
+
+        Args:
+            nodeid: 用例nodeid
+            run_id: 执行标识
+        """
+        with self._connect() as conn:
+            conn.execute("UPDATE artifacts SET failed = 1 WHERE nodeid = ? AND run_id = ?", (nodeid, run_id))
+
+    def artifacts_for(self, nodeid: str, run_id: str = '') -> List[Dict[str, Any]]:
+        """查询用例的产物
+
+        Args:
+            nodeid: 用例nodeid
+            run_id: 执行标识
+
+        Returns:
+            [{kind, step, path, failed, created_at}]，按记录时间排序
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT a.kind, a.step, b.path, a.failed, a.created_at FROM artifacts a "
+                "JOIN blobs b ON a.blob = b.blob WHERE a.nodeid = ? AND a.run_id = ? ORDER BY a.id",
+                (nodeid, run_id)
+            ).fetchall()
+        return [{**dict(row), 'path': str(self.store_dir / row['path'])} for row in rows]
+
+    def usage(self) -> Dict[str, int]:
+        """存储占用
+
+        Returns:
+            {blobs, artifacts, size}（artifacts 大于 blobs 的部分就是去重节省的文件数）
+        """
+        with self._connect() as conn:
+            blobs, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            artifacts = conn.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
+        return {'blobs': blobs, 'artifacts': artifacts, 'size': size}
+
+    def gc(self, max_age_days: float = 14, failed_max_age_days: float = 60,
+           max_total_mb: float = 2048) -> Dict[str, int]:
+        """按保留策略清理
+
+        1. 删除超过保留天数的索引记录（失败用例按 failed_max_age_days）
+        2. 总大小仍超出上限时，按时间从旧到新继续删除（先删通过用例的记录）
+        3. 删除没有任何记录引用的文件（包括缩略图等同名文件）
+
+        Args:
+            max_age_days: 通过用例产物的保留天数
+            failed_max_age_days: 失败用例产物的保留天数
+            max_total_mb: 总大小上限（MB）
+
+        Returns:
+            {removed_files, freed_bytes}
+        """
+        now = time.time()
+        max_bytes = max_total_mb * 1024 * 1024
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM artifacts WHERE (failed = 0 AND created_at < ?) OR (failed = 1 AND created_at < ?)",
+                (now - max_age_days * 86400, now - failed_max_age_days * 86400)
+            )
+            total = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM blobs WHERE blob IN (SELECT blob FROM artifacts)"
+            ).fetchone()[0]
+            if total > max_bytes:
+                # 每个文件以最后一次被引用的时间为准，通过用例的文件优先删除
+                rows = conn.execute(
+                    "SELECT b.blob, b.size, MAX(a.failed) AS failed, MAX(a.created_at) AS last_used "
+                    "FROM blobs b JOIN artifacts a ON a.blob = b.blob GROUP BY b.blob ORDER BY failed, last_used"
+                ).fetchall()
+                dropped = []
+                for row in rows:
+                    if total <= max_bytes:
+                        break
+                    dropped.append((row['blob'],))
+                    total -= row['size']
+                conn.executemany("DELETE FROM artifacts WHERE blob = ?", dropped)
+            orphans = conn.execute(
+                "SELECT blob, path, size FROM blobs WHERE blob NOT IN (SELECT blob FROM artifacts)"
+            ).fetchall()
+            conn.executemany("DELETE FROM blobs WHERE blob = ?", [(row['blob'],) for row in orphans])
+
+        removed_files, freed_bytes = 0, 0
+        for row in orphans:
+            path = self.store_dir / row['path']
+            for file in path.parent.glob(f"{row['blob']}*"):
+                try:
+                    freed_bytes += file.stat().st_size
+                    file.unlink()
+                    removed_files += 1
+                except OSError:
+                    pass
+        return {'removed_files': removed_files, 'freed_bytes': freed_bytes}
+
+
+def get_artifact_store(config_path: str = "config/settings.yaml") -> Optional[ArtifactStore]:
+    """本进程共用的产物存储（artifacts.enabled 为false时返回None）
+
+    Args:
+        config_path: 配置文件路径
+
+    Returns:
+        存储实例或None
+    """
+    global _default_store, _default_store_loaded
+    with _store_lock:
+        if not _default_store_loaded:
+            _default_store_loaded = True
+            config = _load_config(config_path)
+            if config.get('enabled', True):
+                try:
+                    _default_store = ArtifactStore(config.get('dir', 'artifacts'))
+                except (OSError, sqlite3.Error) as e:
+                    logger.warning(f"[ArtifactStore] 无法打开产物存储，截图按普通文件保存: {e}")
+        return _default_store
+
+
+def clean_directory(directory: str, max_age_days: float, failed_max_age_days: float,
+                    max_total_mb: float, failed_marker: str = FAILED_MARKER) -> Dict[str, int]:
+    """按保留策略清理普通目录（视频、追踪文件、报告）
+
+    文件名包含 failed_marker 的文件按 failed_max_age_days 保留；总大小超出上限时从最旧的文件开始删除。
+
+    Args:
+        directory: 目录
+        max_age_days: 保留天数
+        failed_max_age_days: 失败产物的保留天数
+        max_total_mb: 总大小上限（MB）
+        failed_marker: 失败产物的文件名标记
+
+    Returns:
+        {removed_files, freed_bytes}
+    """
+    root = Path(directory)
+    if not root.exists():
+        return {'removed_files': 0, 'freed_bytes': 0}
+    now = time.time()
+    files = []
+    for path in root.rglob('*'):
+        try:
+            if path.is_file():
+                stat = path.stat()
+                files.append((stat.st_mtime, stat.st_size, failed_marker in path.name, path))
+        except OSError:
+            continue
+
+    removed_files, freed_bytes = 0, 0
+    kept = []
+    for mtime, size, failed, path in files:
+        max_age = failed_max_age_days if failed else max_age_days
+        if now - mtime > max_age * 86400:
+            try:
+                path.unlink()
+                removed_files += 1
+                freed_bytes += size
+            except OSError:
+                pass
+        else:
+            kept.append((failed, mtime, size, path))
+
+    total = sum(item[2] for item in kept)
+    max_bytes = max_total_mb * 1024 * 1024
+    # 通过的产物在前、同类按时间从旧到新
+    for failed, mtime, size, path in sorted(kept, key=lambda item: (item[0], item[1])):
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+            removed_files += 1
+            freed_bytes += size
+            total -= size
+        except OSError:
+            pass
+    return {'removed_files': removed_files, 'freed_bytes': freed_bytes}
+
+
+def run_retention(config_path: str = "config/settings.yaml") -> Dict[str, Dict[str, int]]:
+    """执行一次保留策略清理（控制台按钮和调度任务调用）
+
+    配置（config/settings.yaml 的 artifacts.retention）：
+    - max_age_days / failed_max_age_days：保留天数
+    - max_total_mb：产物存储的总大小上限
+    - directories：同时清理的普通目录及其大小上限，如 {videos: 2048, reports: 512}
+
+    Args:
+        config_path: 配置文件路径
+
+    Returns:
+        {目录: {removed_files, freed_bytes}}
+    """
+    config = _load_config(config_path)
+    retention = config.get('retention', {}) or {}
+    max_age_days = float(retention.get('max_age_days', 14))
+    failed_max_age_days = float(retention.get('failed_max_age_days', 60))
+    results = {}
+
+    store = ArtifactStore(config.get('dir', 'artifacts')) if config.get('enabled', True) else None
+    if store:
+        results[str(store.store_dir)] = store.gc(
+            max_age_days, failed_max_age_days, float(retention.get('max_total_mb', 2048))
+        )
+    for directory, max_total_mb in (retention.get('directories') or {}).items():
+        results[directory] = clean_directory(directory, max_age_days, failed_max_age_days, float(max_total_mb))
+
+    removed = sum(item['removed_files'] for item in results.values())
+    freed = sum(item['freed_bytes'] for item in results.values())
+    logger.info(f"[ArtifactStore] 清理完成：删除 {removed} 个文件，释放 {freed / 1024 / 1024:.1f}MB")
+    return results
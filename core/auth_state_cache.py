@@ -0,0 +1,106 @@
+"""
+登录态缓存
+登录一次后保存Playwright storage_state（cookies + localStorage），后续测试的上下文直接注入，避免每个用例重复走登录流程
+
+@File  : auth_state_cache.py
+@Author: shenyuan
+"""
+import hashlib
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+import yaml
+
+from core.environment_manager import EnvironmentManager
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
+
+class AuthStateCache:
+    """登录态缓存
+
+    缓存文件按"环境登录URL + 用户名"区分，超过有效期（login.state_ttl_minutes）
+    或检测到401/被重定向回登录页时失效。
+    """
+
+    def __init__(self, config_path: str = "config/settings.yaml", cache_dir: str = "temp/auth_state"):
+        """初始化登录态缓存
+
+        Args:
+            config_path: 配置文件路径
+            cache_dir: 缓存文件目录
+        """
+        self.config = self._load_config(config_path)
+        login_config = self.config.get('login', {})
+
+        # 优先使用当前环境配置，其次使用login配置
+        env = EnvironmentManager(config_path).get_current_environment()
+        self.login_url = env.get('login_url') or login_config.get('url', '')
+        self.username = env.get('username') or login_config.get('username', '')
+        self.ttl_seconds = float(login_config.get('state_ttl_minutes', 30)) * 60
+
+        self.cache_dir = Path(cache_dir)
+        key = hashlib.sha1(f"{self.login_url}|{self.username}".encode('utf-8')).hexdigest()[:16]
+        self.state_path = self.cache_dir / f"storage_state_{key}.json"
+
+    def _load_config(self, config_path: str) -> dict:
+        """加载配置文件"""
+        config_file = Path(config_path)
+        if not config_file.exists():
+            return {}
+
+        with open(config_file, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+
+    def get_valid_state_path(self) -> Optional[str]:
+        """获取仍在有效期内的登录态文件路径
+
+        Returns:
+            storage_state 文件路径，不存在或已过期时返回None
+        """
+        try:
+            age = time.time() - self.state_path.stat().st_mtime
+        except OSError:
+            return None
+
+        if self.ttl_seconds > 0 and age > self.ttl_seconds:
+            logger.info(f"[AuthState] 登录态已过期（{age:.0f}s），需要重新登录")
+            self.invalidate()
+            return None
+        return str(self.state_path)
+
+    async def save(self, context) -> Optional[str]:
+        """保存上下文的登录态
+
+        Args:
+            context: 已登录的 BrowserContext
+
+        Returns:
+            保存的文件路径，失败时返回None
+        """
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # 先写临时文件再替换，避免并行worker读到写了一半的文件
+            tmp_path = self.state_path.with_suffix(f".{os.getpid()}.tmp")
+            await context.storage_state(path=str(tmp_path))
+            os.replace(tmp_path, self.state_path)
+            logger.info(f"[AuthState] 登录态已缓存: {self.state_path}")
+            return str(self.state_path)
+        except Exception as e:
+            logger.warning(f"[AuthState] 保存登录态失败: {e}")
+            return None
+
+    def invalidate(self):
+        """删除缓存的登录态"""
+        try:
+            self.state_path.unlink()
+            logger.info("[AuthState] 登录态缓存已失效")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"[AuthState] 删除登录态缓存失败: {e}")
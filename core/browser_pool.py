@@ -0,0 +1,221 @@
+"""
+浏览器与上下文池
+每个worker只启动一次Playwright和浏览器进程，按测试分发预热好的BrowserContext
+
+@File  : browser_pool.py
+@Author: shenyuan
+"""
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional, List
+
+import yaml
+from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright
+
+from core.run_context import get_env_flag
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
+
+class BrowserPool:
+    """会话级浏览器池
+
+    - 整个会话（每个xdist worker）只有一个 async_playwright() 实例和一个浏览器进程
+    - 预先创建若干个空白 BrowserContext，测试开始时直接取用，结束后关闭并在后台补充
+    - 带有创建期参数（如视频录制）的上下文无法复用预热实例，会按需新建
+    """
+
+    def __init__(self, config_path: str = "config/settings.yaml", size: Optional[int] = None):
+        """初始化浏览器池
+
+        Args:
+            config_path: 配置文件路径
+            size: 预热上下文数量，为None时读取 playwright.context_pool.size
+        """
+        self.config = self._load_config(config_path)
+        pool_config = self.config.get('playwright', {}).get('context_pool', {}) or {}
+        self.size = pool_config.get('size', 2) if size is None else size
+        self.playwright: Optional[Playwright] = None
+        self.browser: Optional[Browser] = None
+        self._idle: List[BrowserContext] = []
+        self._refill_task: Optional[asyncio.Task] = None
+        # 所有新建上下文共用的附加参数（例如登录态 storage_state）
+        self.context_defaults: dict = {}
+
+    def _load_config(self, config_path: str) -> dict:
+        """加载配置文件"""
+        config_file = Path(config_path)
+        if not config_file.exists():
+            raise FileNotFoundError(f"配置文件不存在: {config_path}")
+
+        with open(config_file, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f)
+
+    @property
+    def is_started(self) -> bool:
+        """浏览器是否已启动"""
+        return self.browser is not None and self.browser.is_connected()
+
+    async def start(self):
+        """启动Playwright和浏览器，并预热上下文"""
+        if self.is_started:
+            return
+
+        self.playwright = await async_playwright().start()
+        logger.info("[POOL] Playwright 已启动")
+
+        playwright_config = self.config['playwright']
+        browser_type = getattr(self.playwright, playwright_config['browser'])
+        # WEBUI_HEADLESS 由控制台按本次执行传入，不再改写 settings.yaml（并行worker共享同一份配置）
+        headless = get_env_flag('WEBUI_HEADLESS', playwright_config['headless'])
+        self.browser = await browser_type.launch(
+            headless=headless,
+            slow_mo=playwright_config['slow_mo']
+        )
+        logger.info(f"[POOL] 浏览器已启动，预热上下文数量: {self.size}")
+
+        await self._refill()
+
+    def build_context_options(self, extra_options: Optional[dict] = None) -> dict:
+        """构建创建上下文的参数（视口或移动设备模拟 + 附加参数）
+
+        Args:
+            extra_options: 额外的上下文参数（如视频录制 record_video_dir 等）
+
+        Returns:
+            new_context 使用的参数字典
+        """
+        context_options = {}
+
+        # 添加视频录制等额外选项（如果提供）
+        if extra_options:
+            context_options.update(extra_options)
+
+        # 检查是否启用移动端模式
+        device_config = self.config.get('playwright', {}).get('device', {})
+        if device_config.get('enabled', False):
+            # 使用移动设备模拟
+            device_name = device_config.get('name', 'iPhone 12')
+            device = self.playwright.devices.get(device_name) if self.playwright else None
+            if device:
+                # 合并设备配置和额外选项
+                context_options.update(device)
+            else:
+                # 如果设备不存在，使用自定义移动端配置
+                context_options.update({
+                    'viewport': {
+                        'width': device_config.get('width', 375),
+                        'height': device_config.get('height', 667)
+                    },
+                    'user_agent': device_config.get('user_agent', 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X)')
+                })
+        else:
+            # 桌面端模式
+            context_options.update({
+                'viewport': {
+                    'width': self.config['playwright']['viewport']['width'],
+                    'height': self.config['playwright']['viewport']['height']
+                }
+            })
+
+        # 公共默认参数优先级最低，不覆盖调用方传入的参数
+        for key, value in self.context_defaults.items():
+            context_options.setdefault(key, value)
+        return context_options
+
+    async def _new_context(self, extra_options: Optional[dict] = None) -> BrowserContext:
+        """创建一个新的上下文"""
+        if not self.is_started:
+            raise RuntimeError("浏览器池未启动，请先调用start()")
+        return await self.browser.new_context(**self.build_context_options(extra_options))
+
+    async def _refill(self):
+        """补充预热上下文到设定数量"""
+        while self.is_started and len(self._idle) < self.size:
+            try:
+                self._idle.append(await self._new_context())
+            except Exception as e:
+                logger.warning(f"[POOL] 预热上下文失败: {e}")
+                break
+
+    def _schedule_refill(self):
+        """在后台补充预热上下文，不阻塞当前测试"""
+        if self.size <= 0 or (self._refill_task and not self._refill_task.done()):
+            return
+        self._refill_task = asyncio.get_running_loop().create_task(self._refill())
+
+    async def acquire(self, extra_options: Optional[dict] = None) -> BrowserContext:
+        """获取一个上下文
+
+        Args:
+            extra_options: 创建期参数（如视频录制），提供时总是新建上下文
+
+        Returns:
+            可供单个测试独占使用的 BrowserContext
+        """
+        if not extra_options and self._idle:
+            context = self._idle.pop()
+            self._schedule_refill()
+            return context
+        return await self._new_context(extra_options)
+
+    async def release(self, context: Optional[BrowserContext]):
+        """归还上下文：关闭以保证测试隔离，并在后台补充预热实例
+
+        Args:
+            context: acquire() 获取的上下文
+        """
+        if context is not None:
+            try:
+                await context.close()
+            except Exception as e:
+                logger.warning(f"[POOL] 关闭上下文失败: {e}")
+        if self.is_started:
+            self._schedule_refill()
+
+    async def set_context_defaults(self, **options):
+        """更新所有新建上下文的公共参数，并丢弃参数已过期的预热上下文
+
+        Args:
+            **options: new_context 参数，值为None表示移除该参数
+        """
+        for key, value in options.items():
+            if value is None:
+                self.context_defaults.pop(key, None)
+            else:
+                self.context_defaults[key] = value
+        await self._drain()
+        self._schedule_refill()
+
+    async def _drain(self):
+        """关闭所有空闲的预热上下文"""
+        if self._refill_task and not self._refill_task.done():
+            try:
+                await self._refill_task
+            except Exception:
+                pass
+        idle, self._idle = self._idle, []
+        for context in idle:
+            try:
+                await context.close()
+            except Exception:
+                pass
+
+    async def close(self):
+        """关闭浏览器池"""
+        try:
+            await self._drain()
+        finally:
+            if self.browser:
+                try:
+                    await self.browser.close()
+                except Exception:
+                    pass
+                self.browser = None
+            if self.playwright:
+                await self.playwright.stop()
+                self.playwright = None
+            logger.info("[POOL] 浏览器池已关闭")
@@ -0,0 +1,127 @@
+"""
+HAR录制与回放
+录制模式下把每个用例的网络流量保存为HAR文件，回放模式下直接从HAR文件返回响应，
+不连接测试平台也能执行已录制的流程（用于离线验证控制台和框架本身的改动）
+
+@File  : har_archive.py
+@Author: shenyuan
+"""
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+import yaml
+
+from core.run_context import strip_xdist_group
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
+# 控制台通过该环境变量指定本次执行的HAR模式（off / record / replay），优先于配置文件
+HAR_MODE_ENV = 'WEBUI_HAR_MODE'
+
+
+class HarArchive:
+    """HAR录制与回放
+
+    配置（config/settings.yaml 的 playwright.har）：
+    - mode: off（默认）/ record / replay
+    - dir: HAR文件目录，每个用例一个文件：<dir>/<测试文件>/<用例名>.har
+    - url_filter: 只录制/回放匹配的地址（glob，如 "**/10.70.70.96/**"），为空时匹配所有请求
+    - not_found: 回放时HAR中没有的请求如何处理，fallback（走网络）或 abort（中止，完全离线）
+    - update_content: 录制时响应内容 embed（写入HAR）或 attach（单独保存为文件）
+    - update_mode: 录制内容 minimal（只保留回放需要的字段）或 full
+    """
+
+    MODES = ('off', 'record', 'replay')
+
+    def __init__(self, config_path: str = "config/settings.yaml"):
+        """初始化
+
+        Args:
+            config_path: 配置文件路径
+        """
+        har_config = self._load_config(config_path).get('playwright', {}).get('har', {}) or {}
+        mode = os.environ.get(HAR_MODE_ENV) or har_config.get('mode') or 'off'
+        if mode not in self.MODES:
+            logger.warning(f"[HAR] 未知的HAR模式 {mode}，按 off 处理")
+            mode = 'off'
+        self.mode = mode
+        self.har_dir = Path(har_config.get('dir', 'har'))
+        self.url_filter = har_config.get('url_filter') or None
+        self.not_found = har_config.get('not_found', 'fallback')
+        self.update_content = har_config.get('update_content', 'embed')
+        self.update_mode = har_config.get('update_mode', 'minimal')
+
+    @staticmethod
+    def _load_config(config_path: str) -> dict:
+        """加载配置文件"""
+        config_file = Path(config_path)
+        if not config_file.exists():
+            return {}
+
+        with open(config_file, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用录制或回放"""
+        return self.mode != 'off'
+
+    def path_for(self, nodeid: str) -> Path:
+        """用例对应的HAR文件路径
+
+        Args:
+            nodeid: pytest nodeid（如 test_cases/simulate/test_x.py::TestX::test_a[param]）
+
+        Returns:
+            HAR文件路径（不同worker、重试使用同一个文件，回放时可以直接找到）
+        """
+        file_part, _, name_part = strip_xdist_group(nodeid).partition('::')
+        file_stem = Path(file_part).with_suffix('')
+        safe_name = re.sub(r'[^\w.-]+', '_', name_part or file_stem.name).strip('_')
+        return self.har_dir / file_stem / f"{safe_name}.har"
+
+    async def attach(self, context, nodeid: str) -> Optional[Path]:
+        """在上下文上启用录制或回放（需要在创建页面之前调用）
+
+        录制的HAR在上下文关闭时写入文件；回放时HAR中找不到的请求按 not_found 处理。
+
+        Args:
+            context: BrowserContext
+            nodeid: 当前用例nodeid
+
+        Returns:
+            使用的HAR文件路径，未启用或回放文件不存在（not_found=fallback）时返回None
+
+        Raises:
+            FileNotFoundError: 回放模式下HAR文件不存在且 not_found=abort
+        """
+        if not self.enabled:
+            return None
+
+        har_path = self.path_for(nodeid)
+        if self.mode == 'record':
+            har_path.parent.mkdir(parents=True, exist_ok=True)
+            await context.route_from_har(
+                har_path,
+                url=self.url_filter,
+                update=True,
+                update_content=self.update_content,
+                update_mode=self.update_mode
+            )
+            logger.info(f"[HAR] 录制网络流量: {har_path}")
+            return har_path
+
+        if not har_path.exists():
+            if self.not_found == 'abort':
+                raise FileNotFoundError(f"回放模式下未找到用例的HAR文件，请先录制: {har_path}")
+            logger.warning(f"[HAR] 未找到HAR文件，本用例直接访问网络: {har_path}")
+            return None
+
+        await context.route_from_har(har_path, url=self.url_filter, not_found=self.not_found)
+        logger.info(f"[HAR] 从HAR回放网络请求: {har_path}（未录制的请求: {self.not_found}）")
+        return har_path
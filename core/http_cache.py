@@ -0,0 +1,423 @@
+"""
+HTTP磁盘缓存
+每个用例的 BrowserContext 都从空缓存开始，平台的大体积JS/CSS每个用例都要重新下载。
+通过请求拦截把静态资源保存到本地内容库，所有用例、所有worker和多次执行共享：
+按 Cache-Control 判断是否新鲜，过期后用 ETag / Last-Modified 重新验证，总大小超出上限时按最近最少使用淘汰
+
+@File  : http_cache.py
+@Author: shenyuan
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+import yaml
+
+from core.run_context import get_env_flag
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
+# 控制台/命令行通过该环境变量开启或关闭HTTP缓存（未设置时读取 playwright.http_cache.enabled）
+HTTP_CACHE_ENV = 'ENABLE_HTTP_CACHE'
+
+# 缓存时不保存的响应头（body已解压，长度和编码头需要去掉；Set-Cookie不能重放，否则会覆盖恢复的登录会话）
+HOP_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'connection', 'set-cookie')
+
+# 响应没有缓存策略和验证器时，只有这些静态资源类型按 default_ttl_seconds 缓存
+DEFAULT_TTL_TYPES = ('script', 'stylesheet', 'font', 'image')
+
+# 淘汰时清理到上限的该比例，避免每次写入都触发淘汰
+EVICT_TARGET_RATIO = 0.9
+
+# 访问时间和新条目在内存中积累到该数量、或距上次写回超过该间隔时批量写回SQLite
+FLUSH_BATCH_SIZE = 50
+FLUSH_INTERVAL_SECONDS = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    url TEXT PRIMARY KEY,
+    blob TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_last_access ON cache_entries (last_access);
+"""
+
+
+class HttpCache:
+    """共享的HTTP磁盘缓存
+
+    - 响应内容按URL的sha1保存为文件，索引（响应头、验证器、过期时间、最近访问时间）保存在SQLite中，
+      并行worker可以同时读写
+    - 新鲜的条目直接返回；过期且有 ETag / Last-Modified 的条目发送条件请求，304时继续使用本地内容
+    - 没有 max-age 也没有验证器的静态资源（脚本、样式、字体、图片）按 default_ttl_seconds 缓存，
+      其他类型不缓存；no-store、private、带 Set-Cookie 或按请求头区分内容（Vary）的响应不缓存
+    - 请求处理只访问内存索引，SQLite和缓存文件的读写在单独的后台线程中执行，
+      访问时间和新条目批量写回，淘汰也在写回之后由后台线程完成
+    """
+
+    def __init__(self, cache_dir: str = "temp/http_cache", max_size_mb: float = 500,
+                 default_ttl_seconds: int = 3600, resource_types: Optional[List[str]] = None,
+                 url_patterns: Optional[List[str]] = None):
+        """初始化缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_size_mb: 缓存总大小上限（MB）
+            default_ttl_seconds: 静态资源响应没有缓存策略和验证器时的有效期
+            resource_types: 缓存的资源类型
+            url_patterns: 只缓存匹配的地址（通配符），为空时不限制
+        """
+        self.cache_dir = Path(cache_dir)
+        self.blob_dir = self.cache_dir / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / "index.db"
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.default_ttl = default_ttl_seconds
+        self.resource_types = list(resource_types or ['script', 'stylesheet', 'font', 'image'])
+        self.url_patterns = list(url_patterns or [])
+        self.counters = {'hits': 0, 'revalidated': 0, 'misses': 0, 'bytes_served': 0, 'evicted': 0}
+        # 内存索引（URL -> 条目），未命中时到SQLite中查询；待写回的新条目和访问时间
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._pending_rows: Dict[str, Dict[str, Any]] = {}
+        self._pending_touches: Dict[str, tuple] = {}
+        self._last_flush = time.time()
+        # 单线程执行：索引写回按提交顺序进行，缓存文件写完之后才会写入对应的索引行
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='http-cache')
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_config(cls, config_path: str = "config/settings.yaml") -> Optional['HttpCache']:
+        """根据配置创建缓存（playwright.http_cache，环境变量 ENABLE_HTTP_CACHE 优先）
+
+        Args:
+            config_path: 配置文件路径
+
+        Returns:
+            缓存实例，未启用时返回None
+        """
+        config_file = Path(config_path)
+        config = {}
+        if config_file.exists():
+            with open(config_file, 'r', encoding='utf-8') as f:
+                config = yaml.safe_load(f) or {}
+        cache_config = config.get('playwright', {}).get('http_cache', {}) or {}
+        if not get_env_flag(HTTP_CACHE_ENV, cache_config.get('enabled', False)):
+            return None
+        return cls(
+            cache_dir=cache_config.get('dir', "temp/http_cache"),
+            max_size_mb=cache_config.get('max_size_mb', 500),
+            default_ttl_seconds=cache_config.get('default_ttl_seconds', 3600),
+            resource_types=cache_config.get('resource_types'),
+            url_patterns=cache_config.get('url_patterns')
+        )
+
+    @contextmanager
+    def _connect(self):
+        """打开一个连接，正常结束时提交，异常时回滚"""
+        conn = sqlite3.connect(str(self.db_path), timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def rule(self) -> Dict[str, Any]:
+        """对应的网络路由规则（追加在模块规则之后）"""
+        rule = {'action': 'cache', 'resource_types': self.resource_types}
+        if self.url_patterns:
+            rule['url_patterns'] = self.url_patterns
+        return rule
+
+    def _expires_at(self, headers: Dict[str, str], now: float, resource_type: str = '') -> Optional[float]:
+        """根据响应头计算过期时间，不可缓存时返回None
+
+        Args:
+            headers: 响应头
+            now: 当前时间
+            resource_type: 请求的资源类型，没有缓存策略和验证器时只有静态资源使用默认有效期
+
+        Returns:
+            过期时间，不可缓存时返回None
+        """
+        cache_control = headers.get('cache-control', '').lower()
+        if 'no-store' in cache_control or 'private' in cache_control:
+            return None
+        if 'no-cache' in cache_control:
+            return now
+        match = re.search(r'max-age=(\d+)', cache_control)
+        if match:
+            return now + int(match.group(1))
+        if headers.get('etag') or headers.get('last-modified'):
+            # 有验证器但没有有效期：每次使用前重新验证
+            return now
+        if resource_type in DEFAULT_TTL_TYPES:
+            return now + self.default_ttl
+        return None
+
+    @staticmethod
+    def _is_shared(headers: Dict[str, str]) -> bool:
+        """响应是否可以在用例之间共享：带 Set-Cookie 或按请求头区分内容（Vary）的响应不保存
+
+        body已解压保存，只按 Accept-Encoding 区分的响应仍然可以共享。
+        """
+        if headers.get('set-cookie'):
+            return False
+        vary = {v.strip().lower() for v in headers.get('vary', '').split(',') if v.strip()}
+        return not (vary - {'accept-encoding'})
+
+    @staticmethod
+    def _replay_headers(entry: Dict[str, Any]) -> Dict[str, str]:
+        """返回缓存条目的响应头（去掉旧版本缓存中可能保存的 Set-Cookie）"""
+        headers = json.loads(entry['headers'])
+        return {k: v for k, v in headers.items() if k.lower() not in HOP_HEADERS}
+
+    async def handle(self, route) -> str:
+        """处理一个请求：命中时直接返回，过期时重新验证，未命中时从网络获取并保存
+
+        索引查询、缓存文件读写都在后台线程中执行，不占用驱动浏览器的事件循环。
+
+        Args:
+            route: Playwright Route
+
+        Returns:
+            hit / revalidated / miss，非GET请求不处理，返回 bypass
+        """
+        request = route.request
+        url = request.url
+        if request.method != 'GET':
+            await route.fallback()
+            return 'bypass'
+
+        loop = asyncio.get_running_loop()
+        now = time.time()
+        entry = await self._lookup(loop, url)
+        body = await loop.run_in_executor(self._executor, self._read_blob, entry) if entry else None
+        if entry and body is not None and entry['expires_at'] > now:
+            self.counters['hits'] += 1
+            self.counters['bytes_served'] += len(body)
+            self._touch(loop, url, now)
+            await route.fulfill(status=entry['status'], headers=self._replay_headers(entry), body=body)
+            return 'hit'
+
+        conditional = {}
+        if entry and body is not None:
+            if entry['etag']:
+                conditional['if-none-match'] = entry['etag']
+            if entry['last_modified']:
+                conditional['if-modified-since'] = entry['last_modified']
+        if conditional:
+            response = await route.fetch(headers={**request.headers, **conditional})
+            if response.status == 304:
+                self.counters['revalidated'] += 1
+                self.counters['bytes_served'] += len(body)
+                expires_at = self._expires_at(response.headers, now, request.resource_type)
+                self._touch(loop, url, now, expires_at if expires_at is not None else now)
+                await route.fulfill(status=entry['status'], headers=self._replay_headers(entry), body=body)
+                return 'revalidated'
+        else:
+            response = await route.fetch()
+
+        self.counters['misses'] += 1
+        body = await response.body()
+        await route.fulfill(response=response, body=body)
+        if response.status == 200:
+            await self._store(loop, url, response.status, response.headers, body, now, request.resource_type)
+        return 'miss'
+
+    async def _lookup(self, loop, url: str) -> Optional[Dict[str, Any]]:
+        """查询索引：先查内存索引，没有时到SQLite中查询（其他worker写入的条目）"""
+        entry = self._index.get(url)
+        if entry is None:
+            entry = await loop.run_in_executor(self._executor, self._select, url)
+            if entry is not None:
+                self._index[url] = entry
+        return entry
+
+    def _select(self, url: str) -> Optional[Dict[str, Any]]:
+        """在SQLite中查询一个条目（后台线程）"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM cache_entries WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def _read_blob(self, entry) -> Optional[bytes]:
+        """读取缓存内容（文件被外部删除时返回None，按未命中处理）"""
+        try:
+            return (self.blob_dir / entry['blob']).read_bytes()
+        except OSError:
+            return None
+
+    def _touch(self, loop, url: str, now: float, expires_at: Optional[float] = None):
+        """更新最近访问时间（重新验证后同时更新过期时间），先更新内存索引，批量写回SQLite"""
+        entry = self._index.get(url)
+        if entry is None:
+            return
+        entry['last_access'] = now
+        if expires_at is not None:
+            entry['stored_at'] = now
+            entry['expires_at'] = expires_at
+        if url not in self._pending_rows:
+            self._pending_touches[url] = (now, entry['stored_at'], entry['expires_at'])
+        self._maybe_flush(loop)
+
+    async def _store(self, loop, url: str, status: int, headers: Dict[str, str], body: bytes, now: float,
+                     resource_type: str = ''):
+        """保存响应：在后台线程中写入缓存文件，写完后加入内存索引，索引行批量写回SQLite"""
+        if not self._is_shared(headers):
+            return
+        expires_at = self._expires_at(headers, now, resource_type)
+        if expires_at is None or len(body) > self.max_bytes:
+            return
+        blob = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        try:
+            await loop.run_in_executor(self._executor, self._write_blob, blob, body)
+        except OSError as e:
+            logger.debug(f"[HttpCache] 写入缓存失败 {url}: {e}")
+            return
+        kept_headers = {k: v for k, v in headers.items() if k.lower() not in HOP_HEADERS}
+        entry = {
+            'url': url, 'blob': blob, 'status': status, 'headers': json.dumps(kept_headers),
+            'etag': headers.get('etag'), 'last_modified': headers.get('last-modified'), 'size': len(body),
+            'stored_at': now, 'expires_at': expires_at, 'last_access': now
+        }
+        self._index[url] = entry
+        self._pending_rows[url] = entry
+        self._pending_touches.pop(url, None)
+        self._maybe_flush(loop)
+
+    def _write_blob(self, blob: str, body: bytes):
+        """写入缓存文件（先写临时文件再替换，并行worker不会读到写了一半的文件）"""
+        tmp_path = self.blob_dir / f"{blob}.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_path.write_bytes(body)
+        os.replace(tmp_path, self.blob_dir / blob)
+
+    def _maybe_flush(self, loop):
+        """积累到一批或距上次写回超过间隔时，把内存中的修改提交到后台线程写回"""
+        pending = len(self._pending_rows) + len(self._pending_touches)
+        if not pending:
+            return
+        if pending < FLUSH_BATCH_SIZE and time.time() - self._last_flush < FLUSH_INTERVAL_SECONDS:
+            return
+        rows, touches, evict = self._take_pending()
+        future = loop.run_in_executor(self._executor, self._write_batch, rows, touches, evict)
+        future.add_done_callback(self._on_flushed)
+
+    def _take_pending(self):
+        """取出待写回的修改（写入了新条目时顺便检查是否需要淘汰）"""
+        rows, touches = list(self._pending_rows.values()), dict(self._pending_touches)
+        self._pending_rows.clear()
+        self._pending_touches.clear()
+        self._last_flush = time.time()
+        return rows, touches, bool(rows)
+
+    def _on_flushed(self, future):
+        """后台写回完成（在事件循环中回调）：从内存索引中移除被淘汰的条目"""
+        try:
+            self._forget(future.result())
+        except (OSError, sqlite3.Error) as e:
+            logger.debug(f"[HttpCache] 写回缓存索引失败: {e}")
+
+    def _forget(self, removed: List[str]):
+        """从内存索引中移除已淘汰的条目"""
+        for url in removed:
+            self._index.pop(url, None)
+        self.counters['evicted'] += len(removed)
+
+    def _write_batch(self, rows: List[Dict[str, Any]], touches: Dict[str, tuple], evict: bool) -> List[str]:
+        """把一批修改写回SQLite（后台线程），写入了新条目时接着检查淘汰
+
+        Returns:
+            被淘汰的URL列表
+        """
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache_entries "
+                "(url, blob, status, headers, etag, last_modified, size, stored_at, expires_at, last_access) "
+                "VALUES (:url, :blob, :status, :headers, :etag, :last_modified, :size, :stored_at, :expires_at, :last_access)",
+                rows
+            )
+            conn.executemany(
+                "UPDATE cache_entries SET last_access = ?, stored_at = ?, expires_at = ? WHERE url = ?",
+                [(*values, url) for url, values in touches.items()]
+            )
+        return self._evict() if evict else []
+
+    def _evict(self) -> List[str]:
+        """总大小超出上限时，按最近访问时间从旧到新淘汰到上限的90%（后台线程）
+
+        Returns:
+            被淘汰的URL列表
+        """
+        with self._connect() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return []
+            target = self.max_bytes * EVICT_TARGET_RATIO
+            removed = []
+            for row in conn.execute("SELECT url, blob, size FROM cache_entries ORDER BY last_access"):
+                if total <= target:
+                    break
+                removed.append((row['url'], row['blob']))
+                total -= row['size']
+            conn.executemany("DELETE FROM cache_entries WHERE url = ?", [(url,) for url, _ in removed])
+        for _, blob in removed:
+            try:
+                (self.blob_dir / blob).unlink()
+            except OSError:
+                pass
+        logger.info(f"[HttpCache] 缓存超出上限，已淘汰 {len(removed)} 个最久未使用的条目")
+        return [url for url, _ in removed]
+
+    def close(self):
+        """写回内存中尚未保存的修改并关闭后台线程（会话结束时调用）"""
+        rows, touches, evict = self._take_pending()
+        try:
+            if rows or touches:
+                self._forget(self._executor.submit(self._write_batch, rows, touches, evict).result())
+        except (OSError, sqlite3.Error) as e:
+            logger.debug(f"[HttpCache] 写回缓存索引失败: {e}")
+        self._executor.shutdown(wait=True)
+
+    def usage(self) -> Dict[str, int]:
+        """缓存占用
+
+        Returns:
+            {entries, size}
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries").fetchone()
+        return {'entries': row[0], 'size': row[1]}
+
+    def stats(self) -> Dict[str, Any]:
+        """本进程的命中统计
+
+        Returns:
+            {hits, revalidated, misses, bytes_served, evicted, hit_ratio}
+        """
+        requests = self.counters['hits'] + self.counters['revalidated'] + self.counters['misses']
+        hit_ratio = (self.counters['hits'] + self.counters['revalidated']) / requests * 100 if requests else 0.0
+        return {**self.counters, 'hit_ratio': round(hit_ratio, 1)}
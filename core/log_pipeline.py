@@ -0,0 +1,269 @@
+"""
+日志管道
+日志记录在调用线程中只放入队列，由后台线程统一写控制台和日志文件，事件循环中大量输出时不会被磁盘/终端IO阻塞。
+日志文件每行一条JSON（带用例nodeid和worker），按大小轮转并压缩旧文件；页面console等噪音按类别限流
+
+@File  : log_pipeline.py
+@Author: shenyuan
+"""
+import atexit
+import copy
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+import yaml
+
+from core.run_context import get_worker_id, is_parallel_worker
+
+# 当前正在执行的用例（由conftest在用例开始/结束时设置）
+_current_test = {'nodeid': ''}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+_sampling_filter: Optional['SamplingFilter'] = None
+_setup_lock = threading.Lock()
+
+
+def set_current_test(nodeid: str = ''):
+    """设置当前用例nodeid，之后的日志记录都会带上该nodeid
+
+    Args:
+        nodeid: 用例nodeid，用例结束时传空字符串
+    """
+    _current_test['nodeid'] = nodeid
+
+
+def get_current_test() -> str:
+    """当前正在执行的用例nodeid（不在用例中时为空字符串）"""
+    return _current_test['nodeid']
+
+
+class ContextFilter(logging.Filter):
+    """为日志记录补充用例nodeid和worker标识（在调用线程中执行，保证nodeid与产生日志的用例一致）"""
+
+    def __init__(self):
+        super().__init__()
+        self.worker = get_worker_id()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.nodeid = _current_test['nodeid']
+        record.worker = self.worker
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """按类别限流
+
+    带 category 属性的日志记录（如 logger.info(..., extra={'category': 'page_console'})）
+    在每个时间窗口内最多保留 max_records 条，超出的丢弃；下一个窗口的第一条记录附带丢弃数量。
+    没有配置的类别不限流。
+    同一个实例可以同时加在多个handler上（队列handler和pytest的日志handler），
+    每条记录只判断一次，结果保存在记录上，各handler的取舍一致。
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, Any]]):
+        """初始化
+
+        Args:
+            limits: {类别: {max_records: 条数, per_seconds: 窗口秒数}}
+        """
+        super().__init__()
+        self.limits = limits or {}
+        self._windows: Dict[str, List[float]] = {}
+        self.dropped: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        sampled = getattr(record, 'sampled', None)
+        if sampled is not None:
+            return sampled
+        record.sampled = self._sample(record)
+        return record.sampled
+
+    def _sample(self, record: logging.LogRecord) -> bool:
+        """判断记录是否保留"""
+        category = getattr(record, 'category', None)
+        limit = self.limits.get(category) if category else None
+        if not limit:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.setdefault(category, [now, 0])
+            if now - window[0] >= float(limit.get('per_seconds', 10)):
+                window[0], window[1] = now, 0
+            if window[1] >= int(limit.get('max_records', 20)):
+                self.dropped[category] = self.dropped.get(category, 0) + 1
+                return False
+            window[1] += 1
+            dropped = self.dropped.pop(category, 0)
+        if dropped:
+            record.msg = f"{record.msg}（{category} 日志过多，上一时间窗口已丢弃 {dropped} 条）"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志格式化为一行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'nodeid': getattr(record, 'nodeid', ''),
+            'worker': getattr(record, 'worker', ''),
+        }
+        category = getattr(record, 'category', None)
+        if category:
+            data['category'] = category
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class ContextQueueHandler(QueueHandler):
+    """队列handler：入队前格式化消息，异常堆栈单独保存在 exc_text 中
+
+    标准的 QueueHandler.prepare 会把异常堆栈拼进消息并清空 exc_info/exc_text，
+    文件中的JSON日志就拿不到单独的堆栈字段；这里只把消息参数合并，堆栈保留在 exc_text，
+    控制台handler的Formatter依然会在消息后输出堆栈。
+    """
+
+    _exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            # traceback对象不能跨进程/线程安全地保存，只保留格式化后的文本
+            record.exc_info = None
+        return record
+
+
+class CompressingRotatingFileHandler(RotatingFileHandler):
+    """按大小轮转的文件日志，轮转出的旧文件压缩为 .gz"""
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int, compress: bool = True):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        if compress:
+            self.namer = lambda name: f"{name}.gz"
+            self.rotator = self._compress
+
+    @staticmethod
+    def _compress(source: str, dest: str):
+        """压缩轮转出的日志文件"""
+        with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+
+
+def _load_logging_config(config_path: str) -> dict:
+    """读取 settings.yaml 的 logging 配置"""
+    config_file = Path(config_path)
+    if not config_file.exists():
+        return {}
+    with open(config_file, 'r', encoding='utf-8') as f:
+        return (yaml.safe_load(f) or {}).get('logging', {}) or {}
+
+
+def _worker_log_file(log_file: str) -> Path:
+    """并行执行时每个worker写自己的日志文件（轮转不会互相冲突）：automation.log -> automation.gw0.log"""
+    path = Path(log_file)
+    if is_parallel_worker():
+        path = path.with_name(f"{path.stem}.{get_worker_id()}{path.suffix}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def setup_logging(config_path: str = "config/settings.yaml",
+                  console_handler: Optional[logging.Handler] = None) -> QueueListener:
+    """为根logger安装队列日志管道（每个进程只安装一次）
+
+    根logger上只添加一个QueueHandler；控制台和文件handler在后台线程中执行。
+    pytest自己的日志捕获handler不受影响，pytest-html仍可捕获日志。
+
+    Args:
+        config_path: 配置文件路径（logging: file/level/max_bytes/backup_count/compress/sampling）
+        console_handler: 需要移到后台线程执行的控制台handler（可选）
+
+    Returns:
+        后台日志线程
+    """
+    global _listener, _queue_handler, _sampling_filter
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+
+        config = _load_logging_config(config_path)
+        file_handler = CompressingRotatingFileHandler(
+            str(_worker_log_file(config.get('file', 'logs/automation.log'))),
+            max_bytes=int(config.get('max_bytes', 10 * 1024 * 1024)),
+            backup_count=int(config.get('backup_count', 5)),
+            compress=bool(config.get('compress', True))
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers: List[logging.Handler] = [file_handler]
+        if console_handler is not None:
+            handlers.append(console_handler)
+
+        log_queue = queue.SimpleQueue()
+        _queue_handler = ContextQueueHandler(log_queue)
+        _queue_handler.addFilter(ContextFilter())
+        _sampling_filter = SamplingFilter(config.get('sampling', {}))
+        _queue_handler.addFilter(_sampling_filter)
+        root_logger = logging.getLogger()
+        root_logger.setLevel(getattr(logging, str(config.get('level', 'INFO')).upper(), logging.INFO))
+        root_logger.addHandler(_queue_handler)
+
+        # respect_handler_level：控制台和文件handler各自的级别依然生效
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return _listener
+
+
+def install_sampling_filter(handlers):
+    """把限流过滤器加到其他handler上（如pytest的实时日志、日志捕获handler）
+
+    pytest的handler直接挂在根logger上，不经过队列，页面console等日志不限流时仍会在事件循环中同步输出到终端。
+
+    Args:
+        handlers: handler列表（None会被忽略）
+    """
+    if _sampling_filter is None:
+        return
+    for handler in handlers:
+        if handler is not None and _sampling_filter not in handler.filters:
+            handler.addFilter(_sampling_filter)
+
+
+def shutdown_logging():
+    """停止后台日志线程（写完队列中剩余的日志）"""
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is None:
+            return
+        if _queue_handler is not None:
+            logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            try:
+                handler.close()
+            except Exception:
+                pass
+        _listener = None
+        _queue_handler = None
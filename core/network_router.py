@@ -0,0 +1,234 @@
+"""
+网络路由
+按模块配置（config/module_config.yaml 的 network_profiles）拦截请求：中止、返回桩数据或从本地缓存返回，
+减少只检查菜单、页面结构的用例下载图片、字体、视频和统计埋点的开销
+
+@File  : network_router.py
+@Author: shenyuan
+"""
+import base64
+import fnmatch
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+import yaml
+
+from core.http_cache import HttpCache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
+
+# 1x1 透明GIF，图片请求的默认桩数据
+_BLANK_GIF = base64.b64decode('R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+
+# 各资源类型的默认桩数据 (content_type, body)
+_DEFAULT_STUBS = {
+    'image': ('image/gif', _BLANK_GIF),
+    'font': ('font/woff2', b''),
+    'media': ('video/mp4', b''),
+    'stylesheet': ('text/css', b''),
+    'script': ('application/javascript', b''),
+}
+
+# 已知资源大小索引最多保留的条目数
+MAX_SIZE_INDEX_ENTRIES = 5000
+
+
+class NetworkRouter:
+    """请求路由器
+
+    规则按顺序匹配，第一条命中的规则生效：
+    - abort：中止请求
+    - stub：返回桩数据（默认按资源类型返回空内容或1x1图片）
+    - cache：交给共享的HTTP磁盘缓存（core/http_cache.py）处理，命中时直接从本地返回
+    - continue：放行（用于在宽泛规则之前排除个别地址）
+
+    被中止/桩替换的请求无法得知真实大小，节省的流量按之前执行中记录的响应大小估算。
+    """
+
+    ACTIONS = ('abort', 'stub', 'cache', 'continue')
+
+    def __init__(self, rules: List[Dict[str, Any]], cache_dir: str = "temp/route_cache",
+                 http_cache: Optional[HttpCache] = None):
+        """初始化路由器
+
+        Args:
+            rules: 路由规则列表（字段：action、resource_types、url_patterns，stub规则可选 status/content_type/body）
+            cache_dir: 资源大小索引目录；未提供 http_cache 时也是 cache 规则的缓存目录
+            http_cache: 共享的HTTP磁盘缓存（同一进程的所有用例共用一个实例）
+        """
+        self.rules = [rule for rule in rules if rule.get('action') in self.ACTIONS]
+        self.cache_dir = Path(cache_dir)
+        self.http_cache = http_cache
+        # 未提供共享缓存时使用本路由器自己的缓存，关闭路由器时一起关闭
+        self._own_http_cache = self.http_cache is None and any(rule['action'] == 'cache' for rule in self.rules)
+        if self._own_http_cache:
+            self.http_cache = HttpCache(str(self.cache_dir))
+        self._size_index_path = self.cache_dir / "size_index.json"
+        self._size_index: Dict[str, int] = self._load_size_index()
+        self._size_index_dirty = False
+        self.counters = {
+            'requests': 0,
+            'aborted': 0,
+            'stubbed': 0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'bytes_saved': 0,
+        }
+
+    @classmethod
+    def for_module(cls, module: Optional[str], config_path: str = "config/module_config.yaml",
+                   http_cache: Optional[HttpCache] = None) -> Optional['NetworkRouter']:
+        """根据模块配置创建路由器
+
+        network_profiles.default 对所有模块生效，模块自己的规则排在默认规则之前；
+        启用HTTP缓存时在最后追加缓存规则。没有任何规则时返回None（不拦截）。
+
+        Args:
+            module: 模块标识（如 teaching），为None时只使用默认配置
+            config_path: 模块配置文件路径
+            http_cache: 共享的HTTP磁盘缓存（playwright.http_cache 启用时提供）
+
+        Returns:
+            路由器实例或None
+        """
+        profiles = {}
+        config_file = Path(config_path)
+        if config_file.exists():
+            with open(config_file, 'r', encoding='utf-8') as f:
+                profiles = (yaml.safe_load(f) or {}).get('network_profiles') or {}
+
+        default_profile = profiles.get('default') or {}
+        module_profile = (profiles.get(module) or {}) if module else {}
+        rules = []
+        if module_profile.get('enabled', default_profile.get('enabled', False)):
+            rules = list(module_profile.get('rules') or []) + list(default_profile.get('rules') or [])
+        if http_cache:
+            rules.append(http_cache.rule())
+        if not rules:
+            return None
+        return cls(rules, cache_dir=profiles.get('cache_dir', "temp/route_cache"), http_cache=http_cache)
+
+    def _load_size_index(self) -> Dict[str, int]:
+        """加载已知资源大小索引"""
+        try:
+            with open(self._size_index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _url_key(url: str) -> str:
+        """大小索引的键：去掉查询参数（带时间戳的资源地址也能对应）"""
+        return url.split('?', 1)[0].split('#', 1)[0]
+
+    def _match(self, request) -> Optional[Dict[str, Any]]:
+        """查找第一条命中的规则"""
+        for rule in self.rules:
+            resource_types = rule.get('resource_types')
+            if resource_types and request.resource_type not in resource_types:
+                continue
+            url_patterns = rule.get('url_patterns')
+            if url_patterns and not any(fnmatch.fnmatch(request.url, pattern) for pattern in url_patterns):
+                continue
+            return rule
+        return None
+
+    async def attach(self, context):
+        """在上下文上注册路由（需要在创建页面之前调用）
+
+        Args:
+            context: BrowserContext
+        """
+        await context.route("**/*", self._handle)
+        context.on("response", self._on_response)
+        logger.info(f"[ROUTER] 已启用网络路由，规则数: {len(self.rules)}")
+
+    def _on_response(self, response):
+        """记录放行请求的响应大小，供之后估算节省的流量"""
+        length = response.headers.get('content-length')
+        if not length or not length.isdigit():
+            return
+        key = self._url_key(response.url)
+        if self._size_index.get(key) != int(length) and len(self._size_index) < MAX_SIZE_INDEX_ENTRIES:
+            self._size_index[key] = int(length)
+            self._size_index_dirty = True
+
+    async def _handle(self, route):
+        """路由回调"""
+        request = route.request
+        rule = self._match(request)
+        if rule is None or rule['action'] == 'continue':
+            await route.fallback()
+            return
+
+        self.counters['requests'] += 1
+        action = rule['action']
+        try:
+            if action == 'abort':
+                self.counters['aborted'] += 1
+                self.counters['bytes_saved'] += self._size_index.get(self._url_key(request.url), 0)
+                await route.abort()
+            elif action == 'stub':
+                self.counters['stubbed'] += 1
+                self.counters['bytes_saved'] += self._size_index.get(self._url_key(request.url), 0)
+                await self._fulfill_stub(route, rule)
+            else:
+                served_before = self.http_cache.counters['bytes_served']
+                result = await self.http_cache.handle(route)
+                if result == 'miss':
+                    self.counters['cache_misses'] += 1
+                elif result != 'bypass':
+                    self.counters['cache_hits'] += 1
+                    self.counters['bytes_saved'] += self.http_cache.counters['bytes_served'] - served_before
+        except Exception as e:
+            # 页面已关闭等情况下路由可能已失效，不影响测试；未处理的请求交回默认处理，避免请求挂起
+            logger.debug(f"[ROUTER] 处理请求失败 {request.url}: {e}")
+            try:
+                await route.fallback()
+            except Exception:
+                pass
+
+    async def _fulfill_stub(self, route, rule: Dict[str, Any]):
+        """返回桩数据"""
+        default_type, default_body = _DEFAULT_STUBS.get(route.request.resource_type, ('text/plain', b''))
+        body = rule.get('body')
+        await route.fulfill(
+            status=int(rule.get('status', 200)),
+            content_type=rule.get('content_type', default_type),
+            body=body.encode('utf-8') if isinstance(body, str) else default_body
+        )
+
+    def stats(self) -> Dict[str, int]:
+        """本次（单个测试）的拦截统计"""
+        return dict(self.counters)
+
+    def close(self):
+        """保存资源大小索引（并关闭本路由器自己的HTTP缓存）"""
+        if self._own_http_cache:
+            self.http_cache.close()
+        if not self._size_index_dirty:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._size_index_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._size_index, f)
+            os.replace(tmp_path, self._size_index_path)
+            self._size_index_dirty = False
+        except OSError as e:
+            logger.debug(f"[ROUTER] 保存资源大小索引失败: {e}")
+
+
+def format_bytes(size: float) -> str:
+    """格式化字节数（用于报告展示）"""
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
@@ -5,6 +5,7 @@
 @File  : notification.py
 @Author: shenyuan
 """
+import html
 import requests
 import smtplib
 from email.mime.text import MIMEText
@@ -20,6 +21,8 @@ from pathlib import Path
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
+from core.performance_budget import format_violation
+
 
 class NotificationService:
     """通知服务类，支持钉钉和邮件"""
@@ -230,7 +233,8 @@ class NotificationService:
         skipped: int,
         duration: float,
         error_details: Optional[List[Dict[str, Any]]] = None,
-        html_report_path: Optional[Path] = None
+        html_report_path: Optional[Path] = None,
+        budget_violations: Optional[List[Dict[str, Any]]] = None
     ):
         """发送测试报告
         
@@ -243,6 +247,7 @@ class NotificationService:
             duration: 执行时长（秒）
             error_details: 错误详情列表
             html_report_path: HTML报告文件路径（可选）
+            budget_violations: 超出性能预算的记录列表（可选）
         """
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         pass_rate = (passed/total*100) if total > 0 else 0
@@ -271,6 +276,11 @@ class NotificationService:
                 error_msg = error.get('error', '')[:100]  # 限制长度
                 dingtalk_msg += f"- {error.get('name', 'Unknown')}: {error_msg}\n"
         
+        if budget_violations:
+            dingtalk_msg += f"\n**性能预算超出**（{len(budget_violations)} 项）:\n"
+            for violation in budget_violations[:5]:  # 只显示前5项
+                dingtalk_msg += f"- {violation.get('name', 'Unknown').split('::')[-1]}: {format_violation(violation)}\n"
+        
         # 如果存在HTML报告，在钉钉消息中添加提示
         if html_report_path and html_report_path.exists():
             # 钉钉机器人不支持直接附件，但可以提供相对路径和说明
@@ -369,6 +379,22 @@ class NotificationService:
         </div>
 """
         
+        if budget_violations:
+            email_html_content += """
+        <div class="errors">
+            <h2>性能预算超出</h2>
+"""
+            for violation in budget_violations:
+                email_html_content += f"""
+            <div class="error-item" style="border-left-color: #f57c00;">
+                <div class="error-name" style="color: #f57c00;">{html.escape(violation.get('name', 'Unknown'))}</div>
+                <div class="error-msg">{html.escape(format_violation(violation))}</div>
+            </div>
+"""
+            email_html_content += """
+        </div>
+"""
+        
         email_html_content += f"""
         <div class="footer">
             <p>此报告由 WebUI自动化测试平台自动生成</p>
@@ -405,10 +431,19 @@ class NotificationService:
                 email_text_content += f"错误: {error.get('error', '')}\n"
                 email_text_content += "-" * 50 + "\n"
         
+        if budget_violations:
+            email_text_content += "\n性能预算超出:\n"
+            for violation in budget_violations:
+                email_text_content += f"{violation.get('name', 'Unknown')}: {format_violation(violation)}\n"
+        
         # 准备附件列表
         attachments = []
         if html_report_path and html_report_path.exists():
             attachments.append(str(html_report_path))
+            # 自定义报告的用例明细在同名数据文件中，与报告放在同一目录才能显示
+            data_file = html_report_path.with_name(f"{html_report_path.stem}.data.js")
+            if data_file.exists():
+                attachments.append(str(data_file))
         
         # 发送通知
         if self.config['notification']['dingtalk'].get('enabled', False):
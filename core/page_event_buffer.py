@@ -0,0 +1,141 @@
+"""
+页面事件环形缓冲
+在内存中保留每个页面最近的console消息、页面错误和请求/响应摘要，测试通过时不写任何文件，
+只有测试失败时才由conftest附加到报告，便于分析失败前页面上发生了什么
+
+@File  : page_event_buffer.py
+@Author: shenyuan
+"""
+import html
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Any
+
+# 单条console消息/错误信息保留的最大长度
+MAX_TEXT_LENGTH = 500
+
+
+class PageEventBuffer:
+    """页面事件环形缓冲（deque定长，超出后自动丢弃最旧的记录）"""
+
+    def __init__(self, console_size: int = 200, error_size: int = 50, network_size: int = 200):
+        """初始化缓冲
+
+        Args:
+            console_size: 保留的console消息条数
+            error_size: 保留的页面错误条数
+            network_size: 保留的请求摘要条数
+        """
+        self.console = deque(maxlen=console_size)
+        self.errors = deque(maxlen=error_size)
+        self.network = deque(maxlen=network_size)
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'PageEventBuffer':
+        """根据 settings.yaml 的 playwright.event_buffers 创建
+
+        Args:
+            config: 完整的settings配置
+
+        Returns:
+            缓冲实例
+        """
+        sizes = config.get('playwright', {}).get('event_buffers', {}) or {}
+        return cls(
+            console_size=int(sizes.get('console', 200)),
+            error_size=int(sizes.get('page_errors', 50)),
+            network_size=int(sizes.get('network', 200))
+        )
+
+    def attach(self, page):
+        """监听页面事件
+
+        Args:
+            page: Playwright Page对象
+        """
+        page.on("console", self._on_console)
+        page.on("pageerror", self._on_pageerror)
+        page.on("response", self._on_response)
+        page.on("requestfailed", self._on_requestfailed)
+
+    def _on_console(self, msg):
+        self.console.append({'ts': time.time(), 'type': msg.type, 'text': msg.text[:MAX_TEXT_LENGTH]})
+
+    def _on_pageerror(self, error):
+        self.errors.append({'ts': time.time(), 'text': str(error)[:MAX_TEXT_LENGTH]})
+
+    def _on_response(self, response):
+        request = response.request
+        # 响应到达时 responseEnd 还未知，使用从请求开始到收到响应头的耗时
+        timing = request.timing or {}
+        elapsed = timing.get('responseStart', -1)
+        self.network.append({
+            'ts': time.time(),
+            'method': request.method,
+            'url': response.url,
+            'status': response.status,
+            'type': request.resource_type,
+            'ms': round(elapsed) if elapsed and elapsed > 0 else None
+        })
+
+    def _on_requestfailed(self, request):
+        self.network.append({
+            'ts': time.time(),
+            'method': request.method,
+            'url': request.url,
+            'status': None,
+            'type': request.resource_type,
+            'failure': request.failure or 'failed'
+        })
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """当前缓冲内容的副本"""
+        return {'console': list(self.console), 'errors': list(self.errors), 'network': list(self.network)}
+
+    @staticmethod
+    def _format_time(ts: float) -> str:
+        return datetime.fromtimestamp(ts).strftime('%H:%M:%S.%f')[:-3]
+
+    def _network_line(self, entry: Dict[str, Any]) -> str:
+        status = entry['status'] if entry.get('status') is not None else f"失败({entry.get('failure')})"
+        cost = f" {entry['ms']}ms" if entry.get('ms') else ''
+        return f"{self._format_time(entry['ts'])} {entry['method']} {status} [{entry['type']}]{cost} {entry['url']}"
+
+    def to_text(self) -> str:
+        """纯文本格式（写入pytest报告的sections，终端和pytest-html中都可以看到）"""
+        lines = [f"== 页面错误（最近 {len(self.errors)} 条） =="]
+        lines += [f"{self._format_time(e['ts'])} {e['text']}" for e in self.errors]
+        lines.append(f"== console（最近 {len(self.console)} 条） ==")
+        lines += [f"{self._format_time(c['ts'])} [{c['type']}] {c['text']}" for c in self.console]
+        lines.append(f"== 网络请求（最近 {len(self.network)} 条） ==")
+        lines += [self._network_line(n) for n in self.network]
+        return '\n'.join(lines)
+
+    def to_html(self) -> str:
+        """HTML格式（pytest-html的extras），失败的请求和4xx/5xx响应标红"""
+        def block(title: str, rows: List[str]) -> str:
+            if not rows:
+                return ''
+            return (
+                f'<details style="margin: 5px 0;"><summary><strong>{title}</strong></summary>'
+                f'<pre style="white-space: pre-wrap; word-wrap: break-word; font-size: 12px;">{"".join(rows)}</pre></details>'
+            )
+
+        errors = [f'<span style="color: #d32f2f;">{html.escape(self._format_time(e["ts"]) + " " + e["text"])}</span>\n'
+                  for e in self.errors]
+        console = [
+            (f'<span style="color: #d32f2f;">' if c['type'] == 'error' else '<span>')
+            + html.escape(f"{self._format_time(c['ts'])} [{c['type']}] {c['text']}") + '</span>\n'
+            for c in self.console
+        ]
+        network = []
+        for entry in self.network:
+            bad = entry.get('status') is None or entry['status'] >= 400
+            style = ' style="color: #d32f2f;"' if bad else ''
+            network.append(f'<span{style}>{html.escape(self._network_line(entry))}</span>\n')
+        return (
+            block(f"页面错误（最近 {len(errors)} 条）", errors)
+            + block(f"Console（最近 {len(console)} 条）", console)
+            + block(f"网络请求（最近 {len(network)} 条）", network)
+        )
@@ -0,0 +1,133 @@
+"""
+性能预算
+按页面路由声明性能预算（加载时间、LCP、CLS、INP、长任务、传输大小、接口耗时），
+用例执行结束时用 PerformanceMonitor 采集的路由分段自动检查，超出预算时按配置告警或判定用例失败
+
+@File  : performance_budget.py
+@Author: shenyuan
+"""
+import fnmatch
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+import yaml
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
+# 预算项 -> (分段中的指标, 显示名称, 单位, 预算值换算为指标单位的倍数)
+BUDGET_METRICS = {
+    'max_load_ms': ('load_ms', '页面加载', 'ms', 1),
+    'max_lcp_ms': ('lcp_ms', 'LCP', 'ms', 1),
+    'max_cls': ('cls', 'CLS', '', 1),
+    'max_inp_ms': ('inp_ms', 'INP', 'ms', 1),
+    'max_long_task_ms': ('long_task_ms', '长任务总耗时', 'ms', 1),
+    'max_transfer_kb': ('transfer_bytes', '传输大小', 'KB', 1024),
+    'max_api_ms': ('api_max_ms', '接口耗时', 'ms', 1),
+}
+
+BUDGET_MODES = ('warn', 'fail')
+
+
+def format_violation(violation: Dict[str, Any]) -> str:
+    """超出预算的一行描述，如：[fail] #/course/list LCP 5200ms > 4000ms"""
+    step = f"（步骤: {violation['step']}）" if violation.get('step') else ''
+    detail = f" {violation['detail']}" if violation.get('detail') else ''
+    return (
+        f"[{violation['mode']}] {violation['route']} {violation['label']} "
+        f"{violation['value']}{violation['unit']} > {violation['limit']}{violation['unit']}{step}{detail}"
+    )
+
+
+class PerformanceBudget:
+    """性能预算
+
+    配置（config/module_config.yaml 的 performance_budgets）：
+    - default 对所有模块生效；模块下的 routes 排在默认规则之前，enabled、mode 可单独覆盖
+    - mode: warn（只在报告和通知中提示）/ fail（超出预算的用例判为失败），每条规则也可以单独指定
+    - routes: [{route: 通配符（匹配 location.pathname + location.hash）, max_xxx: 预算值}]
+      同一指标取第一条匹配且配置了该指标的规则，所以模块规则和更具体的路由应该写在前面
+    """
+
+    def __init__(self, routes: List[Dict[str, Any]], mode: str = 'warn'):
+        """初始化
+
+        Args:
+            routes: 预算规则列表
+            mode: 默认处理方式（warn / fail）
+        """
+        self.routes = routes
+        self.mode = mode if mode in BUDGET_MODES else 'warn'
+
+    @classmethod
+    def for_module(cls, module: Optional[str],
+                   config_path: str = "config/module_config.yaml") -> Optional['PerformanceBudget']:
+        """根据模块配置创建预算
+
+        Args:
+            module: 模块标识（如 teaching），为None时只使用默认配置
+            config_path: 模块配置文件路径
+
+        Returns:
+            预算实例，未启用或没有规则时返回None
+        """
+        budgets = {}
+        config_file = Path(config_path)
+        if config_file.exists():
+            with open(config_file, 'r', encoding='utf-8') as f:
+                budgets = (yaml.safe_load(f) or {}).get('performance_budgets') or {}
+
+        default_budget = budgets.get('default') or {}
+        module_budget = (budgets.get(module) or {}) if module else {}
+        if not module_budget.get('enabled', default_budget.get('enabled', False)):
+            return None
+        routes = list(module_budget.get('routes') or []) + list(default_budget.get('routes') or [])
+        if not routes:
+            return None
+        return cls(routes, mode=module_budget.get('mode', default_budget.get('mode', 'warn')))
+
+    def evaluate(self, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """检查路由分段是否超出预算
+
+        Args:
+            segments: PerformanceMonitor 采集的路由分段
+
+        Returns:
+            超出预算的记录 [{route, step, metric, label, value, limit, unit, mode, detail}]
+        """
+        violations = []
+        for segment in segments:
+            route = segment.get('route', '')
+            checked = set()
+            for rule in self.routes:
+                if not fnmatch.fnmatchcase(route, str(rule.get('route', '*'))):
+                    continue
+                for budget_key, (metric, label, unit, factor) in BUDGET_METRICS.items():
+                    if budget_key in checked or rule.get(budget_key) is None:
+                        continue
+                    checked.add(budget_key)
+                    value = segment.get(metric)
+                    if value is None:
+                        continue
+                    limit = rule[budget_key]
+                    if value <= limit * factor:
+                        continue
+                    violations.append({
+                        'route': route,
+                        'step': segment.get('step', ''),
+                        'metric': budget_key,
+                        'label': label,
+                        'value': round(value / factor, 1) if factor != 1 else value,
+                        'limit': limit,
+                        'unit': unit,
+                        'mode': rule.get('mode', self.mode),
+                        'detail': segment.get('api_slowest', '') if metric == 'api_max_ms' else '',
+                    })
+        return violations
+
+    @staticmethod
+    def has_failures(violations: List[Dict[str, Any]]) -> bool:
+        """是否有需要判定用例失败的超出项"""
+        return any(violation['mode'] == 'fail' for violation in violations)
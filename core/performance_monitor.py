@@ -1,61 +1,336 @@
 """
 性能监控模块
-收集页面性能指标
+收集页面性能指标：创建上下文时注入采集脚本，用 PerformanceObserver 在整个用例执行过程中持续记录
+LCP、CLS、INP（事件耗时）和长任务，并按页面内路由切换（hash路由等软导航）分段，
+用例结束时汇总到报告中
 
 @File  : performance_monitor.py
 @Author: shenyuan
 """
-from typing import Dict, Optional
-from playwright.async_api import Page
 import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+import yaml
+from playwright.async_api import BrowserContext, Page
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
+# 页面把已结束的路由分段推送给Python的绑定名称
+VITALS_BINDING = '__webuiVitalsReport'
+
+# 采集脚本（每个文档加载时执行）：
+# - 每次路由切换（hashchange / popstate / pushState）结束当前分段并开始新分段，已结束的分段通过绑定推送
+# - 页面卸载（整页跳转）前推送剩余分段
+# - window.__webuiVitals.flush() 结束当前分段并返回尚未推送的分段（按步骤采集、用例结束时调用）
+VITALS_SCRIPT = """
+(config => {
+    if (window.__webuiVitals || typeof PerformanceObserver === 'undefined') return;
+    const supported = PerformanceObserver.supportedEntryTypes || [];
+    const pending = [];
+    let current = null;
+
+    function route() { return location.pathname + location.hash; }
+    function start(kind) {
+        current = {route: route(), kind: kind, start: performance.now(), lcp: null, cls: 0,
+                   inp: null, interactions: 0, long_tasks: 0, long_task_ms: 0, load: null,
+                   requests: 0, transfer: 0, api_count: 0, api_max: null, api_slowest: ''};
+    }
+    function close() {
+        if (!current) return;
+        current.duration = performance.now() - current.start;
+        if (current.kind === 'load') {
+            const navigation = performance.getEntriesByType('navigation')[0];
+            if (navigation && navigation.loadEventEnd > 0) current.load = navigation.loadEventEnd;
+        }
+        pending.push(current);
+        if (pending.length > config.maxSegments) pending.shift();
+        current = null;
+    }
+    function push() {
+        const report = window[config.binding];
+        if (report && pending.length) {
+            try { report(pending.splice(0)); } catch (e) {}
+        }
+    }
+    function softNavigation() {
+        if (current && current.route === route()) return;
+        close();
+        start('soft');
+        push();
+    }
+    function observe(type, callback, options) {
+        if (supported.indexOf(type) === -1) return;
+        try {
+            new PerformanceObserver(list => list.getEntries().forEach(callback))
+                .observe(Object.assign({type: type, buffered: true}, options || {}));
+        } catch (e) {}
+    }
+
+    start('load');
+    observe('largest-contentful-paint', entry => {
+        if (current && entry.startTime >= current.start) current.lcp = entry.startTime - current.start;
+    });
+    observe('layout-shift', entry => {
+        if (current && !entry.hadRecentInput) current.cls += entry.value;
+    });
+    observe('event', entry => {
+        if (!current || !entry.interactionId) return;
+        current.interactions += 1;
+        current.inp = Math.max(current.inp || 0, entry.duration);
+    }, {durationThreshold: config.eventThreshold});
+    observe('longtask', entry => {
+        if (!current) return;
+        current.long_tasks += 1;
+        current.long_task_ms += entry.duration;
+    });
+    observe('resource', entry => {
+        if (!current) return;
+        current.requests += 1;
+        current.transfer += entry.transferSize || 0;
+        if (entry.initiatorType === 'xmlhttprequest' || entry.initiatorType === 'fetch') {
+            current.api_count += 1;
+            if (current.api_max === null || entry.duration > current.api_max) {
+                current.api_max = entry.duration;
+                current.api_slowest = entry.name.slice(0, 300);
+            }
+        }
+    });
+
+    const pushState = history.pushState;
+    history.pushState = function() {
+        const result = pushState.apply(this, arguments);
+        softNavigation();
+        return result;
+    };
+    window.addEventListener('hashchange', softNavigation);
+    window.addEventListener('popstate', softNavigation);
+    window.addEventListener('pagehide', () => { close(); push(); });
+
+    window.__webuiVitals = {
+        flush: () => {
+            close();
+            start('step');
+            return pending.splice(0);
+        }
+    };
+})
+"""
+
+
+def percentile(values: List[float], percent: float) -> Optional[float]:
+    """百分位数（最近秩法），没有数据时返回None"""
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return None
+    rank = max(int(len(values) * percent / 100 + 0.999999) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def route_vitals(test_cases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """按路由汇总所有用例的性能分段（Web Vitals 通常按 p75 评估）
+
+    Args:
+        test_cases: 用例列表（结果流汇总的用例包含 vitals 字段）
+
+    Returns:
+        [{route, samples, cases, lcp_ms, cls, inp_ms, long_tasks, long_task_ms, api_max_ms}]，
+        lcp_ms/cls/inp_ms 为p75，long_task_ms、api_max_ms（最慢接口）为单次访问的p75，按 LCP 从慢到快排序
+    """
+    routes: Dict[str, Dict[str, Any]] = {}
+    for case in test_cases:
+        for segment in (case.get('vitals') or {}).get('segments') or []:
+            entry = routes.setdefault(segment['route'], {'route': segment['route'], 'segments': [], 'cases': set()})
+            entry['segments'].append(segment)
+            entry['cases'].add(case.get('name', ''))
+
+    result = []
+    for entry in routes.values():
+        segments = entry['segments']
+        result.append({
+            'route': entry['route'],
+            'samples': len(segments),
+            'cases': len(entry['cases']),
+            'lcp_ms': percentile([segment['lcp_ms'] for segment in segments], 75),
+            'cls': percentile([segment['cls'] for segment in segments], 75),
+            'inp_ms': percentile([segment['inp_ms'] for segment in segments], 75),
+            'long_tasks': sum(segment['long_tasks'] for segment in segments),
+            'long_task_ms': percentile([segment['long_task_ms'] for segment in segments], 75),
+            'api_max_ms': percentile([segment.get('api_max_ms') for segment in segments], 75),
+        })
+    return sorted(result, key=lambda item: item['lcp_ms'] or 0, reverse=True)
 
 
 class PerformanceMonitor:
-    """性能监控器"""
-    
-    def __init__(self):
-        """初始化性能监控器"""
+    """性能监控器
+
+    配置（config/settings.yaml 的 playwright.web_vitals）：
+    - enabled: 是否注入采集脚本
+    - event_threshold_ms: 记录的最短事件耗时（INP统计，浏览器最小支持16ms）
+    - max_segments: 每个用例最多保留的路由分段数
+    """
+
+    def __init__(self, config_path: str = "config/settings.yaml"):
+        """初始化性能监控器
+
+        Args:
+            config_path: 配置文件路径
+        """
         self.metrics: Dict[str, Dict] = {}
-    
+        vitals_config = self._load_config(config_path).get('playwright', {}).get('web_vitals', {}) or {}
+        self.vitals_enabled = bool(vitals_config.get('enabled', True))
+        self.event_threshold_ms = max(int(vitals_config.get('event_threshold_ms', 40)), 16)
+        self.max_segments = int(vitals_config.get('max_segments', 100))
+        # 本用例已采集的路由分段；_labeled 之前的分段已标记步骤名称
+        self.segments: List[Dict[str, Any]] = []
+        self._labeled = 0
+
+    @staticmethod
+    def _load_config(config_path: str) -> dict:
+        """加载配置文件"""
+        config_file = Path(config_path)
+        if not config_file.exists():
+            return {}
+
+        with open(config_file, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+
+    async def attach(self, context: BrowserContext):
+        """在上下文上注入采集脚本（需要在创建页面之前调用）
+
+        Args:
+            context: BrowserContext
+        """
+        if not self.vitals_enabled:
+            return
+        config = {'binding': VITALS_BINDING, 'eventThreshold': self.event_threshold_ms,
+                  'maxSegments': self.max_segments}
+        await context.expose_binding(VITALS_BINDING, self._on_report)
+        await context.add_init_script(script=f"{VITALS_SCRIPT}({json.dumps(config)});")
+
+    def _on_report(self, source, segments: List[Dict[str, Any]]):
+        """页面推送已结束的路由分段"""
+        self._add_segments(segments or [])
+
+    def _add_segments(self, segments: List[Dict[str, Any]]):
+        """记录分段（毫秒取整），超出 max_segments 时丢弃最早的分段"""
+        for segment in segments:
+            self.segments.append({
+                'route': segment.get('route', ''),
+                'kind': segment.get('kind', ''),
+                'step': '',
+                'duration_ms': round(segment.get('duration') or 0),
+                'lcp_ms': round(segment['lcp']) if segment.get('lcp') is not None else None,
+                'cls': round(segment.get('cls') or 0, 4),
+                'inp_ms': round(segment['inp']) if segment.get('inp') is not None else None,
+                'interactions': segment.get('interactions', 0),
+                'long_tasks': segment.get('long_tasks', 0),
+                'long_task_ms': round(segment.get('long_task_ms') or 0),
+                'load_ms': round(segment['load']) if segment.get('load') is not None else None,
+                'requests': segment.get('requests', 0),
+                'transfer_bytes': segment.get('transfer', 0),
+                'api_count': segment.get('api_count', 0),
+                'api_max_ms': round(segment['api_max']) if segment.get('api_max') is not None else None,
+                'api_slowest': segment.get('api_slowest', ''),
+            })
+        if len(self.segments) > self.max_segments:
+            dropped = len(self.segments) - self.max_segments
+            del self.segments[:dropped]
+            self._labeled = max(self._labeled - dropped, 0)
+
+    async def flush(self, page: Page, step: str = '') -> List[Dict[str, Any]]:
+        """结束当前分段并取回页面中尚未推送的分段，上次flush之后的分段都记为该步骤
+
+        Args:
+            page: Playwright页面对象
+            step: 步骤名称
+
+        Returns:
+            本步骤的分段列表
+        """
+        if not self.vitals_enabled or page is None or page.is_closed():
+            return []
+        try:
+            segments = await page.evaluate("() => window.__webuiVitals ? window.__webuiVitals.flush() : []")
+        except Exception as e:
+            logger.debug(f"[PerfMonitor] 读取性能分段失败: {e}")
+            segments = []
+        self._add_segments(segments)
+        step_segments = self.segments[self._labeled:]
+        for segment in step_segments:
+            segment['step'] = step
+        self._labeled = len(self.segments)
+        return step_segments
+
+    def vitals_summary(self) -> Dict[str, Any]:
+        """本用例的Web Vitals汇总（各项取所有分段中最差的值）
+
+        Returns:
+            {lcp_ms, cls, inp_ms, long_tasks, long_task_ms, load_ms, api_max_ms, transfer_bytes, navigations, segments}，
+            没有数据时返回空字典
+        """
+        if not self.segments:
+            return {}
+
+        def worst(key):
+            values = [segment[key] for segment in self.segments if segment[key] is not None]
+            return max(values) if values else None
+
+        return {
+            'lcp_ms': worst('lcp_ms'),
+            'cls': worst('cls'),
+            'inp_ms': worst('inp_ms'),
+            'long_tasks': sum(segment['long_tasks'] for segment in self.segments),
+            'long_task_ms': sum(segment['long_task_ms'] for segment in self.segments),
+            'load_ms': worst('load_ms'),
+            'api_max_ms': worst('api_max_ms'),
+            'transfer_bytes': sum(segment['transfer_bytes'] for segment in self.segments),
+            'navigations': sum(1 for segment in self.segments if segment['kind'] == 'soft'),
+            'segments': list(self.segments),
+        }
+
     async def collect_metrics(self, page: Page, test_name: str) -> Dict:
-        """收集页面性能指标
-        
+        """收集页面性能指标（用例结束时调用）
+
         Args:
             page: Playwright页面对象
             test_name: 测试用例名称
-            
+
         Returns:
             性能指标字典
         """
         try:
-            # 获取性能指标
+            await self.flush(page, 'teardown')
+            # 当前文档的导航计时（Navigation Timing Level 2，相对于导航开始的毫秒数）
             metrics = await page.evaluate("""
                 () => {
-                    const perfData = window.performance.timing;
-                    const navigation = perfData;
-                    
+                    const navigation = performance.getEntriesByType('navigation')[0];
+                    if (!navigation) return {};
                     return {
                         // 页面加载时间
-                        domContentLoaded: navigation.domContentLoadedEventEnd - navigation.navigationStart,
-                        loadComplete: navigation.loadEventEnd - navigation.navigationStart,
-                        
+                        domContentLoaded: navigation.domContentLoadedEventEnd,
+                        loadComplete: navigation.loadEventEnd,
+
                         // 资源加载时间
-                        domInteractive: navigation.domInteractive - navigation.navigationStart,
-                        domComplete: navigation.domComplete - navigation.navigationStart,
-                        
+                        domInteractive: navigation.domInteractive,
+                        domComplete: navigation.domComplete,
+
                         // 网络时间
                         dns: navigation.domainLookupEnd - navigation.domainLookupStart,
                         tcp: navigation.connectEnd - navigation.connectStart,
                         request: navigation.responseStart - navigation.requestStart,
                         response: navigation.responseEnd - navigation.responseStart,
-                        
+
                         // 渲染时间
                         render: navigation.domContentLoadedEventEnd - navigation.responseEnd,
                         processing: navigation.domComplete - navigation.domInteractive
                     };
                 }
             """)
-            
+
             # 获取资源加载信息
             resources = await page.evaluate("""
                 () => {
@@ -68,50 +343,50 @@ class PerformanceMonitor:
                     }));
                 }
             """)
-            
+
             metrics['resources'] = resources
             metrics['resource_count'] = len(resources)
             metrics['total_size'] = sum(r.get('size', 0) for r in resources)
-            
+            metrics['vitals'] = self.vitals_summary()
+
             # 保存指标
             self.metrics[test_name] = metrics
-            
+
             return metrics
         except Exception as e:
             print(f"收集性能指标失败: {e}")
             return {}
-    
+
     def get_metrics(self, test_name: str) -> Optional[Dict]:
         """获取测试用例的性能指标
-        
+
         Args:
             test_name: 测试用例名称
-            
+
         Returns:
             性能指标字典
         """
         return self.metrics.get(test_name)
-    
+
     def get_all_metrics(self) -> Dict[str, Dict]:
         """获取所有性能指标
-        
+
         Returns:
             所有指标字典
         """
         return self.metrics
-    
+
     def export_metrics(self, output_path: str):
         """导出性能指标到JSON文件
-        
+
         Args:
             output_path: 输出文件路径
         """
         import json
         from pathlib import Path
-        
+
         output_path = Path(output_path)
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        
+
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(self.metrics, f, ensure_ascii=False, indent=2)
-
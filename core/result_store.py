@@ -0,0 +1,247 @@
+"""
+测试结果本地存储
+基于SQLite保存每次执行的汇总结果和每个用例的结果，按执行时间、模块和用例建立索引，趋势查询和统计直接走索引范围扫描
+
+@File  : result_store.py
+@Author: shenyuan
+"""
+import json
+import logging
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
+
+RESULT_COLUMNS = (
+    'execution_time', 'modules', 'total', 'passed', 'failed',
+    'skipped', 'duration', 'pass_rate', 'report_path'
+)
+
+CASE_COLUMNS = (
+    'run_id', 'execution_time', 'nodeid', 'module', 'outcome',
+    'reruns', 'duration', 'error_signature'
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS test_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    execution_time TEXT NOT NULL,
+    modules TEXT,
+    total INTEGER DEFAULT 0,
+    passed INTEGER DEFAULT 0,
+    failed INTEGER DEFAULT 0,
+    skipped INTEGER DEFAULT 0,
+    duration REAL DEFAULT 0,
+    pass_rate REAL DEFAULT 0,
+    report_path TEXT,
+    source TEXT UNIQUE,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_test_results_execution_time ON test_results (execution_time);
+CREATE INDEX IF NOT EXISTS idx_test_results_modules ON test_results (modules, execution_time);
+CREATE TABLE IF NOT EXISTS test_case_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL,
+    execution_time TEXT NOT NULL,
+    nodeid TEXT NOT NULL,
+    module TEXT,
+    outcome TEXT,
+    reruns INTEGER DEFAULT 0,
+    duration REAL DEFAULT 0,
+    error_signature TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_case_results_execution_time ON test_case_results (execution_time);
+CREATE INDEX IF NOT EXISTS idx_case_results_nodeid ON test_case_results (nodeid, execution_time);
+CREATE INDEX IF NOT EXISTS idx_case_results_run_id ON test_case_results (run_id);
+"""
+
+
+class ResultStore:
+    """测试结果本地存储
+
+    - 执行时间以ISO格式字符串保存，字符串顺序与时间顺序一致，可直接按索引做范围查询
+    - source 记录数据来源（历史JSON文件名或报告路径），用于导入时去重，已导入的文件不会再次解析
+    - 每次操作使用独立连接，后台执行线程和界面线程可以同时访问
+    """
+
+    def __init__(self, db_path: str = "test_results/results.db"):
+        """初始化存储
+
+        Args:
+            db_path: SQLite数据库文件路径
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            # WAL模式：写入时不阻塞读取
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """打开一个连接，正常结束时提交，异常时回滚"""
+        conn = sqlite3.connect(str(self.db_path), timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _normalize_time(value: Any) -> str:
+        """统一执行时间格式（ISO字符串）"""
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return str(value)
+
+    def append(self, result: Dict[str, Any], source: Optional[str] = None) -> Optional[int]:
+        """追加一条执行结果
+
+        Args:
+            result: 结果字典（字段见 RESULT_COLUMNS）
+            source: 数据来源标识，相同来源只会保存一次
+
+        Returns:
+            新记录id，来源重复时返回None
+        """
+        values = [result.get(column) for column in RESULT_COLUMNS]
+        values[0] = self._normalize_time(values[0])
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"INSERT OR IGNORE INTO test_results ({', '.join(RESULT_COLUMNS)}, source) "
+                f"VALUES ({', '.join('?' * (len(RESULT_COLUMNS) + 1))})",
+                (*values, source)
+            )
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def append_cases(self, rows: List[Dict[str, Any]]) -> int:
+        """批量追加用例结果（一次事务、一条executemany）
+
+        Args:
+            rows: 用例结果字典列表（字段见 CASE_COLUMNS）
+
+        Returns:
+            写入条数
+        """
+        if not rows:
+            return 0
+        params = []
+        for row in rows:
+            values = [row.get(column) for column in CASE_COLUMNS]
+            values[1] = self._normalize_time(values[1])
+            params.append(values)
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT INTO test_case_results ({', '.join(CASE_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(CASE_COLUMNS))})",
+                params
+            )
+        return len(params)
+
+    def query_cases(self, start: Optional[datetime] = None, nodeid: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按时间范围查询用例结果（按用例、执行时间排序，便于逐个用例分析）
+
+        Args:
+            start: 起始时间，为None时不限制
+            nodeid: 只返回该用例的结果
+
+        Returns:
+            用例结果字典列表
+        """
+        sql = f"SELECT {', '.join(CASE_COLUMNS)} FROM test_case_results WHERE execution_time >= ?"
+        params: List[Any] = [self._normalize_time(start) if start else '']
+        if nodeid is not None:
+            sql += " AND nodeid = ?"
+            params.append(nodeid)
+        sql += " ORDER BY nodeid, execution_time"
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def is_empty(self) -> bool:
+        """是否还没有任何记录"""
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM test_results LIMIT 1").fetchone() is None
+
+    def query(self, start: Optional[datetime] = None, limit: int = 100,
+              modules: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按时间范围查询执行结果（按执行时间倒序）
+
+        Args:
+            start: 起始时间，为None时不限制
+            limit: 最多返回条数
+            modules: 只返回该模块组合的结果
+
+        Returns:
+            结果字典列表
+        """
+        sql = f"SELECT {', '.join(RESULT_COLUMNS)} FROM test_results WHERE execution_time >= ?"
+        params: List[Any] = [self._normalize_time(start) if start else '']
+        if modules is not None:
+            sql += " AND modules = ?"
+            params.append(modules)
+        sql += " ORDER BY execution_time DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def statistics(self, start: Optional[datetime] = None) -> Dict[str, Any]:
+        """按时间范围汇总统计（在数据库中聚合，不加载明细）
+
+        Args:
+            start: 起始时间，为None时不限制
+
+        Returns:
+            {total_executions, avg_pass_rate, avg_duration, total_tests, total_passed, total_failed}
+        """
+        sql = """
+        SELECT COUNT(*) AS total_executions,
+               COALESCE(AVG(pass_rate), 0) AS avg_pass_rate,
+               COALESCE(AVG(duration), 0) AS avg_duration,
+               COALESCE(SUM(total), 0) AS total_tests,
+               COALESCE(SUM(passed), 0) AS total_passed,
+               COALESCE(SUM(failed), 0) AS total_failed
+        FROM test_results WHERE execution_time >= ?
+        """
+        with self._connect() as conn:
+            row = conn.execute(sql, (self._normalize_time(start) if start else '',)).fetchone()
+        return dict(row)
+
+    def import_json_dir(self, results_dir: Path) -> int:
+        """导入历史JSON结果文件（已导入的文件按文件名跳过，不再打开）
+
+        Args:
+            results_dir: result_*.json 所在目录
+
+        Returns:
+            本次导入的条数
+        """
+        results_dir = Path(results_dir)
+        if not results_dir.exists():
+            return 0
+        with self._connect() as conn:
+            imported = {row[0] for row in conn.execute("SELECT source FROM test_results WHERE source IS NOT NULL")}
+
+        count = 0
+        for result_file in results_dir.glob("result_*.json"):
+            if result_file.name in imported:
+                continue
+            try:
+                with open(result_file, 'r', encoding='utf-8') as f:
+                    result = json.load(f)
+                if self.append(result, source=result_file.name):
+                    count += 1
+            except Exception as e:
+                logger.warning(f"[ResultStore] 导入结果文件失败 {result_file}: {e}")
+        if count:
+            logger.info(f"[ResultStore] 已导入 {count} 条历史结果")
+        return count
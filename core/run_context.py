@@ -0,0 +1,77 @@
+"""
+执行上下文
+提供当前pytest进程的worker标识和运行参数覆盖，保证并行执行（pytest-xdist）时各worker的输出互不冲突
+
+@File  : run_context.py
+@Author: shenyuan
+"""
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+
+def get_worker_id() -> str:
+    """获取当前进程的worker标识
+
+    Returns:
+        pytest-xdist 的 worker id（如 gw0），串行执行时返回 "master"
+    """
+    return os.environ.get('PYTEST_XDIST_WORKER', 'master')
+
+
+def is_parallel_worker() -> bool:
+    """当前进程是否为 pytest-xdist 的 worker 进程"""
+    return 'PYTEST_XDIST_WORKER' in os.environ
+
+
+def strip_xdist_group(nodeid: str) -> str:
+    """去掉 --dist loadgroup 追加在nodeid后的分组名（test_x.py::test_a@group -> test_x.py::test_a）
+
+    Args:
+        nodeid: pytest nodeid
+
+    Returns:
+        原始nodeid（用于历史记录、报告等需要稳定标识的场景）
+    """
+    return re.sub(r'(::[^@]+)@[^\[\]/:@]+$', r'\1', nodeid)
+
+
+def worker_output_dir(base_dir: str) -> Path:
+    """获取当前worker独占的输出目录
+
+    并行执行时返回 base_dir/<worker_id>，串行执行时直接返回 base_dir，
+    这样各worker写入的截图、视频等文件不会因为同名而互相覆盖。
+
+    Args:
+        base_dir: 基础输出目录
+
+    Returns:
+        输出目录路径（已创建）
+    """
+    path = Path(base_dir)
+    if is_parallel_worker():
+        path = path / get_worker_id()
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def get_env_flag(name: str, default: Optional[bool] = None) -> Optional[bool]:
+    """读取布尔类型的环境变量（"1"/"true"/"yes" 为真，"0"/"false"/"no" 为假）
+
+    Args:
+        name: 环境变量名
+        default: 未设置或无法识别时的默认值
+
+    Returns:
+        布尔值或默认值
+    """
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    value = value.strip().lower()
+    if value in ('1', 'true', 'yes', 'on'):
+        return True
+    if value in ('0', 'false', 'no', 'off'):
+        return False
+    return default
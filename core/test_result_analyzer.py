@@ -1,29 +1,88 @@
 """
 测试结果趋势分析器
-存储和分析历史测试结果
+存储和分析历史测试结果（本地SQLite为主存储，JSON文件和MySQL为可选的同步输出）
 
 @File  : test_result_analyzer.py
 @Author: shenyuan
 """
+import hashlib
 import json
+import re
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 from core.db_client import DBClient
+from core.result_store import ResultStore
+
+
+def error_signature(error: str) -> str:
+    """计算错误签名：取最后一条"E"行（或最后一行）的异常信息，去掉数字、地址和引号内容后求哈希
+
+    同一类失败（例如同一个元素等待超时）即使超时时间、行号不同也会得到相同签名。
+
+    Args:
+        error: 错误信息/堆栈
+
+    Returns:
+        12位签名，无错误时返回空字符串
+    """
+    if not error:
+        return ''
+    lines = [line.strip() for line in error.strip().splitlines() if line.strip()]
+    error_lines = [line for line in lines if line.startswith('E ')]
+    message = (error_lines[-1] if error_lines else lines[-1])[:300]
+    message = re.sub(r'0x[0-9a-fA-F]+', '0x', message)
+    message = re.sub(r'\d+', 'N', message)
+    message = re.sub(r'(["\']).*?\1', '"…"', message)
+    return hashlib.sha1(message.encode('utf-8')).hexdigest()[:12]
+
+
+def case_module(nodeid: str) -> str:
+    """从nodeid中提取模块名（test_cases/<模块>/test_xxx.py::...）"""
+    parts = nodeid.split('::')[0].split('/')
+    if len(parts) >= 3 and parts[0] == 'test_cases':
+        return parts[1]
+    return parts[0] if len(parts) > 1 else ''
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """线性插值计算百分位数（sorted_values已升序）"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
 
 
 class TestResultAnalyzer:
-    """测试结果分析器"""
+    """测试结果分析器
+    
+    查询统一走本地 ResultStore（按执行时间索引），不再逐个扫描JSON文件和HTML报告；
+    保存时同时写入JSON目录（json_sink）和MySQL（提供db_client时），便于外部系统使用。
+    """
     
-    def __init__(self, db_client: Optional[DBClient] = None):
+    def __init__(self, db_client: Optional[DBClient] = None, json_sink: bool = True,
+                 store: Optional[ResultStore] = None):
         """初始化分析器
         
         Args:
-            db_client: 数据库客户端（可选，如果提供则使用数据库存储）
+            db_client: 数据库客户端（可选，如果提供则同时保存到MySQL）
+            json_sink: 是否同时保存为 test_results/result_*.json 文件
+            store: 本地结果存储，默认使用 test_results/results.db
         """
         self.db_client = db_client
+        self.json_sink = json_sink
         self.results_dir = Path("test_results")
         self.results_dir.mkdir(exist_ok=True)
+        self.store = store or ResultStore(str(self.results_dir / "results.db"))
+        self._reports_imported = False
+        
+        # 导入尚未入库的历史JSON文件（已导入的只比对文件名）
+        try:
+            self.store.import_json_dir(self.results_dir)
+        except Exception as e:
+            print(f"导入历史测试结果失败: {e}")
         
         # 如果使用数据库，创建结果表
         if self.db_client:
@@ -56,6 +115,26 @@ class TestResultAnalyzer:
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
                 """
                 self.db_client.execute_update(create_table_sql)
+            
+            if not self.db_client.table_exists('test_case_results'):
+                # 创建用例结果表（每次执行每个用例一行）
+                create_table_sql = """
+                CREATE TABLE test_case_results (
+                    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                    run_id INT NOT NULL,
+                    execution_time DATETIME NOT NULL,
+                    nodeid VARCHAR(500) NOT NULL,
+                    module VARCHAR(100),
+                    outcome VARCHAR(20),
+                    reruns INT DEFAULT 0,
+                    duration FLOAT DEFAULT 0,
+                    error_signature VARCHAR(20),
+                    INDEX idx_run_id (run_id),
+                    INDEX idx_nodeid_time (nodeid(191), execution_time),
+                    INDEX idx_execution_time (execution_time)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+                """
+                self.db_client.execute_update(create_table_sql)
         except Exception as e:
             print(f"初始化数据库表失败: {e}")
     
@@ -67,7 +146,8 @@ class TestResultAnalyzer:
         failed: int,
         skipped: int,
         duration: float,
-        report_path: Optional[str] = None
+        report_path: Optional[str] = None,
+        test_cases: Optional[List[Dict]] = None
     ):
         """保存测试结果
         
@@ -79,6 +159,7 @@ class TestResultAnalyzer:
             skipped: 跳过数
             duration: 执行时长
             report_path: 报告路径
+            test_cases: 用例结果列表（结果流汇总的 test_cases：name/status/duration/reruns/error）
         """
         execution_time = datetime.now()
         pass_rate = (passed / total * 100) if total > 0 else 0
@@ -95,10 +176,17 @@ class TestResultAnalyzer:
             'report_path': report_path
         }
         
-        # 保存到文件
-        result_file = self.results_dir / f"result_{execution_time.strftime('%Y%m%d_%H%M%S')}.json"
-        with open(result_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
+        # 保存到本地存储（source与JSON文件名一致，避免之后重复导入）
+        result_name = f"result_{execution_time.strftime('%Y%m%d_%H%M%S')}.json"
+        run_id = self.store.append(result, source=result_name)
+        case_rows = self._build_case_rows(run_id, execution_time, test_cases or [])
+        if run_id and case_rows:
+            self.store.append_cases(case_rows)
+        
+        # 可选：保存到文件
+        if self.json_sink:
+            with open(self.results_dir / result_name, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
         
         # 如果使用数据库，也保存到数据库
         if self.db_client:
@@ -122,9 +210,45 @@ class TestResultAnalyzer:
                         report_path
                     )
                 )
+                if case_rows:
+                    # 同一连接上取刚插入的执行记录id，用例结果批量写入
+                    mysql_run_id = self.db_client.execute_query("SELECT LAST_INSERT_ID() AS id")[0]['id']
+                    self.db_client.execute_many(
+                        """
+                        INSERT INTO test_case_results
+                        (run_id, execution_time, nodeid, module, outcome, reruns, duration, error_signature)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                        """,
+                        [
+                            (mysql_run_id, execution_time, row['nodeid'], row['module'], row['outcome'],
+                             row['reruns'], row['duration'], row['error_signature'])
+                            for row in case_rows
+                        ]
+                    )
             except Exception as e:
                 print(f"保存测试结果到数据库失败: {e}")
     
+    @staticmethod
+    def _build_case_rows(run_id: Optional[int], execution_time: datetime, test_cases: List[Dict]) -> List[Dict]:
+        """把用例结果转换为用例结果表的行"""
+        rows = []
+        for case in test_cases:
+            nodeid = case.get('name') or case.get('nodeid')
+            if not nodeid:
+                continue
+            outcome = case.get('status') or case.get('outcome') or ''
+            rows.append({
+                'run_id': run_id,
+                'execution_time': execution_time,
+                'nodeid': nodeid,
+                'module': case_module(nodeid),
+                'outcome': outcome,
+                'reruns': int(case.get('reruns') or 0),
+                'duration': float(case.get('duration') or 0),
+                'error_signature': error_signature(case.get('error', '')) if outcome in ('failed', 'error') else ''
+            })
+        return rows
+    
     def get_trend_data(self, days: int = 30) -> List[Dict]:
         """获取趋势数据
         
@@ -136,53 +260,23 @@ class TestResultAnalyzer:
         """
         start_date = datetime.now() - timedelta(days=days)
         
-        if self.db_client:
-            # 从数据库查询
-            try:
-                sql = """
-                SELECT * FROM test_results 
-                WHERE execution_time >= %s 
-                ORDER BY execution_time DESC
-                """
-                results = self.db_client.execute_query(sql, (start_date,))
-                return [
-                    {
-                        'execution_time': r['execution_time'].isoformat() if hasattr(r['execution_time'], 'isoformat') else str(r['execution_time']),
-                        'modules': r['modules'],
-                        'total': r['total'],
-                        'passed': r['passed'],
-                        'failed': r['failed'],
-                        'skipped': r['skipped'],
-                        'duration': r['duration'],
-                        'pass_rate': r['pass_rate'],
-                        'report_path': r['report_path']
-                    }
-                    for r in results
-                ]
-            except Exception as e:
-                print(f"从数据库查询趋势数据失败: {e}")
-        
-        # 从文件查询
-        results = []
-        for result_file in sorted(self.results_dir.glob("result_*.json"), reverse=True):
-            try:
-                with open(result_file, 'r', encoding='utf-8') as f:
-                    result = json.load(f)
-                    exec_time = datetime.fromisoformat(result['execution_time'])
-                    if exec_time >= start_date:
-                        results.append(result)
-            except:
-                continue
-        
-        # 如果文件结果为空，尝试从已有报告中解析
-        if not results:
-            results = self._parse_from_reports()
+        # 本地存储为空时，从已有报告中解析一次并入库，之后不再重复解析
+        if not self._reports_imported and self.store.is_empty():
+            self._reports_imported = True
+            for result in self._parse_from_reports():
+                self.store.append(result, source=result['report_path'])
         
-        return results[:100]  # 最多返回100条
+        return self.store.query(start_date, limit=100)  # 最多返回100条
     
     def _parse_from_reports(self) -> List[Dict]:
-        """从已有报告中解析数据"""
+        """从已有报告中解析数据
+
+        报告列表和执行时间取自报告索引；索引中已有统计信息的报告直接使用，
+        只有统计信息未知的（索引建立前的旧报告）才解析HTML。
+        每次执行同时生成自定义报告和pytest报告，只取自定义报告，避免重复计数。
+        """
         from utils.report_parser import ReportParser
+        from utils.report_catalog import ReportCatalog
         
         results = []
         reports_dir = Path("reports")
@@ -190,41 +284,27 @@ class TestResultAnalyzer:
             return results
         
         parser = ReportParser()
+        catalog = ReportCatalog(str(reports_dir))
         
-        # 查找所有报告文件
-        report_files = sorted(
-            list(reports_dir.glob("WebUI自动化测试报告_*.html")) + list(reports_dir.glob("pytest测试报告_*.html")),
-            key=lambda p: p.stat().st_mtime,
-            reverse=True
-        )[:30]  # 最多解析30个报告
-        
-        for report_file in report_files:
+        for report in catalog.recent('webui', limit=30):  # 最多解析30个报告
+            report_file = catalog.path_of(report['path'])
             try:
-                # 从文件名提取时间
-                # 格式：WebUI自动化测试报告_20251230_105832.html
-                name_parts = report_file.stem.split('_')
-                if len(name_parts) >= 3:
-                    date_str = name_parts[-2]  # 20251230
-                    time_str = name_parts[-1]  # 105832
-                    try:
-                        exec_time = datetime.strptime(f"{date_str}_{time_str}", "%Y%m%d_%H%M%S")
-                    except:
-                        exec_time = datetime.fromtimestamp(report_file.stat().st_mtime)
+                if report['total'] is not None:
+                    stats = report
+                elif report_file.exists():
+                    stats = parser.parse_html_report(report_file)
                 else:
-                    exec_time = datetime.fromtimestamp(report_file.stat().st_mtime)
-                
-                # 解析报告
-                stats = parser.parse_html_report(report_file)
+                    continue
                 if stats:
                     results.append({
-                        'execution_time': exec_time.isoformat(),
-                        'modules': 'unknown',
-                        'total': stats.get('total', 0),
-                        'passed': stats.get('passed', 0),
-                        'failed': stats.get('failed', 0),
-                        'skipped': stats.get('skipped', 0),
-                        'duration': stats.get('duration', 0),
-                        'pass_rate': (stats.get('passed', 0) / stats.get('total', 1) * 100) if stats.get('total', 0) > 0 else 0,
+                        'execution_time': report['created_at'],
+                        'modules': report['modules'] or 'unknown',
+                        'total': stats.get('total') or 0,
+                        'passed': stats.get('passed') or 0,
+                        'failed': stats.get('failed') or 0,
+                        'skipped': stats.get('skipped') or 0,
+                        'duration': stats.get('duration') or 0,
+                        'pass_rate': (stats.get('passed') or 0) / stats['total'] * 100 if stats.get('total') else 0,
                         'report_path': str(report_file)
                     })
             except Exception as e:
@@ -242,9 +322,10 @@ class TestResultAnalyzer:
         Returns:
             统计字典
         """
-        trend_data = self.get_trend_data(days)
+        stats = self.store.statistics(datetime.now() - timedelta(days=days))
+        total_executions = stats['total_executions']
         
-        if not trend_data:
+        if not total_executions:
             return {
                 'total_executions': 0,
                 'avg_pass_rate': 0,
@@ -254,12 +335,11 @@ class TestResultAnalyzer:
                 'total_failed': 0
             }
         
-        total_executions = len(trend_data)
-        avg_pass_rate = sum(r['pass_rate'] for r in trend_data) / total_executions
-        avg_duration = sum(r['duration'] for r in trend_data) / total_executions
-        total_tests = sum(r['total'] for r in trend_data)
-        total_passed = sum(r['passed'] for r in trend_data)
-        total_failed = sum(r['failed'] for r in trend_data)
+        avg_pass_rate = stats['avg_pass_rate']
+        avg_duration = stats['avg_duration']
+        total_tests = stats['total_tests']
+        total_passed = stats['total_passed']
+        total_failed = stats['total_failed']
         
         return {
             'total_executions': total_executions,
@@ -270,4 +350,130 @@ class TestResultAnalyzer:
             'total_failed': total_failed,
             'overall_pass_rate': round((total_passed / total_tests * 100) if total_tests > 0 else 0, 2)
         }
-
+    
+    def get_case_statistics(self, days: int = 30, min_runs: int = 1) -> List[Dict[str, Any]]:
+        """获取每个用例的历史统计
+        
+        Args:
+            days: 统计最近N天的数据
+            min_runs: 至少执行过的次数
+            
+        Returns:
+            用例统计列表（按p95耗时倒序），每项包含：
+            nodeid、module、runs、passed、failed、pass_rate、flaky_runs、flake_rate、
+            p50、p95、last_outcome、last_duration、top_error_signature
+        """
+        rows = self.store.query_cases(datetime.now() - timedelta(days=days))
+        stats = []
+        for nodeid, history in self._group_by_nodeid(rows):
+            if len(history) < min_runs:
+                continue
+            durations = sorted(r['duration'] or 0 for r in history if r['outcome'] == 'passed')
+            passed = sum(1 for r in history if r['outcome'] == 'passed')
+            failed = sum(1 for r in history if r['outcome'] in ('failed', 'error'))
+            # 不稳定：重试后才通过，或最近的结果在通过/失败之间来回切换
+            flaky_runs = sum(1 for r in history if r['outcome'] == 'passed' and (r['reruns'] or 0) > 0)
+            flips = sum(
+                1 for prev, cur in zip(history, history[1:])
+                if (prev['outcome'] == 'passed') != (cur['outcome'] == 'passed')
+                and prev['outcome'] != 'skipped' and cur['outcome'] != 'skipped'
+            )
+            signatures: Dict[str, int] = {}
+            for r in history:
+                if r['error_signature']:
+                    signatures[r['error_signature']] = signatures.get(r['error_signature'], 0) + 1
+            stats.append({
+                'nodeid': nodeid,
+                'module': history[-1]['module'],
+                'runs': len(history),
+                'passed': passed,
+                'failed': failed,
+                'pass_rate': round(passed / len(history) * 100, 2),
+                'flaky_runs': flaky_runs,
+                'flips': flips,
+                'flake_rate': round((flaky_runs + flips) / len(history) * 100, 2),
+                'p50': round(_percentile(durations, 0.5), 2),
+                'p95': round(_percentile(durations, 0.95), 2),
+                'last_outcome': history[-1]['outcome'],
+                'last_duration': round(history[-1]['duration'] or 0, 2),
+                'top_error_signature': max(signatures, key=signatures.get) if signatures else ''
+            })
+        stats.sort(key=lambda item: item['p95'], reverse=True)
+        return stats
+    
+    def get_flaky_cases(self, days: int = 30, min_runs: int = 3, threshold: float = 10.0) -> List[Dict[str, Any]]:
+        """获取不稳定用例（flake_rate 不低于阈值，按不稳定程度倒序）
+        
+        Args:
+            days: 统计最近N天的数据
+            min_runs: 至少执行过的次数（次数太少无法判断）
+            threshold: flake_rate 阈值（百分比）
+            
+        Returns:
+            用例统计列表
+        """
+        cases = [c for c in self.get_case_statistics(days, min_runs) if c['flake_rate'] >= threshold]
+        return sorted(cases, key=lambda c: c['flake_rate'], reverse=True)
+    
+    def detect_regressions(self, days: int = 30, baseline_runs: int = 3, slowdown_factor: float = 1.5) -> List[Dict[str, Any]]:
+        """检测最近一次执行相对历史基线的回归
+        
+        - new_failure：最近一次失败，而之前连续 baseline_runs 次都通过
+        - new_error_signature：最近一次失败的错误签名在历史中从未出现过
+        - slowdown：最近一次通过但耗时超过历史p95，且超过历史p50的 slowdown_factor 倍
+        
+        Args:
+            days: 分析最近N天的数据
+            baseline_runs: 基线至少需要的历史执行次数
+            slowdown_factor: 变慢判定倍数
+            
+        Returns:
+            回归列表，每项包含 nodeid、type、detail
+        """
+        rows = self.store.query_cases(datetime.now() - timedelta(days=days))
+        regressions = []
+        for nodeid, history in self._group_by_nodeid(rows):
+            if len(history) <= baseline_runs:
+                continue
+            latest, previous = history[-1], history[:-1]
+            if latest['outcome'] in ('failed', 'error'):
+                if all(r['outcome'] == 'passed' for r in previous[-baseline_runs:]):
+                    regressions.append({
+                        'nodeid': nodeid,
+                        'type': 'new_failure',
+                        'detail': f"之前连续{baseline_runs}次通过，最近一次{latest['outcome']}"
+                    })
+                elif latest['error_signature'] and latest['error_signature'] not in {r['error_signature'] for r in previous}:
+                    regressions.append({
+                        'nodeid': nodeid,
+                        'type': 'new_error_signature',
+                        'detail': f"出现新的错误类型（签名 {latest['error_signature']}）"
+                    })
+            elif latest['outcome'] == 'passed':
+                durations = sorted(r['duration'] or 0 for r in previous if r['outcome'] == 'passed')
+                if len(durations) < baseline_runs:
+                    continue
+                p50 = _percentile(durations, 0.5)
+                p95 = _percentile(durations, 0.95)
+                current = latest['duration'] or 0
+                if current > p95 and current > p50 * slowdown_factor:
+                    regressions.append({
+                        'nodeid': nodeid,
+                        'type': 'slowdown',
+                        'detail': f"耗时 {current:.2f}秒，历史p50 {p50:.2f}秒 / p95 {p95:.2f}秒"
+                    })
+        return regressions
+    
+    @staticmethod
+    def _group_by_nodeid(rows: List[Dict]):
+        """把按nodeid、执行时间排序的行分组（单次遍历）"""
+        current_id = None
+        history: List[Dict] = []
+        for row in rows:
+            if row['nodeid'] != current_id:
+                if history:
+                    yield current_id, history
+                current_id, history = row['nodeid'], []
+            history.append(row)
+        if history:
+            yield current_id, history
@@ -12,6 +12,8 @@ from typing import Dict, List, Optional, Callable
 from pathlib import Path
 import yaml
 
+from core.artifact_store import run_retention
+
 try:
     from apscheduler.schedulers.background import BackgroundScheduler
     from apscheduler.triggers.cron import CronTrigger
@@ -51,6 +53,11 @@ class TestScheduler:
         with open(config_file, 'r', encoding='utf-8') as f:
             config = yaml.safe_load(f)
         
+        # 产物清理任务（artifacts.retention.schedule_hours 为0时不定时清理）
+        retention = (config.get('artifacts', {}) or {}).get('retention', {}) or {}
+        if retention.get('schedule_hours'):
+            self.add_retention_job(hours=float(retention['schedule_hours']))
+        
         schedules = config.get('schedules', [])
         for schedule in schedules:
             if schedule.get('enabled', False):
@@ -122,6 +129,33 @@ class TestScheduler:
         self.jobs[job_id] = name
         return job_id
     
+    def add_retention_job(self, hours: float = 24, job_id: str = 'artifact_retention') -> str:
+        """添加产物清理任务（按 artifacts.retention 清理截图、视频和报告）
+        
+        Args:
+            hours: 执行间隔（小时）
+            job_id: 任务ID
+            
+        Returns:
+            任务ID
+        """
+        def run_cleanup():
+            """执行清理"""
+            try:
+                run_retention(self.config_path)
+            except Exception as e:
+                print(f"产物清理任务执行失败: {e}")
+        
+        self.scheduler.add_job(
+            func=run_cleanup,
+            trigger=IntervalTrigger(hours=hours),
+            id=job_id,
+            name='产物清理',
+            replace_existing=True
+        )
+        self.jobs[job_id] = '产物清理'
+        return job_id
+    
     def remove_schedule(self, job_id: str) -> bool:
         """删除调度任务
         
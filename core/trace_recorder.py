@@ -0,0 +1,147 @@
+"""
+Playwright追踪录制
+使用 context.tracing 录制用例的操作截图、DOM快照和源码，保存为zip文件，
+可以用 playwright show-trace 或 https://trace.playwright.dev 打开，逐步回放失败前页面上发生了什么。
+比全程录屏开销小，并且可以只保留失败用例或只在第一次重试时录制
+
+@File  : trace_recorder.py
+@Author: shenyuan
+"""
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+import yaml
+
+from core.artifact_store import FAILED_MARKER
+from core.run_context import strip_xdist_group, worker_output_dir
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
+# 控制台通过该环境变量指定本次执行的追踪模式，优先于配置文件
+TRACE_MODE_ENV = 'WEBUI_TRACE_MODE'
+
+
+class TraceRecorder:
+    """Playwright追踪录制
+
+    配置（config/settings.yaml 的 playwright.tracing）：
+    - mode:
+        off（默认）不录制；
+        on 每次执行都录制并保留；
+        retain-on-failure 每次执行都录制，只保留失败的；
+        on-first-retry 只在第一次重试时录制（配合 pytest-rerunfailures，第一次执行不产生开销）
+    - dir: 追踪文件目录：<dir>/<测试文件>/<用例名>-attempt<N>.zip，失败的追踪文件名带 _FAILED 标记（清理时保留更久）
+    - screenshots / snapshots / sources: 是否录制操作截图、DOM快照、测试源码
+    """
+
+    MODES = ('off', 'on', 'retain-on-failure', 'on-first-retry')
+
+    def __init__(self, config_path: str = "config/settings.yaml"):
+        """初始化
+
+        Args:
+            config_path: 配置文件路径
+        """
+        tracing_config = self._load_config(config_path).get('playwright', {}).get('tracing', {}) or {}
+        mode = os.environ.get(TRACE_MODE_ENV) or tracing_config.get('mode') or 'off'
+        if mode not in self.MODES:
+            logger.warning(f"[Trace] 未知的追踪模式 {mode}，按 off 处理")
+            mode = 'off'
+        self.mode = mode
+        self.trace_dir = tracing_config.get('dir', 'traces')
+        self.screenshots = bool(tracing_config.get('screenshots', True))
+        self.snapshots = bool(tracing_config.get('snapshots', True))
+        self.sources = bool(tracing_config.get('sources', True))
+
+    @staticmethod
+    def _load_config(config_path: str) -> dict:
+        """加载配置文件"""
+        config_file = Path(config_path)
+        if not config_file.exists():
+            return {}
+
+        with open(config_file, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+
+    def should_record(self, attempt: int) -> bool:
+        """本次执行是否录制
+
+        Args:
+            attempt: 执行序号（item.execution_count，第一次执行为1，第一次重试为2）
+
+        Returns:
+            是否录制
+        """
+        if self.mode in ('on', 'retain-on-failure'):
+            return True
+        if self.mode == 'on-first-retry':
+            return attempt == 2
+        return False
+
+    def path_for(self, nodeid: str, attempt: int, failed: bool) -> Path:
+        """追踪文件路径（并行执行时每个worker使用独立的子目录）
+
+        Args:
+            nodeid: pytest nodeid
+            attempt: 执行序号
+            failed: 用例是否失败
+
+        Returns:
+            追踪文件路径
+        """
+        file_part, _, name_part = strip_xdist_group(nodeid).partition('::')
+        file_stem = Path(file_part).with_suffix('')
+        safe_name = re.sub(r'[^\w.-]+', '_', name_part or file_stem.name).strip('_')
+        marker = FAILED_MARKER if failed else ''
+        return worker_output_dir(self.trace_dir) / file_stem / f"{safe_name}-attempt{attempt}{marker}.zip"
+
+    async def start(self, context, nodeid: str, attempt: int) -> bool:
+        """开始录制（在创建页面之前调用，页面的首次导航也会被录制）
+
+        Args:
+            context: BrowserContext
+            nodeid: 当前用例nodeid（作为追踪标题）
+            attempt: 执行序号
+
+        Returns:
+            是否已开始录制
+        """
+        if not self.should_record(attempt):
+            return False
+        try:
+            await context.tracing.start(
+                title=f"{strip_xdist_group(nodeid)} (attempt {attempt})",
+                screenshots=self.screenshots,
+                snapshots=self.snapshots,
+                sources=self.sources
+            )
+        except Exception as e:
+            logger.warning(f"[Trace] 开始录制失败: {e}")
+            return False
+        return True
+
+    async def stop(self, context, nodeid: str, attempt: int, failed: bool) -> Optional[Path]:
+        """结束录制，按模式保存或丢弃
+
+        Args:
+            context: BrowserContext
+            nodeid: 当前用例nodeid
+            attempt: 执行序号
+            failed: 用例是否失败
+
+        Returns:
+            保存的追踪文件路径，丢弃时返回None
+        """
+        if self.mode == 'retain-on-failure' and not failed:
+            await context.tracing.stop()
+            return None
+        trace_path = self.path_for(nodeid, attempt, failed)
+        trace_path.parent.mkdir(parents=True, exist_ok=True)
+        await context.tracing.stop(path=str(trace_path))
+        logger.info(f"[Trace] 追踪文件已保存: {trace_path}")
+        return trace_path
@@ -1,98 +1,278 @@
 """
 视频录制模块
-失败用例自动录屏
+失败用例自动录屏：录制分辨率、缩放比例和启用的模块可配置，
+失败视频在后台进程中裁剪为最后N秒并重新压缩，通过用例的视频直接删除
 
 @File  : video_recorder.py
 @Author: shenyuan
 """
+import logging
+import os
+import re
+import shutil
+import subprocess
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional
-from playwright.async_api import BrowserContext
+from typing import Optional, Set
+
+import yaml
+from playwright.async_api import BrowserContext, Page
+
+from core.artifact_store import FAILED_MARKER
+from core.run_context import get_env_flag, strip_xdist_group, worker_output_dir
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
+# 控制台通过该环境变量开启/关闭视频录制，优先于配置文件
+VIDEO_ENV = 'ENABLE_VIDEO_RECORDING'
+
+# 后台视频处理进程池（每个pytest进程共享一个）
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_pending: Set[Future] = set()
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    """获取视频处理进程池（第一次使用时创建）"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=max(int(workers), 1))
+        return _executor
+
+
+def process_video(raw_path: str, target_path: str, trim_seconds: float, fps: int, crf: int) -> str:
+    """裁剪并压缩失败视频（在进程池中执行）
+
+    只保留最后 trim_seconds 秒（0表示不裁剪）并按 fps/crf 重新编码；
+    没有ffmpeg或处理失败时直接保留原视频。
+
+    Args:
+        raw_path: Playwright录制的原始视频
+        target_path: 处理后的视频路径
+        trim_seconds: 保留最后多少秒
+        fps: 输出帧率（0表示保持原帧率）
+        crf: VP9压缩质量（越大体积越小）
+
+    Returns:
+        最终的视频路径
+    """
+    raw, target = Path(raw_path), Path(target_path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg:
+        command = [ffmpeg, '-y', '-loglevel', 'error']
+        if trim_seconds > 0:
+            # -sseof：从文件末尾往前定位，不需要先读取视频时长
+            command += ['-sseof', f"-{trim_seconds}"]
+        command += ['-i', str(raw), '-an', '-c:v', 'libvpx-vp9', '-b:v', '0', '-crf', str(crf),
+                    '-deadline', 'realtime', '-cpu-used', '8']
+        if fps > 0:
+            command += ['-r', str(fps)]
+        tmp_path = target.with_name(f"{target.stem}.tmp{target.suffix}")
+        result = subprocess.run(command + [str(tmp_path)], capture_output=True, timeout=300)
+        if result.returncode == 0 and tmp_path.exists() and tmp_path.stat().st_size > 0:
+            os.replace(tmp_path, target)
+            raw.unlink(missing_ok=True)
+            return str(target)
+        tmp_path.unlink(missing_ok=True)
+    # 没有ffmpeg或处理失败：保留完整的原始视频
+    os.replace(raw, target)
+    return str(target)
+
+
+def _on_processed(future: Future):
+    """后台处理完成"""
+    _pending.discard(future)
+    try:
+        logger.info(f"[VideoRecorder] 失败用例视频已保存: {future.result()}")
+    except Exception as e:
+        logger.warning(f"[VideoRecorder] 处理失败用例视频出错: {e}")
+
+
+def wait_pending(timeout: Optional[float] = None):
+    """等待后台视频处理全部完成（会话结束时调用，避免进程退出时丢失视频）
+
+    Args:
+        timeout: 每个任务的最长等待时间（秒），None表示一直等待
+    """
+    for future in list(_pending):
+        try:
+            future.result(timeout=timeout)
+        except Exception:
+            pass
+
+
+def shutdown():
+    """等待后台处理完成并关闭进程池"""
+    global _executor
+    wait_pending()
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
 
 
 class VideoRecorder:
-    """视频录制器"""
-    
-    def __init__(self, video_dir: str = "videos"):
+    """视频录制器
+
+    配置（config/settings.yaml 的 playwright.video）：
+    - enabled: 是否录制（控制台通过 ENABLE_VIDEO_RECORDING 覆盖）
+    - modules: 只录制这些模块的用例（模块key，如 teaching），为空时录制所有模块
+    - size: 录制分辨率 {width, height}；未配置时按 viewport × scale 计算
+    - scale: 相对viewport的缩放比例（默认0.5，分辨率越低录制开销越小）
+    - trim_seconds: 失败视频只保留最后N秒（0表示保留完整视频）
+    - fps / crf: 失败视频重新压缩的帧率和质量
+    - keep_passed: 是否保留通过用例的视频（默认删除）
+    - workers: 后台处理视频的进程数
+    """
+
+    def __init__(self, video_dir: Optional[str] = None, config_path: str = "config/settings.yaml"):
         """初始化视频录制器
-        
+
         Args:
-            video_dir: 视频保存目录
+            video_dir: 视频保存目录，默认取配置（并行执行时每个worker使用独立的子目录）
+            config_path: 配置文件路径
         """
-        self.video_dir = Path(video_dir)
-        self.video_dir.mkdir(parents=True, exist_ok=True)
+        config = self._load_config(config_path)
+        playwright_config = config.get('playwright', {}) or {}
+        video_config = playwright_config.get('video', {}) or {}
+        self.enabled = get_env_flag(VIDEO_ENV, bool(video_config.get('enabled', False)))
+        self.modules = list(video_config.get('modules') or [])
+        self.video_dir = worker_output_dir(video_dir or video_config.get('dir', 'videos'))
+        viewport = playwright_config.get('viewport', {}) or {'width': 1920, 'height': 1080}
+        scale = float(video_config.get('scale', 0.5))
+        size = video_config.get('size') or {
+            'width': int(viewport['width'] * scale),
+            'height': int(viewport['height'] * scale)
+        }
+        # VP8编码要求宽高为偶数
+        self.size = {'width': int(size['width']) // 2 * 2, 'height': int(size['height']) // 2 * 2}
+        self.trim_seconds = float(video_config.get('trim_seconds', 30))
+        self.fps = int(video_config.get('fps', 10))
+        self.crf = int(video_config.get('crf', 40))
+        self.keep_passed = bool(video_config.get('keep_passed', False))
+        self.workers = int(video_config.get('workers', 2))
         self.current_video_path: Optional[Path] = None
-    
+
+    @staticmethod
+    def _load_config(config_path: str) -> dict:
+        """加载配置文件"""
+        config_file = Path(config_path)
+        if not config_file.exists():
+            return {}
+
+        with open(config_file, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+
+    def enabled_for(self, module: Optional[str]) -> bool:
+        """是否录制该模块的用例
+
+        Args:
+            module: 用例所属模块key
+
+        Returns:
+            是否录制
+        """
+        if not self.enabled:
+            return False
+        return not self.modules or module in self.modules
+
+    def path_for(self, nodeid: str, attempt: int, failed: bool) -> Path:
+        """视频文件路径，重试的每次执行和不同worker互不覆盖
+
+        Args:
+            nodeid: pytest nodeid
+            attempt: 执行序号（item.execution_count）
+            failed: 用例是否失败
+
+        Returns:
+            <dir>/<测试文件>/<用例名>-attempt<N>[_FAILED].webm
+        """
+        file_part, _, name_part = strip_xdist_group(nodeid).partition('::')
+        file_stem = Path(file_part).with_suffix('')
+        safe_name = re.sub(r'[^\w.-]+', '_', name_part or file_stem.name).strip('_')
+        marker = FAILED_MARKER if failed else ''
+        return self.video_dir / file_stem / f"{safe_name}-attempt{attempt}{marker}.webm"
+
     def get_recording_options(self, test_name: str) -> dict:
         """获取视频录制配置选项（用于在创建BrowserContext时使用）
-        
+
+        Playwright在原始视频目录中按随机文件名录制，用例结束后由 save_video 按用例重命名或删除。
+
         Args:
             test_name: 测试用例名称
-            
+
         Returns:
             视频录制配置字典
         """
-        # 生成视频文件名
-        video_file = self.video_dir / f"{test_name}.webm"
-        self.current_video_path = video_file
-        
-        # 返回视频录制选项（用于在创建context时传入）
         return {
-            'record_video_dir': str(self.video_dir),
-            'record_video_size': {'width': 1920, 'height': 1080}
+            'record_video_dir': str(self.video_dir / 'raw'),
+            'record_video_size': dict(self.size)
         }
-    
+
     def enable_recording(self, context: BrowserContext, test_name: str) -> Path:
         """启用视频录制（已废弃，请使用get_recording_options）
-        
+
         注意：此方法已废弃，因为BrowserContext不支持set_option。
         视频录制必须在创建BrowserContext时通过参数配置。
-        
+
         Args:
             context: BrowserContext对象（未使用）
             test_name: 测试用例名称
-            
+
         Returns:
             视频文件路径
         """
         # 生成视频文件名
         video_file = self.video_dir / f"{test_name}.webm"
         self.current_video_path = video_file
-        
+
         # 注意：无法在已创建的context上设置视频录制选项
         # 视频录制必须在创建context时通过record_video_dir参数配置
         print(f"[VideoRecorder] 警告：视频录制应在创建BrowserContext时配置，当前context无法启用录制")
-        
+
         return video_file
-    
-    def save_video(self, context: BrowserContext, test_name: str, failed: bool = False) -> Optional[Path]:
-        """保存视频（仅在失败时保存）
-        
+
+    async def save_video(self, page: Page, nodeid: str, attempt: int = 1, failed: bool = False) -> Optional[Path]:
+        """保存视频（需要在上下文关闭、视频写完之后调用）
+
+        通过的用例删除视频（keep_passed 时按用例重命名保留）；
+        失败的用例提交到后台进程裁剪、压缩，不阻塞后续用例。
+
         Args:
-            context: BrowserContext对象
-            test_name: 测试用例名称
+            page: 录制视频的页面
+            nodeid: 用例nodeid
+            attempt: 执行序号
             failed: 是否失败
-            
+
         Returns:
-            视频文件路径，如果未保存返回None
+            视频文件路径（失败视频为后台处理完成后的路径），未保存时返回None
         """
-        if not failed:
-            # 如果测试通过，删除视频文件
-            try:
-                if self.current_video_path and self.current_video_path.exists():
-                    self.current_video_path.unlink()
-            except:
-                pass
+        video = getattr(page, 'video', None) if page else None
+        if video is None:
             return None
-        
-        # 如果失败，保留视频文件
-        if self.current_video_path and self.current_video_path.exists():
-            # 重命名为包含失败标记的文件名
-            failed_video = self.video_dir / f"{test_name}_FAILED.webm"
-            if failed_video.exists():
-                failed_video.unlink()
-            self.current_video_path.rename(failed_video)
-            return failed_video
-        
-        return None
+        raw_path = Path(await video.path())
+        if not raw_path.exists():
+            return None
+
+        if not failed and not self.keep_passed:
+            raw_path.unlink(missing_ok=True)
+            return None
+
+        target = self.path_for(nodeid, attempt, failed)
+        self.current_video_path = target
+        if not failed:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(raw_path, target)
+            return target
 
+        future = _get_executor(self.workers).submit(
+            process_video, str(raw_path), str(target), self.trim_seconds, self.fps, self.crf
+        )
+        _pending.add(future)
+        future.add_done_callback(_on_processed)
+        return target
@@ -0,0 +1,495 @@
+"""
+事件驱动的等待引擎
+基于Playwright原生的 locator.wait_for 和 MutationObserver 轮询实现等待，替代固定间隔的轮询循环
+
+@File  : wait_engine.py
+@Author: shenyuan
+"""
+import asyncio
+import logging
+import time
+from typing import Optional, Any, List, Dict, Union
+
+from playwright.async_api import Locator, Page, TimeoutError as PlaywrightTimeoutError
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
+# 页面内检查失败（导航中执行上下文销毁）后重试前的等待时间（秒），避免在截止时间前空转
+SETTLE_RETRY_INTERVAL = 0.1
+
+
+# 页面内等待DOM静默：MutationObserver在quietMs内没有新的变化即视为稳定
+_DOM_QUIET_SCRIPT = """
+([quietMs, timeoutMs]) => new Promise(resolve => {
+    let timer = null;
+    let hard = null;
+    const observer = new MutationObserver(() => {
+        clearTimeout(timer);
+        timer = setTimeout(() => done(true), quietMs);
+    });
+    const done = (settled) => {
+        observer.disconnect();
+        clearTimeout(timer);
+        clearTimeout(hard);
+        resolve(settled);
+    };
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    timer = setTimeout(() => done(true), quietMs);
+    hard = setTimeout(() => done(false), timeoutMs);
+})
+"""
+
+
+# 页面内批量检查多个目标：一次evaluate返回每个目标的结果。
+# 所有目标满足时立即返回；DOM在quietMs内没有变化仍有目标未满足时提前返回，由调用方用Playwright定位器确认
+_CHECK_TARGETS_SCRIPT = """
+({targets, quietMs, timeoutMs}) => new Promise(resolve => {
+    const IMPLICIT_ROLES = {
+        button: 'button, input[type=button], input[type=submit], input[type=reset]',
+        link: 'a[href]',
+        heading: 'h1, h2, h3, h4, h5, h6',
+        textbox: 'input:not([type]), input[type=text], input[type=search], input[type=email], textarea',
+        checkbox: 'input[type=checkbox]',
+        radio: 'input[type=radio]',
+        img: 'img[alt]',
+    };
+    const normalize = s => (s || '').replace(/\\s+/g, ' ').trim();
+    const textMatches = (value, expected, exact) => exact
+        ? normalize(value) === normalize(expected)
+        : normalize(value).toLowerCase().includes(normalize(expected).toLowerCase());
+    const isVisible = el => {
+        const rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+    };
+    const accessibleName = el => {
+        const labelledBy = el.getAttribute('aria-labelledby');
+        if (labelledBy) {
+            const label = labelledBy.split(/\\s+/).map(id => document.getElementById(id))
+                .filter(Boolean).map(n => n.textContent).join(' ');
+            if (normalize(label)) return label;
+        }
+        return el.getAttribute('aria-label') || el.innerText || el.textContent
+            || el.value || el.getAttribute('alt') || el.getAttribute('title') || '';
+    };
+    const query = target => {
+        if (target.css) return Array.from(document.querySelectorAll(target.css));
+        if (target.role) {
+            const selector = `[role="${target.role}"]` + (IMPLICIT_ROLES[target.role] ? ', ' + IMPLICIT_ROLES[target.role] : '');
+            const candidates = Array.from(document.querySelectorAll(selector));
+            return target.name == null ? candidates
+                : candidates.filter(el => textMatches(accessibleName(el), target.name, target.exact));
+        }
+        // 文本目标：取包含该文本的最内层元素
+        const matched = Array.from(document.body.querySelectorAll('*'))
+            .filter(el => !['SCRIPT', 'STYLE'].includes(el.tagName) && textMatches(el.textContent, target.text, target.exact));
+        return matched.filter(el => !matched.some(other => other !== el && el.contains(other)));
+    };
+    const check = target => {
+        try {
+            const visible = query(target).filter(isVisible);
+            const texts = visible.map(el => normalize(el.innerText || el.textContent));
+            const ok = visible.length > 0 && (target.contains == null
+                || texts.some(text => textMatches(text, target.contains, false)));
+            return {ok, visible: visible.length > 0, text: (texts[0] || '').slice(0, 200)};
+        } catch (e) {
+            // 不支持的选择器（如Playwright扩展语法）交给调用方确认
+            return {ok: false, visible: false, text: '', unsupported: true};
+        }
+    };
+    let quietTimer = null;
+    let hardTimer = null;
+    let scheduled = false;
+    let done = false;
+    const finish = () => {
+        if (done) return;
+        done = true;
+        observer.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(hardTimer);
+        resolve(targets.map(check));
+    };
+    const evaluateAll = () => {
+        scheduled = false;
+        if (done) return;
+        if (targets.map(check).every(r => r.ok)) {
+            finish();
+            return;
+        }
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(finish, quietMs);
+    };
+    // 变更频繁的页面每次变更都全量检查（文本目标要遍历整个DOM）开销很大：
+    // 同一帧内的变更只在下一帧检查一次（后台页面不触发requestAnimationFrame，改用定时器）
+    const scheduleEvaluate = () => {
+        if (scheduled || done) return;
+        scheduled = true;
+        if (document.hidden) setTimeout(evaluateAll, 50);
+        else requestAnimationFrame(evaluateAll);
+    };
+    const observer = new MutationObserver(scheduleEvaluate);
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    hardTimer = setTimeout(finish, timeoutMs);
+    evaluateAll();
+})
+"""
+
+
+def normalize_target(target: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """规范化批量断言的目标
+
+    Args:
+        target: CSS选择器字符串，或字典：
+            {'role': 'menuitem', 'name': '统计分析'} / {'text': '名称'} / {'css': '#app-container'}，
+            可选 'contains'（元素需包含的文本）、'exact'（名称/文本完全匹配）、'description'（日志中的描述）
+
+    Returns:
+        包含 role/name/text/css/contains/exact/description 的字典
+    """
+    if isinstance(target, str):
+        target = {'css': target}
+    spec = {
+        'role': target.get('role'),
+        'name': target.get('name'),
+        'text': target.get('text'),
+        'css': target.get('css'),
+        'contains': target.get('contains'),
+        'exact': bool(target.get('exact', False)),
+    }
+    if not (spec['role'] or spec['text'] or spec['css']):
+        raise ValueError(f"批量断言目标需要指定 role、text 或 css: {target}")
+    if target.get('description'):
+        spec['description'] = target['description']
+    elif spec['role']:
+        spec['description'] = f"{spec['role']} \"{spec['name']}\"" if spec['name'] else spec['role']
+    elif spec['text']:
+        spec['description'] = f"文本 \"{spec['text']}\""
+    else:
+        spec['description'] = spec['css']
+    if spec['contains'] is not None:
+        spec['description'] += f" 包含 '{spec['contains']}'"
+    return spec
+
+
+def target_locator(page: Page, spec: Dict[str, Any]) -> Locator:
+    """把规范化的目标转换为Playwright定位器"""
+    if spec['role']:
+        if spec['name'] is None:
+            return page.get_by_role(spec['role'])
+        return page.get_by_role(spec['role'], name=spec['name'], exact=spec['exact'])
+    if spec['text']:
+        return page.get_by_text(spec['text'], exact=spec['exact'])
+    return page.locator(spec['css'])
+
+
+class NetworkActivityTracker:
+    """网络活动跟踪器
+
+    通过页面的 request / requestfinished / requestfailed 事件统计进行中的请求，
+    用于判断"网络静默窗口"。长连接类请求（EventSource、WebSocket）不计入。
+    """
+
+    IGNORED_RESOURCE_TYPES = ('eventsource', 'websocket')
+
+    def __init__(self, page: Page):
+        """初始化并开始监听页面网络事件
+
+        Args:
+            page: Playwright Page对象
+        """
+        self.inflight = set()
+        self.last_activity = time.monotonic()
+        self._changed = asyncio.Event()
+        page.on("request", self._on_request)
+        page.on("requestfinished", self._on_request_done)
+        page.on("requestfailed", self._on_request_done)
+
+    def _touch(self):
+        self.last_activity = time.monotonic()
+        self._changed.set()
+
+    def _on_request(self, request):
+        if request.resource_type in self.IGNORED_RESOURCE_TYPES:
+            return
+        self.inflight.add(request)
+        self._touch()
+
+    def _on_request_done(self, request):
+        if request in self.inflight:
+            self.inflight.discard(request)
+            self._touch()
+
+    def is_quiet(self, quiet_ms: int) -> bool:
+        """当前是否已经没有进行中的请求并持续了quiet_ms"""
+        return not self.inflight and (time.monotonic() - self.last_activity) * 1000 >= quiet_ms
+
+    async def wait_for_quiet(self, quiet_ms: int, deadline: float) -> bool:
+        """等待网络静默
+
+        Args:
+            quiet_ms: 静默窗口（毫秒）
+            deadline: time.monotonic() 截止时间
+
+        Returns:
+            是否在截止时间前达到静默
+        """
+        while True:
+            now = time.monotonic()
+            if self.is_quiet(quiet_ms):
+                return True
+            if now >= deadline:
+                return False
+            if self.inflight:
+                wait = deadline - now
+            else:
+                wait = min(quiet_ms / 1000 - (now - self.last_activity), deadline - now)
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=max(wait, 0.001))
+            except asyncio.TimeoutError:
+                pass
+
+
+class WaitEngine:
+    """等待引擎
+
+    - 每次等待只有一个截止时间，由浏览器端在元素状态变化时立即唤醒，不再按500ms节拍轮询
+    - 记录每次等待的实际耗时和结果，便于定位"慢等待"
+    """
+
+    def __init__(self, default_timeout: int = 30000):
+        """初始化等待引擎
+
+        Args:
+            default_timeout: 默认超时时间（毫秒）
+        """
+        self.default_timeout = default_timeout
+        self.records: List[Dict] = []
+
+    def _record(self, description: str, state: str, started: float, outcome: str) -> float:
+        """记录一次等待的耗时
+
+        Returns:
+            耗时（毫秒）
+        """
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.records.append({
+            'target': description,
+            'state': state,
+            'elapsed_ms': round(elapsed_ms, 1),
+            'outcome': outcome
+        })
+        return elapsed_ms
+
+    async def wait_for(self, locator: Locator, state: str = "visible", timeout: Optional[int] = None,
+                       description: Optional[str] = None) -> float:
+        """等待元素达到指定状态
+
+        Args:
+            locator: Playwright locator对象（匹配多个元素时取第一个）
+            state: 等待状态 (attached, detached, visible, hidden)
+            timeout: 超时时间（毫秒）
+            description: 记录中使用的描述，默认为locator字符串
+
+        Returns:
+            实际等待耗时（毫秒）
+
+        Raises:
+            PlaywrightTimeoutError: 超时仍未达到指定状态
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        description = description or str(locator)
+        started = time.perf_counter()
+        try:
+            await locator.first.wait_for(state=state, timeout=timeout)
+        except PlaywrightTimeoutError:
+            self._record(description, state, started, 'timeout')
+            raise
+        except Exception:
+            self._record(description, state, started, 'error')
+            raise
+        return self._record(description, state, started, 'ok')
+
+    async def is_state(self, locator: Locator, state: str = "visible", timeout: Optional[int] = None,
+                       description: Optional[str] = None) -> bool:
+        """在超时时间内判断元素是否达到指定状态（不抛出超时异常）
+
+        Args:
+            locator: Playwright locator对象
+            state: 等待状态
+            timeout: 超时时间（毫秒）
+            description: 记录中使用的描述
+
+        Returns:
+            是否达到指定状态
+        """
+        try:
+            await self.wait_for(locator, state=state, timeout=timeout, description=description)
+            return True
+        except Exception:
+            return False
+
+    async def wait_for_condition(self, page: Page, expression: str, arg: Any = None,
+                                 timeout: Optional[int] = None, description: Optional[str] = None) -> Any:
+        """等待页面内的JS条件成立（DOM变化时由MutationObserver触发重新计算）
+
+        Args:
+            page: Playwright Page对象
+            expression: 返回真值即视为满足的JS函数或表达式
+            arg: 传给expression的参数
+            timeout: 超时时间（毫秒）
+            description: 记录中使用的描述
+
+        Returns:
+            expression的返回值
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        description = description or expression[:80]
+        started = time.perf_counter()
+        try:
+            handle = await page.wait_for_function(expression, arg=arg, polling="mutation", timeout=timeout)
+        except PlaywrightTimeoutError:
+            self._record(description, 'condition', started, 'timeout')
+            raise
+        self._record(description, 'condition', started, 'ok')
+        return await handle.json_value()
+
+    async def wait_until_settled(self, page: Page, tracker: Optional[NetworkActivityTracker] = None,
+                                 target: Optional[Union[str, Locator]] = None, network_quiet_ms: int = 500,
+                                 dom_quiet_ms: int = 300, timeout: int = 10000) -> bool:
+        """等待页面稳定：目标元素可见（可选）+ 网络静默 + DOM静默
+
+        超时或页面已关闭时不抛出异常，只返回False，调用方可以继续后续断言。
+
+        Args:
+            page: Playwright Page对象
+            tracker: 页面的网络活动跟踪器，为None时只判断DOM静默
+            target: 需要先等待可见的元素（选择器或locator）
+            network_quiet_ms: 网络静默窗口（毫秒）
+            dom_quiet_ms: DOM静默窗口（毫秒）
+            timeout: 总超时时间（毫秒）
+
+        Returns:
+            是否在超时前达到稳定
+        """
+        started = time.perf_counter()
+        deadline = time.monotonic() + timeout / 1000
+        description = f"settled({target})" if target is not None else "settled"
+
+        def remaining_ms() -> int:
+            return max(int((deadline - time.monotonic()) * 1000), 1)
+
+        try:
+            if target is not None:
+                locator = page.locator(target) if isinstance(target, str) else target
+                await locator.first.wait_for(state="visible", timeout=remaining_ms())
+
+            while time.monotonic() < deadline:
+                if page.is_closed():
+                    break
+                if tracker:
+                    await tracker.wait_for_quiet(network_quiet_ms, deadline)
+                try:
+                    dom_quiet = await page.evaluate(_DOM_QUIET_SCRIPT, [dom_quiet_ms, remaining_ms()])
+                except Exception:
+                    # 导航导致执行上下文销毁，稍等后重新等待；页面已关闭时不再等待
+                    if page.is_closed():
+                        break
+                    await asyncio.sleep(min(SETTLE_RETRY_INTERVAL, max(deadline - time.monotonic(), 0)))
+                    continue
+                # DOM变化可能引发新的请求，两者同时静默才算稳定
+                if dom_quiet and (tracker is None or tracker.is_quiet(network_quiet_ms)):
+                    self._record(description, 'settled', started, 'ok')
+                    return True
+        except PlaywrightTimeoutError:
+            pass
+
+        if page.is_closed():
+            self._record(description, 'settled', started, 'error')
+            logger.info("[WAIT] 页面已关闭，停止等待页面稳定")
+            return False
+        elapsed = self._record(description, 'settled', started, 'timeout')
+        logger.info(f"[WAIT] 页面在 {elapsed:.0f}ms 内未稳定，继续执行")
+        return False
+
+    async def check_targets(self, page: Page, targets: List[Union[str, Dict[str, Any]]],
+                            timeout: Optional[int] = None, quiet_ms: int = 500) -> List[Dict[str, Any]]:
+        """批量检查多个目标是否可见（及包含指定文本），所有目标共用一个截止时间
+
+        先在页面内用一次evaluate检查全部目标（DOM变化时重新检查，全部满足立即返回）；
+        页面内未满足的目标再用Playwright定位器在剩余时间内确认，页面脚本对角色名称的近似计算不会造成误报。
+
+        Args:
+            page: Playwright Page对象
+            targets: 目标列表（格式见 normalize_target）
+            timeout: 总超时时间（毫秒）
+            quiet_ms: 页面内检查时，DOM静默多久后把未满足的目标交给定位器确认
+
+        Returns:
+            每个目标的结果：{target, ok, visible, text, elapsed_ms, checked_by}
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        specs = [normalize_target(target) for target in targets]
+        started = time.perf_counter()
+        deadline = time.monotonic() + timeout / 1000
+
+        script_targets = [
+            {key: spec[key] for key in ('role', 'name', 'text', 'css', 'contains', 'exact')} for spec in specs
+        ]
+        try:
+            page_results = await page.evaluate(
+                _CHECK_TARGETS_SCRIPT, {'targets': script_targets, 'quietMs': quiet_ms, 'timeoutMs': timeout}
+            )
+        except Exception as e:
+            # 导航导致执行上下文销毁等情况，全部交给定位器确认
+            logger.debug(f"[WAIT] 页面内批量检查失败，改用定位器逐个确认: {e}")
+            page_results = [None] * len(specs)
+
+        results = []
+        for spec, page_result in zip(specs, page_results):
+            result = {
+                'target': spec['description'],
+                'ok': bool(page_result and page_result['ok']),
+                'visible': bool(page_result and page_result['visible']),
+                'text': (page_result or {}).get('text', ''),
+                'checked_by': 'page'
+            }
+            if not result['ok']:
+                result.update(await self._confirm_target(page, spec, deadline))
+            state = 'visible' if spec['contains'] is None else 'contains'
+            result['elapsed_ms'] = round(
+                self._record(spec['description'], state, started, 'ok' if result['ok'] else 'timeout'), 1
+            )
+            results.append(result)
+        return results
+
+    @staticmethod
+    async def _confirm_target(page: Page, spec: Dict[str, Any], deadline: float) -> Dict[str, Any]:
+        """用Playwright定位器在剩余时间内确认单个目标"""
+        locator = target_locator(page, spec).first
+        remaining_ms = max(int((deadline - time.monotonic()) * 1000), 1)
+        try:
+            await locator.wait_for(state="visible", timeout=remaining_ms)
+            text = await locator.inner_text(timeout=max(int((deadline - time.monotonic()) * 1000), 1))
+        except Exception:
+            return {'ok': False, 'visible': False, 'checked_by': 'locator'}
+        ok = spec['contains'] is None or spec['contains'].lower() in text.lower()
+        return {'ok': ok, 'visible': True, 'text': text[:200], 'checked_by': 'locator'}
+
+    def summary(self) -> Dict:
+        """汇总等待统计
+
+        Returns:
+            包含次数、总耗时、最长耗时、超时次数和最慢的若干次等待
+        """
+        if not self.records:
+            return {'count': 0, 'total_ms': 0, 'max_ms': 0, 'timeouts': 0, 'slowest': []}
+        slowest = sorted(self.records, key=lambda r: r['elapsed_ms'], reverse=True)[:5]
+        return {
+            'count': len(self.records),
+            'total_ms': round(sum(r['elapsed_ms'] for r in self.records), 1),
+            'max_ms': slowest[0]['elapsed_ms'],
+            'timeouts': sum(1 for r in self.records if r['outcome'] == 'timeout'),
+            'slowest': slowest
+        }
@@ -10,10 +10,18 @@ import logging
 import sys
 import io
 from typing import Optional, Callable, Any
-from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Playwright
+from playwright.async_api import Browser, BrowserContext, Page, Playwright, TimeoutError as PlaywrightTimeoutError
 import yaml
 import os
 from pathlib import Path
+from core.browser_pool import BrowserPool
+from core.wait_engine import WaitEngine, NetworkActivityTracker
+from core.network_router import NetworkRouter
+from core.har_archive import HarArchive
+from core.action_tracer import trace_span
+from core.page_event_buffer import PageEventBuffer
+from core.trace_recorder import TraceRecorder
+from core.performance_monitor import PerformanceMonitor
 
 # 创建logger用于记录驱动日志
 logger = logging.getLogger(__name__)
@@ -33,11 +41,25 @@ class WebUIDriver:
         Args:
             config_path: 配置文件路径
         """
+        self.config_path = config_path
         self.config = self._load_config(config_path)
         self.playwright: Optional[Playwright] = None
         self.browser: Optional[Browser] = None
         self.context: Optional[BrowserContext] = None
         self.page: Optional[Page] = None
+        self.pool: Optional[BrowserPool] = None
+        self._owns_pool = False
+        self.unauthorized_responses = 0
+        self.waiter = WaitEngine(self.config['playwright']['timeout'])
+        self.network_tracker: Optional[NetworkActivityTracker] = None
+        self.router: Optional[NetworkRouter] = None
+        self.har_path: Optional[Path] = None
+        self.event_buffer: Optional[PageEventBuffer] = None
+        self.trace_recorder: Optional[TraceRecorder] = None
+        self.perf_monitor: Optional[PerformanceMonitor] = None
+        self.trace_active = False
+        self._trace_nodeid = ''
+        self._trace_attempt = 1
         
     def _load_config(self, config_path: str) -> dict:
         """加载配置文件"""
@@ -48,11 +70,23 @@ class WebUIDriver:
         with open(config_file, 'r', encoding='utf-8') as f:
             return yaml.safe_load(f)
     
-    async def start(self, video_options: Optional[dict] = None):
+    async def start(self, video_options: Optional[dict] = None, pool: Optional[BrowserPool] = None,
+                    context_options: Optional[dict] = None, router: Optional[NetworkRouter] = None,
+                    har: Optional[HarArchive] = None, har_nodeid: str = '',
+                    trace_recorder: Optional[TraceRecorder] = None, attempt: int = 1,
+                    perf_monitor: Optional[PerformanceMonitor] = None):
         """启动浏览器
         
         Args:
             video_options: 可选的视频录制配置（dict，包含record_video_dir等）
+            pool: 会话级浏览器池；提供时复用池中的浏览器，只为本次测试分配上下文
+            context_options: 其他创建上下文的参数（如 storage_state）
+            router: 网络路由器（按模块拦截图片、字体、统计埋点等请求）
+            har: HAR录制/回放配置（录制或回放 har_nodeid 对应的HAR文件）
+            har_nodeid: 当前用例nodeid，用于确定HAR文件路径
+            trace_recorder: Playwright追踪录制配置（按模式和执行序号决定是否录制）
+            attempt: 执行序号（pytest-rerunfailures 的 execution_count，第一次执行为1）
+            perf_monitor: 性能监控器（在上下文上注入Web Vitals采集脚本）
         """
         # 确保在正确的事件循环中启动Playwright
         # 获取当前运行的事件循环（必须在 async 函数中调用）
@@ -71,57 +105,48 @@ class WebUIDriver:
         if current_loop.is_closed():
             raise RuntimeError("事件循环已关闭，无法启动 Playwright")
         
-        # 启动 Playwright（必须在当前事件循环中调用）
-        self.playwright = await async_playwright().start()
-        logger.info("[DRIVER] Playwright 已启动")
-        
-        browser_type = getattr(self.playwright, self.config['playwright']['browser'])
-        
-        self.browser = await browser_type.launch(
-            headless=self.config['playwright']['headless'],
-            slow_mo=self.config['playwright']['slow_mo']
-        )
-        logger.info("[DRIVER] 浏览器已启动")
-        
-        # 准备context配置
-        context_options = {}
+        if pool is None:
+            # 独立模式：自建一个不预热的浏览器池，close()时一并关闭
+            pool = BrowserPool(self.config_path, size=0)
+            await pool.start()
+            self._owns_pool = True
+        else:
+            self._owns_pool = False
+        self.pool = pool
+        self.playwright = pool.playwright
+        self.browser = pool.browser
         
-        # 添加视频录制选项（如果提供）
+        # 从池中获取上下文（视频录制等创建期参数会触发新建上下文）
+        extra_options = dict(context_options or {})
         if video_options:
-            context_options.update(video_options)
-        
-        # 检查是否启用移动端模式
-        device_config = self.config.get('playwright', {}).get('device', {})
-        if device_config.get('enabled', False):
-            # 使用移动设备模拟
-            device_name = device_config.get('name', 'iPhone 12')
-            from playwright.async_api import devices
-            device = devices.get(device_name)
-            if device:
-                # 合并设备配置和视频选项
-                context_options.update(device)
-                self.context = await self.browser.new_context(**context_options)
-            else:
-                # 如果设备不存在，使用自定义移动端配置
-                context_options.update({
-                    'viewport': {
-                        'width': device_config.get('width', 375),
-                        'height': device_config.get('height', 667)
-                    },
-                    'user_agent': device_config.get('user_agent', 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X)')
-                })
-                self.context = await self.browser.new_context(**context_options)
-        else:
-            # 桌面端模式
-            context_options.update({
-                'viewport': {
-                    'width': self.config['playwright']['viewport']['width'],
-                    'height': self.config['playwright']['viewport']['height']
-                }
-            })
-            self.context = await self.browser.new_context(**context_options)
+            extra_options.update(video_options)
+        self.context = await pool.acquire(extra_options or None)
         logger.info("[DRIVER] 浏览器上下文已创建")
         
+        # 路由需要在创建页面之前注册，才能拦截页面的首批请求
+        if router:
+            await router.attach(self.context)
+            self.router = router
+        
+        # HAR在路由器之后注册，优先处理（后注册的路由先匹配），HAR中没有的请求再交给路由器
+        if har and har.enabled:
+            self.har_path = await har.attach(self.context, har_nodeid)
+        
+        # 追踪需要在创建页面之前开始，页面的首次导航也会被录制
+        if trace_recorder:
+            self.trace_recorder = trace_recorder
+            self._trace_nodeid = har_nodeid
+            self._trace_attempt = attempt
+            self.trace_active = await trace_recorder.start(self.context, har_nodeid, attempt)
+        
+        # 采集脚本需要在创建页面之前注入，每个文档加载时自动执行
+        if perf_monitor:
+            self.perf_monitor = perf_monitor
+            try:
+                await perf_monitor.attach(self.context)
+            except Exception as e:
+                logger.warning(f"[DRIVER] 注入性能采集脚本失败: {e}")
+        
         # 启用Playwright日志记录（自动记录所有操作和断言）
         # 这会自动记录所有页面操作、网络请求、断言等
         playwright_logger = logging.getLogger("playwright")
@@ -137,123 +162,77 @@ class WebUIDriver:
                 # 过滤掉无意义的日志（如"Gt", "false"等）
                 text = msg.text.strip()
                 if text and len(text) > 2 and not text.lower() in ['gt', 'false', 'true']:
-                    logger.info(f"[PAGE] {msg.type}: {msg.text}")
+                    # 页面console按类别限流（logging.sampling.page_console）
+                    logger.info(f"[PAGE] {msg.type}: {msg.text}", extra={'category': 'page_console'})
         
         def handle_pageerror(error):
             # 只记录真正的页面错误，过滤掉SVG路径错误等无关错误
             error_str = str(error)
             if 'path' not in error_str.lower() and 'attribute d' not in error_str.lower():
-                logger.error(f"[PAGE ERROR] {error}")
+                logger.error(f"[PAGE ERROR] {error}", extra={'category': 'page_error'})
+        
+        # 统计未授权响应，用于判断缓存的登录态是否已被服务端注销
+        def handle_response(response):
+            if response.status == 401:
+                self.unauthorized_responses += 1
         
         self.page.on("console", handle_console)
         self.page.on("pageerror", handle_pageerror)
+        self.page.on("response", handle_response)
+        
+        # 跟踪进行中的请求，供 wait_until_settled 判断网络静默
+        self.network_tracker = NetworkActivityTracker(self.page)
+        
+        # 最近的console、页面错误和请求摘要只保存在内存中，测试失败时才附加到报告
+        self.event_buffer = PageEventBuffer.from_config(self.config)
+        self.event_buffer.attach(self.page)
         
         logger.info(f"[DRIVER] 页面已创建，事件循环: {asyncio.get_running_loop()}")
     
-    def _wrap_page_methods(self):
-        """包装Playwright页面方法以自动记录操作日志"""
-        # 保存原始方法
-        original_click = self.page.click
-        original_dblclick = self.page.dblclick
-        original_fill = self.page.fill
-        original_get_by_text = self.page.get_by_text
-        original_get_by_role = self.page.get_by_role
-        original_locator = self.page.locator
-        
-        async def logged_click(selector, **kwargs):
-            # 尝试获取元素的描述性信息
-            try:
-                if hasattr(selector, 'get_text'):
-                    text = await selector.get_text()
-                    print(f"[ACTION] 点击元素: {text}")
-                else:
-                    print(f"[ACTION] 点击元素: {selector}")
-            except:
-                print(f"[ACTION] 点击元素: {selector}")
-            try:
-                result = await original_click(selector, **kwargs)
-                return result
-            except Exception as e:
-                print(f"[ACTION ERROR] 点击失败: {selector}, 错误: {e}")
-                raise
-        
-        async def logged_dblclick(selector, **kwargs):
-            try:
-                if hasattr(selector, 'get_text'):
-                    text = await selector.get_text()
-                    print(f"[ACTION] 双击元素: {text}")
-                else:
-                    print(f"[ACTION] 双击元素: {selector}")
-            except:
-                print(f"[ACTION] 双击元素: {selector}")
-            try:
-                result = await original_dblclick(selector, **kwargs)
-                return result
-            except Exception as e:
-                print(f"[ACTION ERROR] 双击失败: {selector}, 错误: {e}")
-                raise
+    async def mark_step(self, step: str) -> list:
+        """结束一个测试步骤：采集该步骤内的Web Vitals和长任务（路由切换时的分段也记入该步骤）
         
-        async def logged_fill(selector, value, **kwargs):
-            print(f"[ACTION] 填写输入框: {selector} = {value}")
-            try:
-                result = await original_fill(selector, value, **kwargs)
-                return result
-            except Exception as e:
-                print(f"[ACTION ERROR] 填写失败: {selector}, 错误: {e}")
-                raise
-        
-        # 包装get_by_text和get_by_role（这些返回locator，需要特殊处理）
-        def logged_get_by_text(text, **kwargs):
-            print(f"[ACTION] 查找文本元素: {text}")
-            locator = original_get_by_text(text, **kwargs)
-            # 包装返回的locator的click方法
-            original_locator_click = locator.click
-            async def logged_locator_click(**click_kwargs):
-                print(f"[ACTION] 点击文本元素: {text}")
-                return await original_locator_click(**click_kwargs)
-            locator.click = logged_locator_click
-            return locator
-        
-        def logged_get_by_role(role, **kwargs):
-            name = kwargs.get('name', '')
-            role_desc = f"{role}" + (f" (name={name})" if name else "")
-            print(f"[ACTION] 查找角色元素: {role_desc}")
-            locator = original_get_by_role(role, **kwargs)
-            # 包装返回的locator的click方法
-            original_locator_click = locator.click
-            async def logged_locator_click(**click_kwargs):
-                print(f"[ACTION] 点击角色元素: {role_desc}")
-                return await original_locator_click(**click_kwargs)
-            locator.click = logged_locator_click
-            return locator
-        
-        def logged_locator(selector, **kwargs):
-            print(f"[ACTION] 定位元素: {selector}")
-            locator = original_locator(selector, **kwargs)
-            # 包装返回的locator的click方法
-            original_locator_click = locator.click
-            async def logged_locator_click(**click_kwargs):
-                print(f"[ACTION] 点击定位元素: {selector}")
-                return await original_locator_click(**click_kwargs)
-            locator.click = logged_locator_click
-            return locator
-        
-        # 替换方法
-        self.page.click = logged_click
-        self.page.dblclick = logged_dblclick
-        self.page.fill = logged_fill
-        self.page.get_by_text = logged_get_by_text
-        self.page.get_by_role = logged_get_by_role
-        self.page.locator = logged_locator
+        Args:
+            step: 步骤名称
+            
+        Returns:
+            该步骤的性能分段列表（未启用性能监控时为空列表）
+        """
+        if not self.perf_monitor or not self.page:
+            return []
+        return await self.perf_monitor.flush(self.page, step)
+    
+    async def stop_trace(self, failed: bool) -> Optional[Path]:
+        """结束Playwright追踪录制（由conftest在用例结果确定后调用）
         
+        Args:
+            failed: 用例是否失败（retain-on-failure 模式下通过的追踪直接丢弃）
+            
+        Returns:
+            保存的追踪文件路径，未录制或已丢弃时返回None
+        """
+        if not self.trace_active or not self.context:
+            return None
+        self.trace_active = False
+        try:
+            return await self.trace_recorder.stop(self.context, self._trace_nodeid, self._trace_attempt, failed)
+        except Exception as e:
+            logger.warning(f"[DRIVER] 保存追踪文件失败: {e}")
+            return None
+    
     async def close(self):
-        """关闭浏览器"""
-        if self.context:
-            await self.context.close()
-        if self.browser:
-            await self.browser.close()
-        if self.playwright:
-            await self.playwright.stop()
+        """关闭浏览器（使用共享浏览器池时只归还上下文）"""
+        if self.trace_active:
+            # 用例结果未上报（如执行被中断）时按通过处理：on 模式保存，retain-on-failure 模式丢弃
+            await self.stop_trace(failed=False)
+        if self.router:
+            self.router.close()
+        if self.pool:
+            await self.pool.release(self.context)
+            self.context = None
+            if self._owns_pool:
+                await self.pool.close()
+            self.pool = None
     
     async def goto(self, url: str, wait_until: str = "networkidle"):
         """导航到指定URL
@@ -319,48 +298,73 @@ class WebUIDriver:
         
         timeout = timeout or self.config['playwright']['timeout']
         
-        # 使用简单的轮询方式，避免事件循环问题
-        max_attempts = timeout // 500  # 每500ms检查一次
+        # 事件驱动等待：元素状态变化时立即返回，只有一个截止时间
+        try:
+            await self.waiter.wait_for(self.page.locator(selector), state=state, timeout=timeout, description=selector)
+        except PlaywrightTimeoutError:
+            raise RuntimeError(f"等待元素超时: {selector}, 状态: {state}")
+    
+    async def wait_until_settled(self, target=None, network_quiet_ms: int = 500,
+                                 dom_quiet_ms: int = 300, timeout: int = 10000) -> bool:
+        """等待页面稳定（目标元素可见 + 网络静默 + DOM静默），替代固定时长的sleep
         
-        for attempt in range(max_attempts):
-            try:
-                locator = self.page.locator(selector).first
-                if state == "visible":
-                    # 使用count和bounding_box来检查元素是否可见，避免is_visible的事件循环问题
-                    count = await locator.count()
-                    if count > 0:
-                        box = await locator.bounding_box()
-                        if box and box.get('width', 0) > 0 and box.get('height', 0) > 0:
-                            return
-                elif state == "hidden":
-                    # 检查元素是否隐藏（不存在或不可见）
-                    count = await locator.count()
-                    if count == 0:
-                        return
-                    box = await locator.bounding_box()
-                    if not box or box.get('width', 0) == 0 or box.get('height', 0) == 0:
-                        return
-                elif state == "attached":
-                    if await locator.count() > 0:
-                        return
-                elif state == "detached":
-                    if await locator.count() == 0:
-                        return
-                else:
-                    # 默认检查可见性
-                    count = await locator.count()
-                    if count > 0:
-                        box = await locator.bounding_box()
-                        if box and box.get('width', 0) > 0 and box.get('height', 0) > 0:
-                            return
-            except:
-                pass
+        Args:
+            target: 需要先等待可见的元素（选择器或locator，可选）
+            network_quiet_ms: 网络静默窗口（毫秒）
+            dom_quiet_ms: DOM静默窗口（毫秒）
+            timeout: 总超时时间（毫秒），超时不抛出异常
             
-            # 等待一小段时间再重试
-            await asyncio.sleep(0.5)
+        Returns:
+            是否在超时前达到稳定
+        """
+        if not self.page:
+            raise RuntimeError("浏览器未启动")
         
-        # 如果所有尝试都失败，抛出异常
-        raise RuntimeError(f"等待元素超时: {selector}, 状态: {state}")
+        async with trace_span(self.page, 'wait_until_settled', str(target or ''), 'wait'):
+            return await self.waiter.wait_until_settled(
+                self.page, self.network_tracker, target=target,
+                network_quiet_ms=network_quiet_ms, dom_quiet_ms=dom_quiet_ms, timeout=timeout
+            )
+    
+    async def check_targets(self, targets: list, timeout: Optional[int] = None,
+                            raise_on_failure: bool = True) -> list:
+        """批量断言多个目标可见（及包含指定文本），一次页面内脚本检查全部目标，共用一个截止时间
+        
+        Args:
+            targets: 目标列表，CSS选择器字符串或字典，如
+                [{'role': 'menuitem', 'name': '课程库管理'}, {'text': '名称'},
+                 {'css': '#app-container', 'contains': '实验实践教学平台'}]
+            timeout: 总超时时间（毫秒）
+            raise_on_failure: 有目标未满足时是否抛出AssertionError
+            
+        Returns:
+            每个目标的结果列表：{target, ok, visible, text, elapsed_ms, checked_by}
+            
+        Raises:
+            AssertionError: raise_on_failure 为True且有目标未满足
+        """
+        if not self.page:
+            raise RuntimeError("浏览器未启动")
+        
+        async with trace_span(self.page, 'expect.check_targets', f"{len(targets)} 个目标", 'expect'):
+            results = await self.waiter.check_targets(self.page, targets, timeout=timeout)
+        failed = [result for result in results if not result['ok']]
+        # 与 logged_expect 一致的断言日志，pytest-html中可以看到每个目标的结果
+        for result in results:
+            if result['ok']:
+                logger.info(f"[ASSERT] 断言元素可见: {result['target']}")
+            else:
+                logger.error(f"[ASSERT ERROR] 断言失败 - 元素不可见或不包含文本: {result['target']}")
+        
+        if failed and raise_on_failure:
+            try:
+                await self.take_screenshot("批量断言失败")
+            except Exception as e:
+                logger.debug(f"[DRIVER] 批量断言失败截图出错: {e}")
+            raise AssertionError(
+                f"批量断言失败 {len(failed)}/{len(results)}: " + ", ".join(result['target'] for result in failed)
+            )
+        return results
     
     async def get_text(self, selector: str, timeout: Optional[int] = None) -> str:
         """获取元素文本
@@ -414,17 +418,18 @@ class WebUIDriver:
         from utils.screenshot_utils import take_success_screenshot
         return await take_success_screenshot(self.page, step_name)
     
-    async def take_screenshot(self, filename: str = None) -> str:
+    async def take_screenshot(self, filename: str = None, target=None) -> str:
         """通用截图方法
 
         Args:
             filename: 文件名（可选，如果不提供则自动生成）
+            target: 只截取该元素（Locator，可选）
 
         Returns:
             截图文件路径
         """
         from utils.screenshot_utils import take_screenshot
-        screenshot_path = await take_screenshot(self.page, filename)
+        screenshot_path = await take_screenshot(self.page, filename, target)
         
         # 将截图路径保存到pytest item中，以便在报告中显示
         try:
@@ -476,7 +481,7 @@ class WebUIDriver:
         Args:
             reason: 跳过原因
         """
-        print(f"[跳过步骤] {reason}")
+        logger.warning(f"[跳过步骤] {reason}")
         # 可以在这里记录日志或发送通知
     
     async def reset_to_initial_state(self):
@@ -516,5 +521,5 @@ class WebUIDriver:
                         pass
         except Exception as e:
             # 静默处理错误，避免影响测试
-            print(f"重置状态时出错: {e}")
+            logger.warning(f"[DRIVER] 重置状态时出错: {e}")
 
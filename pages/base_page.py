@@ -5,7 +5,7 @@
 @File  : base_page.py
 @Author: shenyuan
 """
-from typing import Optional
+from typing import List, Optional
 from core.web_ui_driver import WebUIDriver
 
 
@@ -30,17 +30,53 @@ class BasePage:
         # 子类可以重写此方法
         pass
     
-    async def take_screenshot(self, filename: str = None):
+    async def wait_until_settled(self, target=None, network_quiet_ms: int = 500,
+                                 dom_quiet_ms: int = 300, timeout: int = 10000) -> bool:
+        """等待页面稳定，替代固定时长的sleep
+        
+        依次等待：目标元素可见（可选）、没有进行中的请求并持续network_quiet_ms、
+        DOM在dom_quiet_ms内没有变化。页面更快稳定时立即返回。
+        
+        Args:
+            target: 需要先等待可见的元素（选择器或locator，可选）
+            network_quiet_ms: 网络静默窗口（毫秒）
+            dom_quiet_ms: DOM静默窗口（毫秒）
+            timeout: 总超时时间（毫秒），超时不抛出异常
+            
+        Returns:
+            是否在超时前达到稳定
+        """
+        return await self.driver.wait_until_settled(
+            target=target, network_quiet_ms=network_quiet_ms,
+            dom_quiet_ms=dom_quiet_ms, timeout=timeout
+        )
+    
+    async def check_targets(self, targets: list, timeout: Optional[int] = None,
+                            raise_on_failure: bool = True) -> list:
+        """批量断言多个目标可见（及包含指定文本）
+        
+        Args:
+            targets: 目标列表（格式见 WebUIDriver.check_targets）
+            timeout: 总超时时间（毫秒）
+            raise_on_failure: 有目标未满足时是否抛出AssertionError
+            
+        Returns:
+            每个目标的结果列表
+        """
+        return await self.driver.check_targets(targets, timeout=timeout, raise_on_failure=raise_on_failure)
+    
+    async def take_screenshot(self, filename: str = None, target=None):
         """截图（使用统一的截图工具）
         
         Args:
             filename: 文件名（可选，如果不提供则自动生成）
+            target: 只截取该元素（Locator，可选）
             
         Returns:
             截图文件路径
         """
         from utils.screenshot_utils import take_screenshot
-        return await take_screenshot(self.page, filename)
+        return await take_screenshot(self.page, filename, target)
     
     async def take_error_screenshot(self, error_message: str = ""):
         """在发生错误时截图
@@ -82,3 +118,18 @@ class BasePage:
         except:
             return False
 
+    async def is_any_visible(self, selectors: List[str], timeout: int = 5000) -> bool:
+        """检查多个选择器中是否有任一元素可见（共用一个截止时间）
+
+        每个选择器加上 :visible 后再合并，等待的是第一个可见的匹配元素，
+        不会因为文档中靠前的匹配元素是隐藏的而判断为不可见。
+
+        Args:
+            selectors: 元素选择器列表
+            timeout: 超时时间
+
+        Returns:
+            是否有元素可见
+        """
+        return await self.is_element_visible(', '.join(f'{s}:visible' for s in selectors), timeout=timeout)
+
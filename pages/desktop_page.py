@@ -5,14 +5,18 @@
 @File  : desktop_page.py
 @Author: shenyuan
 """
+import logging
 import yaml
-import asyncio
 import re
 from pathlib import Path
 from typing import Optional
 from pages.base_page import BasePage
 from core.web_ui_driver import WebUIDriver
 
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
 
 class DesktopPage(BasePage):
     """桌面页面类"""
@@ -94,34 +98,12 @@ class DesktopPage(BasePage):
         except:
             pass
         
-        # 等待桌面容器加载，使用简单的等待策略，避免事件循环问题
-        timeout = timeout or 10000
-        max_attempts = timeout // 500  # 每500ms检查一次
-        
-        for attempt in range(max_attempts):
-            try:
-                # 使用简单的元素检查，避免复杂的等待逻辑
-                locator = self.page.locator('.desktop-container, .desktop, [class*="desktop"]').first
-                if await self._check_element_visible(locator, timeout=500):
-                    return  # 找到了，直接返回
-            except:
-                pass
-            
-            # 等待一小段时间再重试
-            await asyncio.sleep(0.5)
-        
-        # 如果所有尝试都失败，尝试最后一次检查
-        try:
-            locator = self.page.locator('.desktop-container, .desktop, [class*="desktop"]').first
-            if await self._check_element_visible(locator, timeout=1000):
-                return
-        except:
-            pass
-        
-        # 如果还是找不到，可能页面结构不同，不抛出异常，让调用者继续
+        # 等待任一桌面容器可见（事件驱动，单一截止时间，隐藏的匹配元素不影响判断）
+        # 如果找不到，可能页面结构不同，不抛出异常，让调用者继续
+        await self.is_any_visible(['.desktop-container', '.desktop', '[class*="desktop"]'], timeout=timeout or 10000)
     
     async def _check_element_visible(self, locator, timeout: int = 5000) -> bool:
-        """检查元素是否可见（不使用is_visible API，避免事件循环问题）
+        """检查元素是否可见（在超时时间内等待元素变为可见）
         
         Args:
             locator: Playwright locator对象
@@ -130,19 +112,7 @@ class DesktopPage(BasePage):
         Returns:
             是否可见
         """
-        max_attempts = timeout // 500
-        for attempt in range(max_attempts):
-            try:
-                # 使用count和bounding_box来检查元素是否存在和可见
-                count = await locator.count()
-                if count > 0:
-                    box = await locator.bounding_box()
-                    if box and box.get('width', 0) > 0 and box.get('height', 0) > 0:
-                        return True
-            except:
-                pass
-            await asyncio.sleep(0.5)
-        return False
+        return await self.driver.waiter.is_state(locator, state="visible", timeout=timeout)
     
     async def click_app_icon(self, app_name: str, double_click: bool = True):
         """点击应用图标
@@ -155,7 +125,7 @@ class DesktopPage(BasePage):
         if not self.page or self.page.is_closed():
             raise RuntimeError("页面已关闭或无效")
         
-        print(f"[DesktopPage] 开始点击应用图标: {app_name}")
+        logger.info(f"[DesktopPage] 开始点击应用图标: {app_name}")
         
         # 先尝试关闭可能的弹窗（如磁盘空间不足提示）
         try:
@@ -171,8 +141,8 @@ class DesktopPage(BasePage):
                     close_btn = self.page.locator(selector).first
                     if await close_btn.is_visible(timeout=1000):
                         await close_btn.click()
-                        await asyncio.sleep(0.5)
-                        print(f"[DesktopPage] 已关闭弹窗: {selector}")
+                        await self.wait_until_settled(network_quiet_ms=0, timeout=2000)
+                        logger.info(f"[DesktopPage] 已关闭弹窗: {selector}")
                         break
                 except:
                     continue
@@ -186,11 +156,12 @@ class DesktopPage(BasePage):
                 await self.page.get_by_text(app_name).dblclick()
             else:
                 await self.page.get_by_text(app_name).click()
-            print(f"[DesktopPage] [OK] 成功点击应用图标: {app_name}")
-            await asyncio.sleep(1.0)
+            logger.info(f"[DesktopPage] 成功点击应用图标: {app_name}")
+            # 等待应用窗口加载稳定（而不是固定等待1秒）
+            await self.wait_until_settled()
             return
         except Exception as e:
-            print(f"[DesktopPage] [ERROR] 直接点击失败: {e}")
+            logger.error(f"[DesktopPage] 直接点击失败: {e}")
             raise Exception(f"无法点击应用图标: {app_name}。错误: {e}")
     
     async def close_all_apps(self):
@@ -203,14 +174,14 @@ class DesktopPage(BasePage):
             'button:has-text("关闭")',
         ]
         
-        for selector in close_selectors:
+        # 合并为一个选择器，一次查询取回所有关闭按钮
+        try:
+            elements = await self.page.query_selector_all(', '.join(close_selectors))
+        except:
+            return
+        for element in elements:
             try:
-                elements = await self.page.query_selector_all(selector)
-                for element in elements:
-                    try:
-                        await element.click(timeout=1000)
-                    except:
-                        pass
+                await element.click(timeout=1000)
             except:
                 pass
     
@@ -171,17 +171,15 @@ class LoginPage(BasePage):
             # 点击登录按钮
             await self.page.get_by_role("button", name="登录").click()
             
-            # 等待登录完成（使用 asyncio.sleep 避免事件循环问题）
-            import asyncio
-            await asyncio.sleep(2)
+            # 等待登录请求完成、页面稳定
+            await self.wait_until_settled()
             
             # 点击"跳过了解"按钮（如果存在）
             try:
                 skip_button = self.page.get_by_role("button", name="跳过了解")
                 if await skip_button.is_visible(timeout=3000):
                     await skip_button.click()
-                    import asyncio
-                    await asyncio.sleep(1)
+                    await self.wait_until_settled()
             except:
                 # 如果找不到"跳过了解"按钮，说明可能已经跳过或不存在，继续执行
                 pass
@@ -190,23 +188,21 @@ class LoginPage(BasePage):
             await self.input_username(username)
             await self.input_password(password)
             await self.click_login_button()
-            import asyncio
-            await asyncio.sleep(2)
+            await self.wait_until_settled()
             
             # 尝试点击"跳过了解"按钮
             try:
                 skip_button = self.page.get_by_role("button", name="跳过了解")
                 if await skip_button.is_visible(timeout=3000):
                     await skip_button.click()
-                    await asyncio.sleep(1)
+                    await self.wait_until_settled()
             except:
                 pass
         
         # 验证是否登录成功
         try:
-            # 等待登录后的页面元素出现（如桌面图标）
-            import asyncio
-            await asyncio.sleep(2)  # 等待页面跳转
+            # 等待页面跳转完成、桌面加载稳定
+            await self.wait_until_settled()
             
             # 检查是否成功跳转到桌面
             current_url = self.page.url
@@ -220,6 +216,30 @@ class LoginPage(BasePage):
         except Exception as e:
             logger.error(f"[LoginPage] 验证登录状态时出错: {e}")
     
+    async def restore_session(self) -> bool:
+        """使用已注入的登录态直接进入桌面（不走登录流程）
+        
+        上下文需在创建时注入缓存的 storage_state。如果被重定向回登录页，
+        说明服务端会话已失效，调用方应使缓存失效并重新登录。
+        
+        Returns:
+            是否恢复成功
+        """
+        from pages.desktop_page import DesktopPage
+        
+        try:
+            desktop_url = DesktopPage(self.driver).base_url
+            await self.driver.goto(desktop_url, wait_until="domcontentloaded")
+            if 'login' in self.page.url.lower():
+                logger.info("[LoginPage] 缓存的登录态已被重定向到登录页，需要重新登录")
+                return False
+            if await self.is_logged_in():
+                logger.info("[LoginPage] 已通过缓存的登录态恢复会话")
+                return True
+        except Exception as e:
+            logger.warning(f"[LoginPage] 恢复登录态失败: {e}")
+        return False
+    
     async def is_logged_in(self) -> bool:
         """检查是否已登录
         
@@ -234,7 +254,7 @@ class LoginPage(BasePage):
             if 'login' in current_url.lower():
                 return False
             
-            # 检查是否存在桌面相关元素
+            # 检查是否存在桌面相关元素（合并为一次等待，任一元素可见即可，隐藏的匹配元素不影响判断）
             desktop_selectors = [
                 '.desktop',
                 '.desktop-container',
@@ -242,12 +262,8 @@ class LoginPage(BasePage):
                 '.app-icon'
             ]
             
-            for selector in desktop_selectors:
-                try:
-                    if await self.is_element_visible(selector, timeout=2000):
-                        return True
-                except:
-                    continue
+            if await self.is_any_visible(desktop_selectors, timeout=2000):
+                return True
             
             return False
         except:
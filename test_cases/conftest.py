@@ -12,17 +12,44 @@ import logging
 import sys
 import os
 import re
+import concurrent.futures
+import html
 from pathlib import Path
 from threading import Lock
+from typing import Optional
 from core.web_ui_driver import WebUIDriver
 from pages.desktop_page import DesktopPage
 from pages.login_page import LoginPage
+from utils.result_stream import ResultStreamWriter, RESULT_STREAM_ENV, report_worker, current_run_id, ensure_run_id
+from utils.progress_channel import ProgressReporter, report_outcome
+from utils.duration_scheduler import DurationScheduler
+from core.run_context import strip_xdist_group
+from core.action_tracer import ActionTracer, trace_span
+from utils.screenshot_utils import thumbnail_path_for, wait_pending, screenshot_stats, display_name
+from core.artifact_store import get_artifact_store
 
-# 全局列表：存储测试用例信息（按执行顺序），用于在pytest_html_results_table_row中获取测试名称
-# 每个元素是item.nodeid
+# 全局列表：存储测试用例nodeid（按结果上报顺序），用于在pytest_sessionfinish中匹配报告行
+# 在pytest_runtest_logreport中填充：并行执行时该hook在主进程中为所有worker的结果调用
 _test_item_list = []
 _test_item_lock = Lock()
-_test_item_index = 0  # 当前处理的测试项索引
+
+# 结果流写入器：控制台通过 WEBUI_RESULT_STREAM 指定文件时，每个测试阶段写入一条JSON记录
+_result_stream = None
+
+# 进度上报：控制台通过 WEBUI_PROGRESS_PORT 指定端口时，实时发送收集总数、当前用例和结果
+_progress = None
+_progress_total_sent = False
+
+# 按历史耗时调度（execution.scheduling.enabled 或 ENABLE_DURATION_SCHEDULING），记录预计与实际的makespan
+_scheduler = None
+
+# 共享的HTTP磁盘缓存（playwright.http_cache 启用时创建，同一进程的所有用例共用）
+_http_cache = None
+_http_cache_loaded = False
+
+# 操作时间线追踪（每个进程一个，追踪文件与结果流放在一起）
+_tracer = None
+_tracer_loaded = False
 
 # 确保环境变量设置UTF-8编码（在导入其他模块之前）
 os.environ['PYTHONIOENCODING'] = 'utf-8'
@@ -58,10 +85,13 @@ for handler in root_logger.handlers:
             if handler.stream.encoding == 'utf-8':
                 has_utf8_handler = True
                 break
+utf8_handler = None
 if not has_utf8_handler:
     utf8_handler = logging.StreamHandler(io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace'))
     utf8_handler.setFormatter(logging.Formatter('%(message)s'))
-    root_logger.addHandler(utf8_handler)
+# 控制台和日志文件handler放到后台线程中执行（队列日志管道），事件循环中记录日志只需入队
+from core.log_pipeline import setup_logging, set_current_test, install_sampling_filter
+setup_logging(console_handler=utf8_handler)
 
 # 导入pytest-html用于添加测试用例详情到报告
 try:
@@ -79,6 +109,12 @@ logger.setLevel(logging.INFO)
 # 允许传播到根logger，这样pytest-html也能捕获到日志
 logger.propagate = True
 
+def _locator_selector(locator) -> str:
+    """从locator字符串中提取选择器（用于操作时间线）"""
+    match = re.search(r"selector='(.*)'>$", str(locator))
+    return match.group(1) if match else str(locator)
+
+
 def logged_expect(locator):
     """包装expect以记录断言日志"""
     class LoggedExpect:
@@ -87,6 +123,10 @@ def logged_expect(locator):
             self._expect = original_expect(locator)
         
         async def to_be_visible(self, **kwargs):
+            async with trace_span(getattr(locator, 'page', None), 'expect.to_be_visible', _locator_selector(locator), 'expect'):
+                return await self._to_be_visible(**kwargs)
+        
+        async def _to_be_visible(self, **kwargs):
             try:
                 # 尝试获取元素的描述
                 locator_str = str(locator)
@@ -180,6 +220,11 @@ def logged_expect(locator):
                 raise
         
         async def to_contain_text(self, text, **kwargs):
+            async with trace_span(getattr(locator, 'page', None), 'expect.to_contain_text',
+                                  f"{_locator_selector(locator)} 包含 '{text}'", 'expect'):
+                return await self._to_contain_text(text, **kwargs)
+        
+        async def _to_contain_text(self, text, **kwargs):
             try:
                 locator_str = str(locator)
                 # 清理locator字符串，移除不必要的selector细节
@@ -216,8 +261,15 @@ def logged_expect(locator):
                 raise
         
         def __getattr__(self, name):
-            # 代理其他方法到原始expect对象
-            return getattr(self._expect, name)
+            # 代理其他方法到原始expect对象（断言方法记录到操作时间线）
+            attr = getattr(self._expect, name)
+            if not name.startswith(('to_', 'not_to_')) or not callable(attr):
+                return attr
+            
+            async def traced_assertion(*args, **kwargs):
+                async with trace_span(getattr(locator, 'page', None), f"expect.{name}", _locator_selector(locator), 'expect'):
+                    return await attr(*args, **kwargs)
+            return traced_assertion
     
     return LoggedExpect(locator)
 
@@ -229,33 +281,91 @@ if 'playwright.async_api' in sys.modules:
     sys.modules['playwright.async_api'].expect = logged_expect
 
 
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def browser_pool():
+    """会话级浏览器池 - 每个worker只启动一次Playwright和浏览器，按测试分发预热的上下文"""
+    from core.browser_pool import BrowserPool
+    
+    pool = BrowserPool()
+    pool_config = pool.config.get('playwright', {}).get('context_pool', {}) or {}
+    if not pool_config.get('enabled', True):
+        # 未启用浏览器池时，每个测试独立启动浏览器（旧行为）
+        yield None
+        return
+    
+    await pool.start()
+    yield pool
+    await pool.close()
+
+
 @pytest_asyncio.fixture(scope="function")
-async def driver(request):
-    """创建WebUI驱动实例（每个测试函数一个实例，确保事件循环一致）"""
-    import os
+async def driver(request, browser_pool):
+    """创建WebUI驱动实例（每个测试独占一个BrowserContext，浏览器进程在会话内共享）"""
     from core.video_recorder import VideoRecorder
     from core.performance_monitor import PerformanceMonitor
     
     # 初始化性能监控
     perf_monitor = PerformanceMonitor()
     
-    # 检查是否启用视频录制（默认关闭）
-    enable_video = os.environ.get('ENABLE_VIDEO_RECORDING', '0') == '1'
-    
+    # 检查是否启用视频录制（playwright.video，控制台通过 ENABLE_VIDEO_RECORDING 覆盖；可以只录制部分模块）
     video_options = None
-    video_recorder = None
-    
-    if enable_video:
-        # 只有在启用时才初始化视频录制
-        video_recorder = VideoRecorder()
-        # 获取测试用例名称（用于视频录制）
-        test_name = request.node.name if hasattr(request, 'node') else f"test_{id(request)}"
+    video_recorder = VideoRecorder()
+    if video_recorder.enabled_for(_item_module(request.node)):
         # 获取视频录制配置选项（必须在创建context之前）
-        video_options = video_recorder.get_recording_options(test_name)
+        video_options = video_recorder.get_recording_options(request.node.name)
+    else:
+        video_recorder = None
+    
+    # 本次执行是否失败（由 pytest_runtest_makereport 设置，重试时每次执行重新计算）
+    request.node.webui_failed = False
+    request.node.webui_vitals = {}
+    request.node.webui_traces = []
+    
+    # 注入缓存的登录态（有效期内），使login夹具无需重新走登录流程
+    from core.auth_state_cache import AuthStateCache
+    auth_cache = AuthStateCache()
+    state_path = auth_cache.get_valid_state_path()
+    context_options = None
+    if browser_pool:
+        if browser_pool.context_defaults.get('storage_state') != state_path:
+            await browser_pool.set_context_defaults(storage_state=state_path)
+    elif state_path:
+        context_options = {'storage_state': state_path}
+    
+    # 按用例所属模块加载网络路由配置（module_config.yaml 的 network_profiles）
+    from core.network_router import NetworkRouter
+    router = None
+    try:
+        router = NetworkRouter.for_module(_item_module(request.node), http_cache=_get_http_cache())
+    except Exception as e:
+        logger.warning(f"[Conftest] 加载网络路由配置失败，不拦截请求: {e}")
+    
+    # HAR录制/回放（playwright.har.mode，控制台通过 WEBUI_HAR_MODE 覆盖）
+    from core.har_archive import HarArchive
+    har = HarArchive()
+    
+    # Playwright追踪（playwright.tracing.mode，控制台通过 WEBUI_TRACE_MODE 覆盖）
+    from core.trace_recorder import TraceRecorder
+    trace_recorder = TraceRecorder()
     
     # 创建driver并启动（如果启用视频录制，传入视频录制选项）
     driver = WebUIDriver()
-    await driver.start(video_options=video_options)
+    await driver.start(
+        video_options=video_options, pool=browser_pool, context_options=context_options,
+        router=router, har=har, har_nodeid=request.node.nodeid,
+        trace_recorder=trace_recorder, attempt=getattr(request.node, 'execution_count', 1),
+        perf_monitor=perf_monitor
+    )
+    driver.auth_cache = auth_cache
+    driver.auth_state_path = state_path
+    
+    # 按用例所属模块加载性能预算（module_config.yaml 的 performance_budgets），用例结束时检查
+    from core.performance_budget import PerformanceBudget
+    driver.perf_budget = None
+    try:
+        driver.perf_budget = PerformanceBudget.for_module(_item_module(request.node))
+    except Exception as e:
+        logger.warning(f"[Conftest] 加载性能预算配置失败，不检查性能预算: {e}")
     
     # 将request保存到driver中，以便截图时能够访问item
     driver._pytest_request = request
@@ -263,26 +373,92 @@ async def driver(request):
     # 将监控器附加到driver
     if video_recorder:
         driver.video_recorder = video_recorder
-    driver.perf_monitor = perf_monitor
     
     # 获取测试用例名称（用于性能监控）
     test_name = request.node.name if hasattr(request, 'node') else f"test_{id(request)}"
     
+    # 记录本用例的操作时间线（重试时 execution_count 递增）
+    tracer = _get_tracer()
+    trace = tracer.start(driver.page, request.node.nodeid, getattr(request.node, 'execution_count', 1)) if tracer else None
+    
     yield driver
     
+    if trace:
+        tracer.finish(driver.page, trace)
+    
     # 关闭前收集性能指标
     if hasattr(driver, 'page') and driver.page and not driver.page.is_closed():
         try:
             await perf_monitor.collect_metrics(driver.page, test_name)
         except:
             pass
+    # Web Vitals汇总由teardown阶段的报告带到结果流和报告中
+    request.node.webui_vitals = perf_monitor.vitals_summary()
+    
+    # 记录本用例的等待统计，便于发现耗时较长的等待
+    wait_summary = driver.waiter.summary()
+    if wait_summary['count']:
+        logger.info(
+            f"[Conftest] 等待统计: {wait_summary['count']} 次, 总耗时 {wait_summary['total_ms']}ms, "
+            f"最长 {wait_summary['max_ms']}ms, 超时 {wait_summary['timeouts']} 次"
+        )
+    
+    # call阶段未能结束的追踪（如无法在hook中等待driver的事件循环）在这里按用例结果保存，随teardown报告上报
+    if driver.trace_active:
+        trace_path = await driver.stop_trace(request.node.webui_failed)
+        if trace_path:
+            request.node.webui_traces = [str(trace_path)]
     
     await driver.close()
+    
+    # 上下文关闭后视频才写完：通过的用例删除视频，失败的提交到后台裁剪压缩
+    if video_recorder:
+        try:
+            await video_recorder.save_video(
+                driver.page, request.node.nodeid, getattr(request.node, 'execution_count', 1),
+                failed=request.node.webui_failed
+            )
+        except Exception as e:
+            logger.error(f"[Conftest] 保存视频失败: {e}")
+
+
+def _get_tracer():
+    """获取本进程的操作追踪器（控制台未指定结果流或未启用时返回None）"""
+    global _tracer, _tracer_loaded
+    if not _tracer_loaded:
+        _tracer_loaded = True
+        try:
+            _tracer = ActionTracer.from_config(os.environ.get(RESULT_STREAM_ENV))
+        except Exception as e:
+            logger.warning(f"[Conftest] 初始化操作追踪失败: {e}")
+    return _tracer
+
+
+def _get_http_cache():
+    """获取本进程共享的HTTP磁盘缓存（未启用时返回None，只读取一次配置）"""
+    global _http_cache, _http_cache_loaded
+    if not _http_cache_loaded:
+        _http_cache_loaded = True
+        from core.http_cache import HttpCache
+        try:
+            _http_cache = HttpCache.from_config()
+        except Exception as e:
+            logger.warning(f"[Conftest] 初始化HTTP缓存失败，不使用缓存: {e}")
+    return _http_cache
+
+
+def _item_module(item) -> Optional[str]:
+    """获取用例所属模块：优先使用模块标记（teaching/exercise/...），其次从用例路径中提取"""
+    from utils.module_helper import ModuleHelper
+    for module_key in ModuleHelper.get_all_module_keys():
+        if item.get_closest_marker(module_key):
+            return module_key
+    return ModuleHelper.extract_module_from_path(item.nodeid)
 
 
 @pytest_asyncio.fixture(scope="function")
 async def login(driver):
-    """登录夹具 - 自动执行登录（模块级别，每个模块只登录一次，提高执行速度）"""
+    """登录夹具 - 优先复用缓存的登录态，只有缓存缺失或失效时才执行完整登录流程"""
     # 检查配置是否启用自动登录
     config_path = Path("config/settings.yaml")
     if config_path.exists():
@@ -291,10 +467,25 @@ async def login(driver):
         
         if config.get('login', {}).get('auto_login', True):
             login_page = LoginPage(driver)
-            # 检查是否已登录
-            if not await login_page.is_logged_in():
+            auth_cache = driver.auth_cache
+            
+            restored = False
+            if driver.auth_state_path:
+                restored = await login_page.restore_session()
+                if not restored:
+                    auth_cache.invalidate()
+            
+            if not restored:
                 await login_page.login()
+                if await login_page.is_logged_in():
+                    await auth_cache.save(driver.context)
+            
             yield login_page
+            
+            # 测试期间出现401，说明服务端会话已失效，下一个用例重新登录
+            if driver.unauthorized_responses:
+                logger.info(f"[Conftest] 检测到 {driver.unauthorized_responses} 次401响应，登录态缓存失效")
+                auth_cache.invalidate()
         else:
             yield None
     else:
@@ -306,9 +497,8 @@ async def desktop(driver, login):
     """桌面页面夹具 - 自动登录后打开桌面"""
     desktop_page = DesktopPage(driver)
     
-    # 简单检查：如果不在桌面，等待一下（login fixture 已经处理了登录）
-    import asyncio
-    await asyncio.sleep(1)  # 等待桌面加载
+    # 等待桌面稳定（login fixture 已经处理了登录）
+    await desktop_page.wait_until_settled()
     
     yield desktop_page
     
@@ -336,18 +526,198 @@ async def reset_state(driver):
 @pytest.hookimpl
 def pytest_sessionstart(session):
     """pytest session开始时清空测试用例列表"""
-    global _test_item_list, _test_item_index
+    global _result_stream, _progress, _scheduler
     with _test_item_lock:
         _test_item_list.clear()
-        _test_item_index = 0
-        # 重置hook的初始化标记
-        if hasattr(pytest_html_results_table_row, '_initialized'):
-            delattr(pytest_html_results_table_row, '_initialized')
         logger.debug(f"[Conftest] pytest session开始，清空测试用例列表")
+    
+    # 页面console等日志的限流同样作用于pytest的实时日志（--log-cli-level）和日志捕获handler
+    logging_plugin = session.config.pluginmanager.get_plugin('logging-plugin')
+    if logging_plugin:
+        install_sampling_filter(
+            getattr(logging_plugin, name, None)
+            for name in ('log_cli_handler', 'log_file_handler', 'caplog_handler', 'report_handler')
+        )
+    
+    # 命令行直接执行时没有结果流，生成本次执行的标识（产物按执行标识区分，worker启动时继承）
+    if not hasattr(session.config, 'workerinput'):
+        ensure_run_id()
+    
+    # 结果流只由主进程写入（并行执行时worker的结果会汇总到主进程的logreport中）
+    stream_path = os.environ.get(RESULT_STREAM_ENV)
+    if stream_path and not hasattr(session.config, 'workerinput'):
+        try:
+            _result_stream = ResultStreamWriter(stream_path)
+            logger.info(f"[Conftest] 结果流输出到: {stream_path}")
+        except Exception as e:
+            logger.warning(f"[Conftest] 无法创建结果流文件: {e}")
+    
+    # 进度同样只由主进程上报（xdist会把worker的logstart/logreport转发到主进程）
+    if not hasattr(session.config, 'workerinput'):
+        _progress = ProgressReporter.from_env()
+    
+    if DurationScheduler.is_enabled():
+        try:
+            _scheduler = DurationScheduler()
+        except Exception as e:
+            logger.warning(f"[Conftest] 初始化耗时调度失败，按默认顺序执行: {e}")
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(session, config, items):
+    """并行执行时按历史耗时从长到短排序，并按LPT装箱添加 xdist_group 分组（需要 --dist loadgroup）；串行执行保持收集顺序
+
+    tryfirst：必须在xdist把分组名追加到nodeid之前执行
+    """
+    if not _scheduler:
+        return
+    workerinput = getattr(config, 'workerinput', None)
+    workers = int(workerinput.get('workercount', 1)) if workerinput else 1
+    try:
+        _scheduler.schedule_items(items, workers)
+    except Exception as e:
+        logger.warning(f"[Conftest] 耗时调度失败，按默认顺序执行: {e}")
+
+
+@pytest.hookimpl
+def pytest_collection_finish(session):
+    """串行执行：收集完成后上报用例总数"""
+    if _progress:
+        _progress.send('collected', total=len(session.items))
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_node_collection_finished(node, ids):
+    """并行执行：各worker收集结果相同，取第一个完成收集的worker上报用例总数"""
+    global _progress_total_sent
+    if _scheduler and not _scheduler.predicted_loads:
+        _scheduler.predict_from_ids(ids)
+    if _progress and not _progress_total_sent:
+        _progress_total_sent = True
+        _progress.send('collected', total=len(ids))
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    """执行用例期间的日志记录带上该用例的nodeid（只在实际执行用例的进程中调用）"""
+    set_current_test(strip_xdist_group(item.nodeid))
+    try:
+        yield
+    finally:
+        set_current_test('')
+
+
+@pytest.hookimpl
+def pytest_runtest_logstart(nodeid, location):
+    """上报当前开始执行的用例"""
+    if _progress:
+        _progress.send('start', nodeid=strip_xdist_group(nodeid))
+
+
+@pytest.hookimpl
+def pytest_runtest_logreport(report):
+    """记录已上报结果的测试用例（并行执行时在主进程中汇总所有worker的结果）"""
+    if report.when == "call":
+        with _test_item_lock:
+            if report.nodeid not in _test_item_list:
+                _test_item_list.append(report.nodeid)
+    
+    if _result_stream:
+        try:
+            _result_stream.write_report(report)
+        except Exception as e:
+            logger.warning(f"[Conftest] 写入结果流失败: {e}")
+    
+    if _progress:
+        outcome = report_outcome(report)
+        if outcome:
+            _progress.send('result', nodeid=strip_xdist_group(report.nodeid), when=report.when, outcome=outcome)
+    
+    if _scheduler:
+        _scheduler.record(report_worker(report), report.duration)
+
+
+def _screenshot_extra(screenshot_file: Path):
+    """截图对应的pytest-html附件：有缩略图时报告中显示缩略图，点击打开原图"""
+    # 使用绝对路径（Windows格式，转换为正斜杠）
+    # 格式：C:/Users/SHENYUAN/Desktop/WebUI_zb/screenshots/filename.jpg
+    absolute_path_str = str(screenshot_file.resolve()).replace('\\', '/')
+    thumbnail = thumbnail_path_for(str(screenshot_file))
+    if not thumbnail.exists():
+        return pytest_html.extras.image(absolute_path_str)
+    thumbnail_str = str(thumbnail.resolve()).replace('\\', '/')
+    return pytest_html.extras.html(
+        f'<div class="image"><a href="{absolute_path_str}" target="_blank">'
+        f'<img src="{thumbnail_str}" loading="lazy"/></a></div>'
+    )
+
+
+def _vitals_html(vitals: dict) -> str:
+    """Web Vitals汇总和各路由分段的HTML（pytest-html附件）"""
+    def value(number, unit='ms'):
+        return '-' if number is None else f"{number}{unit}"
+
+    rows = ''.join(
+        f"<tr><td>{html.escape(segment['step'] or '-')}</td><td>{html.escape(segment['route'])}</td>"
+        f"<td>{value(segment['lcp_ms'])}</td><td>{segment['cls']}</td><td>{value(segment['inp_ms'])}</td>"
+        f"<td>{segment['long_tasks']}（{segment['long_task_ms']}ms）</td><td>{segment['duration_ms']}ms</td></tr>"
+        for segment in vitals.get('segments', [])
+    )
+    return (
+        f'<details style="margin: 5px 0;"><summary><strong>Web Vitals</strong>：'
+        f'LCP {value(vitals.get("lcp_ms"))}，CLS {value(vitals.get("cls"), "")}，INP {value(vitals.get("inp_ms"))}，'
+        f'长任务 {vitals.get("long_tasks", 0)} 个（{vitals.get("long_task_ms", 0)}ms），路由切换 {vitals.get("navigations", 0)} 次</summary>'
+        f'<table style="font-size: 12px;"><tr><th>步骤</th><th>路由</th><th>LCP</th><th>CLS</th><th>INP</th>'
+        f'<th>长任务</th><th>停留</th></tr>{rows}</table></details>'
+    )
+
+
+def _trace_html(trace_path) -> str:
+    """追踪文件链接（pytest-html附件）"""
+    trace_file = Path(trace_path)
+    return (
+        f'<div style="margin: 5px 0;">Playwright追踪: <a href="{trace_file.resolve().as_uri()}">{html.escape(trace_file.name)}</a>'
+        f'（使用 <code>playwright show-trace</code> 或 trace.playwright.dev 打开）</div>'
+    )
+
+
+def _run_on_driver_loop(driver, coro_factory, timeout: float = 5.0, action: str = '操作'):
+    """在driver所在的事件循环中执行协程并等待结果（供同步的pytest hook调用）
+
+    Playwright对象只能在创建它的事件循环中使用：
+    - 事件循环在其他线程运行时，提交到该循环并等待
+    - 事件循环未运行（pytest-asyncio在用例之间、同一线程中）时，直接在该循环上执行
+    - 当前线程正在运行该循环时无法同步等待结果，不执行并记录警告（调用方按未执行处理，
+      追踪文件由driver夹具清理时保存）
+
+    Args:
+        driver: WebUIDriver
+        coro_factory: 返回协程的函数
+        timeout: 等待超时时间（秒）
+        action: 操作名称（用于日志）
+
+    Returns:
+        协程的返回值，未执行时返回None
+    """
+    driver_loop = getattr(driver, '_loop', None)
+    if driver_loop is None or driver_loop.is_closed():
+        logger.warning("[Conftest] driver的事件循环不可用，跳过")
+        return None
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if running_loop is driver_loop:
+        logger.warning(f"[Conftest] 当前线程正在运行driver的事件循环，无法等待结果，跳过{action}")
+        return None
+    if driver_loop.is_running():
+        return asyncio.run_coroutine_threadsafe(coro_factory(), driver_loop).result(timeout=timeout)
+    return driver_loop.run_until_complete(asyncio.wait_for(coro_factory(), timeout=timeout))
+
 
 @pytest.hookimpl(hookwrapper=True)
 def pytest_runtest_makereport(item, call):
-    """在测试失败时自动截图和保存视频，并添加错误信息到pytest-html报告
+    """在测试失败时自动截图并标记失败（driver夹具清理时据此保留视频），添加错误信息到pytest-html报告
     同时处理手动截图（成功和失败时都添加）
     
     注意：pytest-html 3.2.0 会自动生成测试用例详情，我们只需要在失败时添加错误信息
@@ -355,23 +725,76 @@ def pytest_runtest_makereport(item, call):
     outcome = yield
     rep = outcome.get_result()
     
-    # 存储测试用例信息到全局列表，供pytest_html_results_table_row使用
-    # 按执行顺序存储item.nodeid
-    if rep.when == "call":
-        with _test_item_lock:
-            if item.nodeid not in _test_item_list:
-                _test_item_list.append(item.nodeid)
-                logger.debug(f"[Conftest] 添加测试用例到全局列表: {item.nodeid}, 当前列表长度: {len(_test_item_list)}")
-    
     # 初始化extra列表
     if not hasattr(rep, 'extra'):
         rep.extra = []
     
+    # 记录本阶段的截图路径（随报告序列化，并行执行时也能传回主进程写入结果流）
+    rep.screenshots = list(getattr(item, 'manual_screenshots', [])) if rep.when == "call" else []
+    # 追踪文件通常在call阶段保存；call阶段无法保存时由driver夹具清理时保存，随teardown报告上报
+    rep.traces = list(getattr(item, 'webui_traces', None) or []) if rep.when == "teardown" else []
+    if rep.traces and pytest_html:
+        rep.extra.extend(pytest_html.extras.html(_trace_html(trace_path)) for trace_path in rep.traces)
+    # Web Vitals汇总在driver夹具清理时采集，随teardown阶段的报告写入结果流
+    rep.vitals = dict(getattr(item, 'webui_vitals', None) or {}) if rep.when == "teardown" else {}
+    if rep.vitals and pytest_html:
+        rep.extra.append(pytest_html.extras.html(_vitals_html(rep.vitals)))
+    
+    # 记录本用例的网络拦截统计（请求数、节省的流量），写入结果流并显示在报告中
+    rep.network = {}
+    if rep.when == "call":
+        router = getattr(item.funcargs.get('driver'), 'router', None)
+        if router and router.counters['requests']:
+            rep.network = router.stats()
+            if pytest_html:
+                from core.network_router import format_bytes
+                rep.extra.append(pytest_html.extras.html(
+                    f'<div style="margin: 5px 0; color: #1976d2;">网络路由: 拦截 {rep.network["requests"]} 个请求'
+                    f'（中止 {rep.network["aborted"]}，桩数据 {rep.network["stubbed"]}，缓存命中 {rep.network["cache_hits"]}），'
+                    f'节省约 {format_bytes(rep.network["bytes_saved"])}</div>'
+                ))
+    
+    # 用例执行完成后检查性能预算：warn 只记录到报告，fail 模式超出预算时把通过的用例判为失败
+    # 在call阶段检查，判为失败后失败截图、追踪、视频和重试都按失败用例处理
+    rep.budget = []
+    if rep.when == "call":
+        driver = item.funcargs.get('driver')
+        budget = getattr(driver, 'perf_budget', None)
+        if budget and driver.perf_monitor:
+            try:
+                _run_on_driver_loop(driver, lambda: driver.mark_step(''), timeout=5.0, action='读取性能分段')
+            except Exception as e:
+                logger.debug(f"[Conftest] 读取性能分段失败: {e}")
+            rep.budget = budget.evaluate(driver.perf_monitor.segments)
+        if rep.budget:
+            from core.performance_budget import format_violation
+            lines = [format_violation(violation) for violation in rep.budget]
+            rep.sections.append(("性能预算", "\n".join(lines)))
+            if pytest_html:
+                rep.extra.append(pytest_html.extras.html(
+                    f'<div style="margin: 5px 0; color: #e65100;"><strong>性能预算超出:</strong><br>'
+                    f'{"<br>".join(html.escape(line) for line in lines)}</div>'
+                ))
+            if rep.passed and budget.has_failures(rep.budget):
+                rep.outcome = "failed"
+                rep.longrepr = "性能预算超出:\n" + "\n".join(lines)
+                logger.warning(f"[Conftest] 用例超出性能预算，判为失败: {item.nodeid}")
+    
+    # 测试失败时附加失败前最近的页面事件（console、页面错误、网络请求），通过时不产生任何输出
+    if rep.failed and rep.when in ("setup", "call"):
+        event_buffer = getattr(item.funcargs.get('driver'), 'event_buffer', None)
+        if event_buffer:
+            rep.sections.append(("页面事件（失败前最近记录）", event_buffer.to_text()))
+            if pytest_html:
+                rep.extra.append(pytest_html.extras.html(event_buffer.to_html()))
+    
     # 处理手动截图（无论成功还是失败，都要添加到报告中）
     # 区分截图类型：手动截图、错误截图、成功截图
     if rep.when == "call" and pytest_html:
         # 检查是否有手动截图（保存在item中）
         if hasattr(item, 'manual_screenshots') and item.manual_screenshots:
+            # 截图在后台线程中写入，添加到报告前等待写完
+            wait_pending()
             # 用于跟踪已添加的截图类型标签，每种类型只添加一次
             added_types = set()
             
@@ -385,9 +808,9 @@ def pytest_runtest_makereport(item, call):
                         screenshot_file = Path.cwd() / screenshot_file
                     
                     if screenshot_file.exists():
-                        # 判断截图类型（根据文件名前缀）
+                        # 判断截图类型（根据截图名称前缀，产物存储中的文件按哈希命名）
                         screenshot_type = "手动截图"
-                        filename = screenshot_file.name.lower()
+                        filename = display_name(screenshot_path).lower()
                         if filename.startswith('error_') or filename.startswith('断言失败_') or filename.startswith('等待元素_'):
                             screenshot_type = "错误截图"
                         elif filename.startswith('success_') or filename.startswith('成功_'):
@@ -395,10 +818,6 @@ def pytest_runtest_makereport(item, call):
                         elif '关键步骤' in filename or '操作完成' in filename:
                             screenshot_type = "关键步骤截图"
                         
-                        # 使用绝对路径（Windows格式，转换为正斜杠）
-                        # 格式：C:/Users/SHENYUAN/Desktop/WebUI_zb/screenshots/filename.png
-                        absolute_path_str = str(screenshot_file.resolve()).replace('\\', '/')
-                        
                         # 每种截图类型只添加一次标签
                         if screenshot_type not in added_types:
                             color_map = {
@@ -413,8 +832,8 @@ def pytest_runtest_makereport(item, call):
                             ))
                             added_types.add(screenshot_type)
                         
-                        rep.extra.append(pytest_html.extras.png(absolute_path_str))
-                        logger.info(f"[Conftest] {screenshot_type}已添加到报告: {screenshot_path}, 绝对路径: {absolute_path_str}")
+                        rep.extra.append(_screenshot_extra(screenshot_file))
+                        logger.info(f"[Conftest] {screenshot_type}已添加到报告: {screenshot_path}")
                 except Exception as e:
                     logger.warning(f"[Conftest] 添加手动截图到报告失败: {e}")
                     import traceback
@@ -435,7 +854,7 @@ def pytest_runtest_makereport(item, call):
                 f'</div>'
             ))
     
-    # 只在测试失败时自动截图和保存视频
+    # 只在测试失败时自动截图
     if rep.when == "call" and rep.failed:
         # 获取 driver fixture
         if 'driver' in item.fixturenames:
@@ -461,111 +880,84 @@ def pytest_runtest_makereport(item, call):
                                     error_msg = f"等待元素_{wait_match.group(1)}"
                                 else:
                                     error_msg = error_str[:50]
-                            screenshot_path = await driver.take_error_screenshot(error_msg)
-                            
-                            # 如果截图成功，添加到pytest-html报告中
-                            if screenshot_path and pytest_html and Path(screenshot_path).exists():
-                                # 将截图路径转换为相对路径（相对于报告文件）
-                                # pytest-html报告在reports目录，截图在screenshots目录（项目根目录）
-                                screenshot_file = Path(screenshot_path)
-                                if not screenshot_file.is_absolute():
-                                    screenshot_file = Path.cwd() / screenshot_file
-                                
-                                # 从reports目录到screenshots目录的相对路径
-                                # 报告在 reports/ 目录，截图在 screenshots/ 目录
-                                # 所以相对路径应该是 ../screenshots/filename.png
-                                relative_path = Path('..') / 'screenshots' / screenshot_file.name
-                                
-                                # 使用pytest-html的extras添加截图
-                                if not hasattr(rep, 'extra'):
-                                    rep.extra = []
-                                # 使用绝对路径（Windows格式，转换为正斜杠）
-                                # 格式：C:/Users/SHENYUAN/Desktop/WebUI_zb/screenshots/filename.png
-                                absolute_path_str = str(screenshot_file.resolve()).replace('\\', '/')
-                                
-                                # 添加错误截图类型标签（右对齐显示，且只添加一次）
-                                # 检查是否已经添加过错误截图标签
-                                if not hasattr(rep, '_error_screenshot_label_added'):
-                                    rep.extra.append(pytest_html.extras.html(
-                                        f'<div style="margin: 5px 0; text-align: right;"><strong style="color: #d32f2f;">错误截图:</strong></div>'
-                                    ))
-                                    rep._error_screenshot_label_added = True
-                                rep.extra.append(pytest_html.extras.png(absolute_path_str))
-                                logger.info(f"[Conftest] 失败截图已添加到报告: {screenshot_path}, 绝对路径: {absolute_path_str}")
+                            return await driver.take_error_screenshot(error_msg)
                         except Exception as e:
                             logger.error(f"[Conftest] 截图失败: {e}")
                             import traceback
                             logger.error(traceback.format_exc())
+                            return None
                     
-                    # 修复事件循环问题：确保在正确的事件循环中执行截图
-                    # 注意：在pytest hook中，测试已经结束，可能不在事件循环中
-                    # 我们需要使用driver的事件循环来执行截图
+                    # 在driver的事件循环中执行截图（Playwright对象不能在其他事件循环中使用）
+                    screenshot_path = None
                     try:
-                        # 尝试获取driver的事件循环（如果driver保存了事件循环引用）
-                        driver_loop = None
-                        if hasattr(driver, '_loop'):
-                            driver_loop = driver._loop
-                        elif hasattr(driver, 'context') and hasattr(driver.context, '_connection') and hasattr(driver.context._connection, '_loop'):
-                            driver_loop = driver.context._connection._loop
-                        
-                        if driver_loop and not driver_loop.is_closed() and driver.page and not driver.page.is_closed():
-                            # 使用driver的事件循环执行截图
-                            import concurrent.futures
-                            future = asyncio.run_coroutine_threadsafe(take_screenshot(), driver_loop)
-                            try:
-                                # 等待截图完成（最多5秒）
-                                future.result(timeout=5.0)
-                            except concurrent.futures.TimeoutError:
-                                logger.warning(f"[Conftest] 截图任务超时")
-                            except Exception as e:
-                                logger.warning(f"[Conftest] 截图任务失败: {e}")
-                        else:
-                            # 尝试获取当前运行的事件循环
-                            try:
-                                loop = asyncio.get_running_loop()
-                                if driver.page and not driver.page.is_closed():
-                                    task = loop.create_task(take_screenshot())
-                                    # 不等待任务完成，避免阻塞
-                            except RuntimeError:
-                                # 如果不在事件循环中，尝试使用新的事件循环
-                                try:
-                                    if driver.page and not driver.page.is_closed():
-                                        # 使用同步方式调用异步函数（不推荐，但作为最后手段）
-                                        new_loop = asyncio.new_event_loop()
-                                        asyncio.set_event_loop(new_loop)
-                                        try:
-                                            new_loop.run_until_complete(asyncio.wait_for(take_screenshot(), timeout=5.0))
-                                        finally:
-                                            new_loop.close()
-                                except Exception as e:
-                                    logger.warning(f"[Conftest] 不在事件循环中，尝试创建新事件循环失败: {e}")
+                        screenshot_path = _run_on_driver_loop(driver, take_screenshot, timeout=10.0, action='失败截图')
+                        # 截图在后台线程中写入，添加到报告前等待写完
+                        wait_pending()
+                    except (asyncio.TimeoutError, concurrent.futures.TimeoutError):
+                        logger.warning(f"[Conftest] 截图任务超时")
                     except Exception as e:
                         logger.warning(f"[Conftest] 截图失败: {e}")
                         import traceback
                         logger.debug(traceback.format_exc())
                     
-                    # 保存失败用例的视频（仅在启用视频录制时）
-                    if hasattr(driver, 'video_recorder') and driver.video_recorder and hasattr(driver, 'context'):
-                        try:
-                            test_name = item.name
-                            video_path = driver.video_recorder.save_video(driver.context, test_name, failed=True)
-                            if video_path:
-                                logger.info(f"[Conftest] 失败用例视频已保存: {video_path}")
-                        except Exception as e:
-                            logger.error(f"[Conftest] 保存视频失败: {e}")
+                    if screenshot_path:
+                        rep.screenshots.append(screenshot_path)
+                    
+                    # 如果截图成功，添加到pytest-html报告中
+                    if screenshot_path and pytest_html and Path(screenshot_path).exists():
+                        screenshot_file = Path(screenshot_path)
+                        if not screenshot_file.is_absolute():
+                            screenshot_file = Path.cwd() / screenshot_file
+                        
+                        # 添加错误截图类型标签（右对齐显示，且只添加一次）
+                        # 检查是否已经添加过错误截图标签
+                        if not hasattr(rep, '_error_screenshot_label_added'):
+                            rep.extra.append(pytest_html.extras.html(
+                                f'<div style="margin: 5px 0; text-align: right;"><strong style="color: #d32f2f;">错误截图:</strong></div>'
+                            ))
+                            rep._error_screenshot_label_added = True
+                        rep.extra.append(_screenshot_extra(screenshot_file))
+                        logger.info(f"[Conftest] 失败截图已添加到报告: {screenshot_path}")
+
             except Exception as e:
                 logger.error(f"[Conftest] 自动截图失败: {e}")
                 import traceback
                 logger.error(traceback.format_exc())
+    
+    # 用例结果确定后结束Playwright追踪（失败截图之后，截图操作也在追踪中）
+    # 在call阶段而不是driver夹具清理时结束：pytest-rerunfailures 重试时不会上报失败那次的teardown报告
+    if rep.when == "call" or (rep.when == "setup" and rep.failed):
+        driver = item.funcargs.get('driver')
+        if driver is not None and getattr(driver, 'trace_active', False):
+            trace_path = None
+            try:
+                trace_path = _run_on_driver_loop(driver, lambda: driver.stop_trace(rep.failed), timeout=30.0, action='保存追踪文件')
+            except (asyncio.TimeoutError, concurrent.futures.TimeoutError):
+                logger.warning("[Conftest] 保存追踪文件超时")
+            except Exception as e:
+                logger.warning(f"[Conftest] 保存追踪文件失败: {e}")
+            if trace_path:
+                rep.traces.append(str(trace_path))
+                if pytest_html:
+                    rep.extra.append(pytest_html.extras.html(_trace_html(trace_path)))
+    
+    # 标记失败用例的产物（截图索引写入完成后再标记），清理时失败用例的截图保留更久
+    if rep.failed and rep.when in ("setup", "call"):
+        # driver夹具清理时据此决定保留视频
+        item.webui_failed = True
+        store = get_artifact_store()
+        if store:
+            wait_pending()
+            try:
+                store.mark_failed(strip_xdist_group(item.nodeid), current_run_id())
+            except Exception as e:
+                logger.warning(f"[Conftest] 标记失败用例产物失败: {e}")
 
 
 # pytest-html hook：修改Test列显示，添加中文模块标识
-# 注意：pytest-html 3.2.0 版本的 hook 只接受 cells 参数
-# pytest-html hook：修改Test列显示，添加中文模块标识
-# 注意：pytest-html 3.2.0 版本的 hook 只接受 cells 参数
-# 使用tryfirst=True确保我们的hook先执行，不使用hookwrapper
+# 通过report.nodeid定位测试用例，并行执行（xdist）时报告行的顺序与执行顺序无关也能正确对应
 @pytest.hookimpl(trylast=True)
-def pytest_html_results_table_row(cells):
+def pytest_html_results_table_row(report, cells):
     """修改pytest-html报告中的Test列，添加中文模块标识和详细信息
     
     注意：pytest-html使用BeautifulSoup处理HTML，HTML报告的charset是GB2312
@@ -574,22 +966,6 @@ def pytest_html_results_table_row(cells):
     使用trylast=True确保我们的hook最后执行，这样我们的修改不会被其他hook覆盖
     不使用hookwrapper，直接修改cells
     """
-    # 重置索引（每次生成报告时重置，使用函数属性来标记）
-    global _test_item_index
-    init_key = '_initialized'
-    # 使用时间戳作为key，确保每次报告生成时都重置
-    import time
-    current_time = int(time.time())
-    time_key = f'_initialized_{current_time}'
-    if not hasattr(pytest_html_results_table_row, time_key):
-        _test_item_index = 0
-        setattr(pytest_html_results_table_row, time_key, True)
-        # 清除旧的初始化标记
-        for attr in dir(pytest_html_results_table_row):
-            if attr.startswith('_initialized_') and attr != time_key:
-                delattr(pytest_html_results_table_row, attr)
-        logger.info(f"[Conftest] 重置测试项索引，全局列表长度: {len(_test_item_list)}, 列表内容: {_test_item_list}")
-    
     # 检查是否是真正的测试行（不是extra详情行）
     # extra行的cells数量可能不同，或者第一个cell是extra类
     if len(cells) < 2:
@@ -618,17 +994,8 @@ def pytest_html_results_table_row(cells):
             # 获取测试名称（Test列）
             test_cell = cells[1]  # Test列是第二个单元格
             
-            # 方法1：尝试从全局列表中按顺序获取测试信息
-            # pytest-html在生成报告时，通常按照测试执行的顺序调用hook
-            test_nodeid = None
-            with _test_item_lock:
-                logger.info(f"[Conftest] hook被调用，当前索引: {_test_item_index}, 列表长度: {len(_test_item_list)}")
-                if _test_item_index < len(_test_item_list):
-                    test_nodeid = _test_item_list[_test_item_index]
-                    _test_item_index += 1
-                    logger.info(f"[Conftest] 从全局列表获取测试名称: {test_nodeid}, 索引: {_test_item_index-1}")
-                else:
-                    logger.warning(f"[Conftest] 全局列表索引超出范围: {_test_item_index} >= {len(_test_item_list)}, 列表内容: {_test_item_list}")
+            # 方法1：直接使用该行对应报告的nodeid
+            test_nodeid = getattr(report, 'nodeid', None)
             
             # 方法2：如果方法1失败，尝试从test_cell中获取
             test_name = ''
@@ -815,6 +1182,49 @@ def pytest_html_results_table_row(cells):
 @pytest.hookimpl
 def pytest_sessionfinish(session, exitstatus):
     """在pytest会话结束后，直接修改HTML报告文件，确保中文信息被正确保存"""
+    global _result_stream, _progress, _scheduler
+    if _http_cache:
+        # 写回内存中的缓存索引，每个进程（含xdist worker）输出自己的命中统计
+        _http_cache.close()
+        cache_stats = _http_cache.stats()
+        usage = _http_cache.usage()
+        logger.info(
+            f"[Conftest] HTTP缓存命中率: {cache_stats['hit_ratio']}% "
+            f"(命中 {cache_stats['hits']}, 重新验证 {cache_stats['revalidated']}, 未命中 {cache_stats['misses']}, "
+            f"淘汰 {cache_stats['evicted']})，缓存占用: {usage['entries']} 个 / {usage['size'] / 1024 / 1024:.1f}MB"
+        )
+    shot_stats = screenshot_stats()
+    if shot_stats['count']:
+        # 每个进程输出自己的截图耗时统计
+        logger.info(
+            f"[Conftest] 截图 {shot_stats['count']} 张（重复 {shot_stats['deduped']} 张），平均截图耗时 {shot_stats['avg_capture_ms']}ms"
+            f"（最长 {shot_stats['max_capture_ms']}ms），平均编码耗时 {shot_stats['avg_encode_ms']}ms，"
+            f"共 {shot_stats['total_bytes'] / 1024 / 1024:.1f}MB"
+        )
+    # 等待后台的失败视频裁剪压缩完成，进程退出前视频都已写入
+    from core.video_recorder import shutdown as shutdown_video_processing
+    shutdown_video_processing()
+    if _scheduler and _scheduler.predicted_loads and not hasattr(session.config, 'workerinput'):
+        summary = _scheduler.summary()
+        logger.info(
+            f"[Scheduler] 预计makespan: {summary['predicted_makespan']}秒，实际makespan: {summary['actual_makespan']}秒"
+            f"（预计总耗时 {summary['predicted_total']}秒，实际总耗时 {summary['actual_total']}秒）"
+        )
+        if _result_stream:
+            # 没有nodeid的记录不参与用例汇总，仅供报告展示调度效果
+            _result_stream.write({'event': 'scheduler', **summary})
+        _scheduler = None
+    if _result_stream:
+        _result_stream.close()
+        _result_stream = None
+    if _progress:
+        _progress.send('finish', exitstatus=int(exitstatus))
+        _progress.close()
+        _progress = None
+    
+    # 并行执行时报告由主进程生成，worker进程不处理
+    if hasattr(session.config, 'workerinput'):
+        return
     try:
         # 获取pytest-html报告路径
         html_report_path = None
@@ -6,7 +6,6 @@ Teaching模块 - 导航功能测试用例
 @Author: auto
 """
 import pytest
-import asyncio
 from pages.desktop_page import DesktopPage
 from playwright.async_api import expect
 
@@ -44,7 +43,7 @@ class TestTeachingNavigation:
             
             # 双击启动应用
             await page.get_by_text("实验实践教学平台").dblclick()
-            await asyncio.sleep(1)  # 等待应用加载
+            await desktop.wait_until_settled(target=page.get_by_role("menuitem", name="统计分析"))  # 等待应用加载
             
             # 验证应用启动成功：检查主菜单是否可见
             await expect(page.get_by_role("menuitem", name="统计分析")).to_be_visible()
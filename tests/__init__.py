@@ -0,0 +1,3 @@
+"""
+框架单元测试（不需要浏览器，直接 pytest tests/unit 执行）
+"""
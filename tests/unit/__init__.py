@@ -0,0 +1,3 @@
+"""
+纯Python逻辑的单元测试：结果汇总、调度、统计和性能预算
+"""
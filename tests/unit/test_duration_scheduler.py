@@ -0,0 +1,145 @@
+"""
+按历史耗时调度（DurationScheduler）的单元测试：LPT装箱的均衡性、确定性和新用例的耗时估算
+
+@File  : test_duration_scheduler.py
+@Author: shenyuan
+"""
+from utils.duration_scheduler import DurationScheduler
+
+FILE_A = 'test_cases/teaching/test_teaching_first.py'
+FILE_B = 'test_cases/exam/test_exam_first.py'
+
+
+def _scheduler(history):
+    """不读取配置和结果库，直接使用给定的历史耗时"""
+    return DurationScheduler(config_path='missing.yaml', history=history)
+
+
+class _Item:
+    """只包含 schedule_items 用到的属性"""
+
+    def __init__(self, nodeid):
+        self.nodeid = nodeid
+        self.markers = []
+
+    def add_marker(self, marker):
+        self.markers.append(marker)
+
+
+class TestPlan:
+    """DurationScheduler.plan 的LPT装箱（以测试文件为单位）"""
+
+    def test_lpt_balance_by_file(self):
+        """按文件总耗时从长到短分配给当前负载最小的worker"""
+        history = {f"test_cases/m{cost}/test_m{cost}.py::test_a": float(cost) for cost in (7, 6, 5, 4, 3, 2)}
+        scheduler = _scheduler(history)
+
+        assignment, loads = scheduler.plan(list(history), 2)
+
+        assert loads == [14.0, 13.0]
+        assert assignment['test_cases/m7/test_m7.py::test_a'] != assignment['test_cases/m6/test_m6.py::test_a']
+        # LPT保证：最慢worker与最快worker的差不超过单个文件的最大耗时
+        assert max(loads) - min(loads) <= max(history.values())
+
+    def test_file_not_split(self):
+        """同一文件的用例分到同一个worker，文件耗时为其用例耗时之和"""
+        history = {f"{FILE_A}::test_{i}": 10.0 for i in range(4)}
+        history.update({f"{FILE_B}::test_{i}": 5.0 for i in range(2)})
+        scheduler = _scheduler(history)
+
+        assignment, loads = scheduler.plan(list(history), 3)
+
+        assert len({assignment[f"{FILE_A}::test_{i}"] for i in range(4)}) == 1
+        assert len({assignment[f"{FILE_B}::test_{i}"] for i in range(2)}) == 1
+        assert sorted(loads) == [0.0, 10.0, 40.0]
+
+    def test_long_files_spread_across_workers(self):
+        """几个耗时很长的文件分配到不同的worker上"""
+        history = {f"test_cases/long{i}/test_long.py::test_a": 100.0 for i in range(3)}
+        history.update({f"test_cases/short{i}/test_short.py::test_a": 1.0 for i in range(30)})
+        scheduler = _scheduler(history)
+
+        assignment, loads = scheduler.plan(list(history), 3)
+
+        assert sorted(assignment[f"test_cases/long{i}/test_long.py::test_a"] for i in range(3)) == [0, 1, 2]
+        assert loads == [110.0, 110.0, 110.0]
+
+    def test_deterministic_regardless_of_input_order(self):
+        """每个worker各自计算分配，输入顺序不同时结果必须一致"""
+        history = {f"test_cases/m{i}/test_m.py::test_a": 5.0 for i in range(8)}
+        scheduler = _scheduler(history)
+        nodeids = list(history)
+
+        assert scheduler.plan(nodeids, 3) == scheduler.plan(list(reversed(nodeids)), 3)
+
+    def test_workers_at_least_one(self):
+        """worker数小于1时按1处理"""
+        scheduler = _scheduler({f"{FILE_A}::test_a": 2.0, f"{FILE_B}::test_b": 3.0})
+
+        assignment, loads = scheduler.plan([f"{FILE_A}::test_a", f"{FILE_B}::test_b"], 0)
+
+        assert set(assignment.values()) == {0}
+        assert loads == [5.0]
+
+
+class TestEstimate:
+    """新用例的耗时估算"""
+
+    def test_history_and_medians(self):
+        """有历史取历史值；新用例取同文件中位数，文件没有历史时取全局中位数"""
+        scheduler = _scheduler({f"{FILE_A}::test_a": 10.0, f"{FILE_A}::test_b": 20.0, f"{FILE_B}::test_c": 90.0})
+
+        assert scheduler.estimate(f"{FILE_A}::test_a") == 10.0
+        assert scheduler.estimate(f"{FILE_A}::test_new") == 15.0
+        assert scheduler.estimate('test_cases/simulate/test_simulate_first.py::test_new') == 20.0
+
+    def test_xdist_group_suffix_ignored(self):
+        """--dist loadgroup 追加的分组后缀不影响估算"""
+        scheduler = _scheduler({f"{FILE_A}::test_a": 12.0})
+
+        assert scheduler.estimate(f"{FILE_A}::test_a@lpt0") == 12.0
+
+    def test_no_history_uses_default_cost(self):
+        """完全没有历史时使用默认耗时"""
+        scheduler = _scheduler({})
+
+        assert scheduler.estimate(f"{FILE_A}::test_a") == scheduler.default_cost
+
+
+class TestScheduleItems:
+    """schedule_items 只在并行执行时调整顺序"""
+
+    def test_serial_keeps_collection_order(self):
+        """串行执行保持收集顺序，不添加分组"""
+        items = [_Item(f"{FILE_A}::test_short"), _Item(f"{FILE_A}::test_long")]
+        scheduler = _scheduler({items[0].nodeid: 1.0, items[1].nodeid: 100.0})
+
+        scheduler.schedule_items(items, 1)
+
+        assert [item.nodeid for item in items] == [f"{FILE_A}::test_short", f"{FILE_A}::test_long"]
+        assert all(not item.markers for item in items)
+        assert scheduler.predicted_loads == {}
+
+    def test_parallel_groups_whole_files_in_collection_order(self):
+        """并行执行按文件分组：耗时长的文件先执行，同一文件内保持收集顺序，文件内所有用例同一分组"""
+        items = [
+            _Item(f"{FILE_A}::TestFirst::test_open_desktop"),
+            _Item(f"{FILE_A}::TestFirst::test_launch_app"),
+            _Item(f"{FILE_B}::TestExam::test_short"),
+            _Item(f"{FILE_B}::TestExam::test_long"),
+        ]
+        scheduler = _scheduler({
+            items[0].nodeid: 1.0, items[1].nodeid: 2.0,
+            items[2].nodeid: 1.0, items[3].nodeid: 100.0,
+        })
+
+        scheduler.schedule_items(items, 2)
+
+        assert [item.nodeid for item in items] == [
+            f"{FILE_B}::TestExam::test_short",
+            f"{FILE_B}::TestExam::test_long",
+            f"{FILE_A}::TestFirst::test_open_desktop",
+            f"{FILE_A}::TestFirst::test_launch_app",
+        ]
+        assert [item.markers[0].kwargs['name'] for item in items] == ['lpt0', 'lpt0', 'lpt1', 'lpt1']
+        assert scheduler.predicted_loads == {'lpt0': 101.0, 'lpt1': 3.0}
@@ -0,0 +1,107 @@
+"""
+性能预算（PerformanceBudget）的单元测试：规则匹配顺序、单位换算、处理方式和模块配置合并
+
+@File  : test_performance_budget.py
+@Author: shenyuan
+"""
+import yaml
+
+from core.performance_budget import PerformanceBudget, format_violation
+
+
+def _segment(route, **metrics):
+    """构造一个路由分段（字段与 PerformanceMonitor 的分段一致）"""
+    segment = {'route': route, 'step': '', 'load_ms': None, 'lcp_ms': None, 'cls': 0, 'inp_ms': None,
+               'long_task_ms': 0, 'transfer_bytes': 0, 'api_max_ms': None, 'api_slowest': ''}
+    segment.update(metrics)
+    return segment
+
+
+class TestEvaluate:
+    """PerformanceBudget.evaluate"""
+
+    def test_first_matching_rule_per_metric(self):
+        """同一指标取第一条匹配且配置了该指标的规则，其他指标继续使用后面的规则"""
+        budget = PerformanceBudget([
+            {'route': '*#/course/*', 'max_lcp_ms': 5000},
+            {'route': '*', 'max_lcp_ms': 2000, 'max_cls': 0.1},
+        ])
+
+        violations = budget.evaluate([_segment('/#/course/list', lcp_ms=3000, cls=0.2)])
+
+        assert [(v['metric'], v['limit']) for v in violations] == [('max_cls', 0.1)]
+
+    def test_route_not_matching(self):
+        """路由不匹配的规则不生效"""
+        budget = PerformanceBudget([{'route': '*#/exam/*', 'max_lcp_ms': 1000}])
+
+        assert budget.evaluate([_segment('/#/course/list', lcp_ms=3000)]) == []
+
+    def test_missing_metric_skipped(self):
+        """分段中没有采集到的指标（None）不检查"""
+        budget = PerformanceBudget([{'route': '*', 'max_inp_ms': 200, 'max_load_ms': 1000}])
+
+        assert budget.evaluate([_segment('/#/home')]) == []
+
+    def test_transfer_kb_conversion(self):
+        """传输大小预算按KB配置，超出时实际值换算为KB"""
+        budget = PerformanceBudget([{'route': '*', 'max_transfer_kb': 100}])
+
+        assert budget.evaluate([_segment('/#/home', transfer_bytes=100 * 1024)]) == []
+        violation = budget.evaluate([_segment('/#/home', transfer_bytes=150 * 1024 + 51)])[0]
+        assert (violation['value'], violation['limit'], violation['unit']) == (150.0, 100, 'KB')
+
+    def test_per_rule_mode(self):
+        """规则可以单独指定处理方式，未指定时使用预算的默认方式"""
+        budget = PerformanceBudget([
+            {'route': '*#/login', 'max_lcp_ms': 2500, 'mode': 'fail'},
+            {'route': '*', 'max_cls': 0.25},
+        ], mode='warn')
+
+        violations = budget.evaluate([_segment('/#/login', lcp_ms=3000, cls=0.3)])
+
+        assert {v['metric']: v['mode'] for v in violations} == {'max_lcp_ms': 'fail', 'max_cls': 'warn'}
+        assert budget.has_failures(violations)
+        assert not budget.has_failures([v for v in violations if v['mode'] == 'warn'])
+
+    def test_unknown_mode_falls_back_to_warn(self):
+        """未知的默认处理方式按warn处理"""
+        assert PerformanceBudget([], mode='block').mode == 'warn'
+
+    def test_api_violation_detail(self):
+        """接口耗时超出时附带最慢的接口，便于定位"""
+        budget = PerformanceBudget([{'route': '*', 'max_api_ms': 1000}])
+
+        violation = budget.evaluate([_segment('/#/home', step='登录', api_max_ms=1800, api_slowest='GET /api/user')])[0]
+
+        assert violation['detail'] == 'GET /api/user'
+        assert format_violation(violation) == '[warn] /#/home 接口耗时 1800ms > 1000ms（步骤: 登录） GET /api/user'
+
+
+class TestForModule:
+    """PerformanceBudget.for_module 的配置合并"""
+
+    def _write(self, tmp_path, budgets):
+        config_path = tmp_path / 'module_config.yaml'
+        config_path.write_text(yaml.safe_dump({'performance_budgets': budgets}), encoding='utf-8')
+        return str(config_path)
+
+    def test_disabled_or_missing(self, tmp_path):
+        """未启用或没有配置时不检查"""
+        config_path = self._write(tmp_path, {'default': {'enabled': False, 'routes': [{'route': '*', 'max_cls': 0.1}]}})
+
+        assert PerformanceBudget.for_module('teaching', config_path) is None
+        assert PerformanceBudget.for_module('teaching', str(tmp_path / 'missing.yaml')) is None
+
+    def test_module_routes_first_and_overrides(self, tmp_path):
+        """模块规则排在默认规则之前，模块可以单独开启并覆盖处理方式"""
+        config_path = self._write(tmp_path, {
+            'default': {'enabled': False, 'mode': 'warn', 'routes': [{'route': '*', 'max_lcp_ms': 4000}]},
+            'teaching': {'enabled': True, 'mode': 'fail', 'routes': [{'route': '*#/login', 'max_lcp_ms': 2500}]},
+        })
+
+        budget = PerformanceBudget.for_module('teaching', config_path)
+
+        assert budget.mode == 'fail'
+        assert [rule['route'] for rule in budget.routes] == ['*#/login', '*']
+        assert PerformanceBudget.for_module('exam', config_path) is None
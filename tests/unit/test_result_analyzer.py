@@ -0,0 +1,61 @@
+"""
+趋势分析的单元测试：错误签名（同类失败归为一组）和耗时百分位数
+
+@File  : test_result_analyzer.py
+@Author: shenyuan
+"""
+import pytest
+
+from core.test_result_analyzer import error_signature, _percentile
+
+
+class TestErrorSignature:
+    """error_signature 的归一化规则"""
+
+    def test_numbers_addresses_and_quotes_ignored(self):
+        """超时时间、行号、对象地址和引号内容不同的同类失败得到相同签名"""
+        first = (
+            'test_cases/teaching/test_teaching_first.py:42: in test_first\n'
+            'E   TimeoutError: Locator.click: Timeout 5000ms exceeded waiting for "课程管理" at 0x7f3a2c'
+        )
+        second = (
+            'test_cases/teaching/test_teaching_first.py:57: in test_first\n'
+            'E   TimeoutError: Locator.click: Timeout 30000ms exceeded waiting for "资源管理" at 0x55d0e1'
+        )
+
+        assert error_signature(first) == error_signature(second)
+        assert len(error_signature(first)) == 12
+
+    def test_uses_last_error_line(self):
+        """取最后一条"E"行，前面的E行和普通堆栈行不影响签名"""
+        traceback = 'E   AssertionError: first\nsome/file.py:10: in helper\nE   ValueError: real cause'
+
+        assert error_signature(traceback) == error_signature('E   ValueError: real cause')
+        assert error_signature(traceback) != error_signature('E   AssertionError: first')
+
+    def test_falls_back_to_last_line(self):
+        """没有E行时取最后一个非空行"""
+        assert error_signature('line 1\nTimeoutError: waiting 10s\n\n') == error_signature('TimeoutError: waiting 99s')
+
+    def test_different_errors_differ(self):
+        """不同类型的失败签名不同"""
+        assert error_signature('E   TimeoutError: waiting') != error_signature('E   AssertionError: waiting')
+
+    def test_empty(self):
+        """没有错误信息时返回空字符串"""
+        assert error_signature('') == ''
+
+
+class TestPercentile:
+    """_percentile 的线性插值"""
+
+    @pytest.mark.parametrize('values, q, expected', [
+        ([], 0.5, 0.0),
+        ([3.0], 0.95, 3.0),
+        ([1.0, 2.0, 3.0, 4.0], 0.5, 2.5),
+        ([10.0, 20.0], 0.95, 19.5),
+        ([1.0, 2.0, 3.0], 0.0, 1.0),
+        ([1.0, 2.0, 3.0], 1.0, 3.0),
+    ])
+    def test_linear_interpolation(self, values, q, expected):
+        assert _percentile(values, q) == pytest.approx(expected)
@@ -0,0 +1,132 @@
+"""
+结果流汇总（summarize_records）的单元测试
+控制台统计、报告和通知都以它的结果为准，这里用构造的阶段记录覆盖重试、setup/teardown错误和跳过的规则
+
+@File  : test_result_stream.py
+@Author: shenyuan
+"""
+from utils.result_stream import summarize_records
+
+NODEID = 'test_cases/teaching/test_teaching_first.py::TestTeachingFirst::test_first'
+
+
+def _record(when, outcome, duration=0.1, timestamp=0.0, nodeid=NODEID, **extra):
+    """构造一条阶段记录（字段与 build_record 一致）"""
+    return {'nodeid': nodeid, 'when': when, 'outcome': outcome, 'duration': duration,
+            'timestamp': timestamp, 'error': '', **extra}
+
+
+def _attempt(call_outcome, start, error='', budget=None):
+    """一次完整执行：setup、call、teardown"""
+    return [
+        _record('setup', 'passed', 0.2, start),
+        _record('call', call_outcome, 1.0, start + 1, error=error, budget=budget or []),
+        _record('teardown', 'passed', 0.1, start + 2),
+    ]
+
+
+class TestSummarizeRecords:
+    """summarize_records 的汇总规则"""
+
+    def test_rerun_then_pass(self):
+        """失败后重试通过：结果为通过，重试次数累加，之前那次的耗时、错误和预算超出项作废"""
+        violation = {'route': '/#/login', 'metric': 'max_lcp_ms', 'mode': 'fail'}
+        records = [
+            _record('setup', 'passed', 0.2, 0.0),
+            _record('call', 'rerun', 1.0, 1.0, error='E   AssertionError: boom', budget=[violation]),
+            *_attempt('passed', 10.0),
+        ]
+
+        stats = summarize_records(records)
+
+        case = stats['test_cases'][0]
+        assert case['status'] == 'passed'
+        assert case['reruns'] == 1
+        assert case['error'] == ''
+        assert case['duration'] == 1.3
+        assert case['budget'] == []
+        assert stats['budget_violations'] == []
+        assert (stats['total'], stats['passed'], stats['failed']) == (1, 1, 0)
+        assert stats['error_details'] == []
+
+    def test_rerun_still_failing(self):
+        """所有重试都失败：结果为失败，错误和预算超出项取最后一次执行"""
+        violation = {'route': '/#/login', 'metric': 'max_lcp_ms', 'mode': 'fail'}
+        records = [
+            _record('setup', 'passed', 0.2, 0.0),
+            _record('call', 'rerun', 1.0, 1.0, error='E   first'),
+            *_attempt('failed', 10.0, error='E   last', budget=[violation]),
+        ]
+
+        stats = summarize_records(records)
+
+        case = stats['test_cases'][0]
+        assert case['status'] == 'failed'
+        assert case['reruns'] == 1
+        assert case['error'] == 'E   last'
+        assert stats['error_details'] == [{'name': NODEID, 'error': 'E   last'}]
+        assert stats['budget_violations'] == [{'name': NODEID, **violation}]
+
+    def test_setup_error(self):
+        """setup失败记为error，没有call阶段"""
+        records = [
+            _record('setup', 'failed', 0.5, 0.0, error='E   fixture failed'),
+            _record('teardown', 'passed', 0.1, 1.0),
+        ]
+
+        stats = summarize_records(records)
+
+        assert stats['test_cases'][0]['status'] == 'error'
+        assert stats['error'] == 1
+        assert stats['error_details'] == [{'name': NODEID, 'error': 'E   fixture failed'}]
+
+    def test_teardown_error_after_passed_call(self):
+        """call通过、teardown失败记为error"""
+        records = _attempt('passed', 0.0)[:2] + [_record('teardown', 'failed', 0.1, 2.0, error='E   close failed')]
+
+        case = summarize_records(records)['test_cases'][0]
+
+        assert case['status'] == 'error'
+        assert case['error'] == 'E   close failed'
+
+    def test_teardown_error_after_failed_call(self):
+        """call已失败时teardown失败不改变结果和错误信息"""
+        records = _attempt('failed', 0.0, error='E   assert')[:2] + [
+            _record('teardown', 'failed', 0.1, 2.0, error='E   close failed')
+        ]
+
+        case = summarize_records(records)['test_cases'][0]
+
+        assert case['status'] == 'failed'
+        assert case['error'] == 'E   assert'
+
+    def test_skip(self):
+        """setup阶段跳过记为skipped，保留跳过原因"""
+        records = [
+            _record('setup', 'skipped', 0.0, 0.0, error='模块未启用'),
+            _record('teardown', 'passed', 0.0, 0.1),
+        ]
+
+        stats = summarize_records(records)
+
+        assert stats['test_cases'][0]['status'] == 'skipped'
+        assert stats['test_cases'][0]['error'] == '模块未启用'
+        assert stats['skipped'] == 1
+        assert stats['error_details'] == []
+
+    def test_totals_and_records_without_nodeid(self):
+        """多个用例的统计；没有nodeid的记录（如调度汇总）不参与汇总，执行时长取首尾记录的时间差"""
+        other = 'test_cases/exam/test_exam_first.py::TestExamFirst::test_first'
+        records = [
+            *_attempt('passed', 100.0),
+            _record('setup', 'passed', 0.2, 101.0, nodeid=other),
+            _record('call', 'failed', 1.0, 104.0, nodeid=other, error='E   timeout'),
+            _record('teardown', 'passed', 0.1, 105.5, nodeid=other),
+            {'event': 'scheduler', 'predicted_makespan': 10.0},
+        ]
+
+        stats = summarize_records(records)
+
+        assert (stats['total'], stats['passed'], stats['failed']) == (2, 1, 1)
+        assert stats['duration'] == 5.5
+        assert [case['name'] for case in stats['test_cases']] == [NODEID, other]
@@ -48,6 +48,14 @@ def convert_sync_to_async(code: str) -> str:
         if stripped == 'import re' and not any('import re' in l for l in converted_lines if l.strip()):
             continue
         
+        # 录制代码中的固定等待替换为"等待页面稳定"
+        if re.match(r'(page\.wait_for_timeout|time\.sleep|asyncio\.sleep)\(', stripped):
+            # 上一行已经是等待稳定（例如紧跟在双击之后）时不再重复
+            if not (converted_lines and converted_lines[-1].strip() == 'await desktop.wait_until_settled()'):
+                indent = len(line) - len(line.lstrip())
+                converted_lines.append(' ' * indent + 'await desktop.wait_until_settled()')
+            continue
+        
         # 处理 expect 语句
         if 'expect(' in stripped and 'await expect(' not in stripped:
             line = line.replace('expect(', 'await expect(')
@@ -76,6 +84,11 @@ def convert_sync_to_async(code: str) -> str:
                 line = ' ' * indent + 'await ' + line.lstrip()
         
         converted_lines.append(line)
+        
+        # 导航、双击打开应用后等待页面稳定，避免后续断言依赖固定的sleep
+        if re.search(r'\.(goto|dblclick)\(', stripped):
+            indent = len(line) - len(line.lstrip())
+            converted_lines.append(' ' * indent + 'await desktop.wait_until_settled()')
     
     return '\n'.join(converted_lines)
 
@@ -1,20 +1,31 @@
 """
 自定义中文HTML测试报告生成器
-生成美观的中文测试报告，替代pytest-html的英文报告
+生成美观的中文测试报告，替代pytest-html的英文报告。
+用例明细单独写入 <报告名>.data.js，页面中分页渲染、按需加载截图，用例数量很多时报告依然可以快速打开
 
 @File  : custom_report_generator.py
 @Author: shenyuan
 """
 import json
+import os
 from pathlib import Path
 from typing import Dict, List, Any, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 import re
 import html
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 执行时长柱状图最多显示的用例数（取耗时最长的用例，完整列表见用例明细）
+MAX_BAR_CASES = 50
+
+# 用例明细中错误信息的最大长度
+MAX_CASE_ERROR_LENGTH = 2000
+
+# 用例明细数据文件中每行的字段顺序（按数组保存，文件更紧凑）
+CASE_FIELDS = ('name', 'module', 'status', 'duration', 'reruns', 'error', 'screenshots', 'traces', 'vitals')
+
 
 class CustomReportGenerator:
     """自定义测试报告生成器"""
@@ -228,8 +239,17 @@ class CustomReportGenerator:
                 test_case_pass_rates.append(100 if entry['status'] == 'passed' else 0)
         
         logger.info(f"[CustomReport] 图表数据准备完成: {len(test_case_labels)} 个测试用例")
-        logger.info(f"[CustomReport] 测试用例标签: {test_case_labels}")
-        logger.info(f"[CustomReport] 测试用例时长: {test_case_duration_values}")
+        logger.debug(f"[CustomReport] 测试用例标签: {test_case_labels}")
+        logger.debug(f"[CustomReport] 测试用例时长: {test_case_duration_values}")
+        
+        # 用例很多时柱状图只保留耗时最长的用例（保持原有顺序）
+        bar_note = "各测试用例执行时长（秒），便于识别性能瓶颈"
+        if len(test_case_labels) > MAX_BAR_CASES:
+            slowest = sorted(range(len(test_case_labels)), key=lambda i: test_case_duration_values[i], reverse=True)
+            kept = sorted(slowest[:MAX_BAR_CASES])
+            test_case_labels = [test_case_labels[i] for i in kept]
+            test_case_duration_values = [test_case_duration_values[i] for i in kept]
+            bar_note = f"耗时最长的 {MAX_BAR_CASES} 个测试用例（秒），完整列表见下方用例明细"
         
         # 为了兼容热力图（仍按模块显示），需要计算模块通过率
         # 但柱状图改为按测试用例显示
@@ -257,9 +277,9 @@ class CustomReportGenerator:
             if base_name in test_case_dict and test_case_dict[base_name]:
                 original_name = test_case_dict[base_name][0].get('original_name', base_name)
             
-            logger.info(f"[CustomReport] 提取模块名称: base_name={base_name}, original_name={original_name}, final_status={final_status}")
+            logger.debug(f"[CustomReport] 提取模块名称: base_name={base_name}, original_name={original_name}, final_status={final_status}")
             module_name = ModuleHelper.extract_module_cn_name_from_path(original_name)
-            logger.info(f"[CustomReport] 提取到的模块名称: {module_name}")
+            logger.debug(f"[CustomReport] 提取到的模块名称: {module_name}")
             
             if module_name:
                 if module_name not in module_pass_counts:
@@ -267,7 +287,7 @@ class CustomReportGenerator:
                 module_pass_counts[module_name]['total'] += 1
                 if final_status == 'passed':
                     module_pass_counts[module_name]['passed'] += 1
-                logger.info(f"[CustomReport] 模块 {module_name} 统计: total={module_pass_counts[module_name]['total']}, passed={module_pass_counts[module_name]['passed']}")
+                logger.debug(f"[CustomReport] 模块 {module_name} 统计: total={module_pass_counts[module_name]['total']}, passed={module_pass_counts[module_name]['passed']}")
             else:
                 logger.warning(f"[CustomReport] 无法从路径 {original_name} 中提取模块名称，尝试使用base_name")
                 # 如果从original_name提取失败，尝试直接从base_name提取
@@ -512,6 +532,158 @@ class CustomReportGenerator:
             }}
         }}
         
+        .trace-case {{
+            margin: 12px 0;
+        }}
+        
+        .trace-case summary {{
+            cursor: pointer;
+            color: #495057;
+            font-weight: 600;
+        }}
+        
+        .trace-timeline {{
+            position: relative;
+            margin: 10px 0;
+            background: #fff;
+            border: 1px solid #e9ecef;
+            border-radius: 6px;
+            overflow: hidden;
+        }}
+        
+        .trace-span {{
+            position: absolute;
+            height: 16px;
+            min-width: 2px;
+            border-radius: 2px;
+            font-size: 11px;
+            line-height: 16px;
+            color: white;
+            white-space: nowrap;
+            overflow: hidden;
+            box-sizing: border-box;
+            padding: 0 2px;
+        }}
+        
+        .trace-legend {{
+            position: static;
+            display: inline-block;
+            padding: 0 6px;
+        }}
+        
+        .trace-action {{ background: #4facfe; }}
+        .trace-navigation {{ background: #667eea; }}
+        .trace-wait {{ background: #adb5bd; }}
+        .trace-expect {{ background: #38c172; }}
+        .trace-failed {{ background: #e3342f; }}
+        
+        .trace-slowest {{
+            font-size: 13px;
+            color: #6c757d;
+            margin: 0;
+            padding-left: 20px;
+        }}
+        
+        .cases-toolbar {{
+            display: flex;
+            flex-wrap: wrap;
+            gap: 10px;
+            align-items: center;
+            margin-bottom: 12px;
+        }}
+        
+        .cases-toolbar input, .cases-toolbar select {{
+            padding: 6px 10px;
+            border: 1px solid #ced4da;
+            border-radius: 6px;
+            font-size: 13px;
+        }}
+        
+        .cases-toolbar input {{
+            flex: 1;
+            min-width: 200px;
+        }}
+        
+        .cases-table {{
+            width: 100%;
+            border-collapse: collapse;
+            font-size: 13px;
+            table-layout: fixed;
+        }}
+        
+        .cases-table th, .cases-table td {{
+            padding: 8px;
+            border-bottom: 1px solid #e9ecef;
+            text-align: left;
+            vertical-align: top;
+            word-break: break-all;
+        }}
+        
+        .cases-table th {{
+            background: #f8f9fa;
+            color: #495057;
+        }}
+        
+        .case-status {{
+            font-weight: 600;
+        }}
+        
+        .case-status.passed {{ color: #2e7d32; }}
+        .case-status.failed, .case-status.error {{ color: #d32f2f; }}
+        .case-status.skipped {{ color: #f57c00; }}
+        
+        .case-error {{
+            white-space: pre-wrap;
+            font-size: 12px;
+            color: #d32f2f;
+            max-height: 300px;
+            overflow: auto;
+        }}
+        
+        .case-shot {{
+            max-width: 160px;
+            max-height: 120px;
+            margin: 4px 4px 0 0;
+            border: 1px solid #dee2e6;
+            border-radius: 4px;
+        }}
+        
+        .case-vitals {{
+            margin-top: 4px;
+            font-size: 12px;
+            color: #6c757d;
+        }}
+        
+        .case-trace {{
+            display: inline-block;
+            margin: 4px 8px 0 0;
+            font-size: 12px;
+            color: #1976d2;
+        }}
+        
+        .cases-pager {{
+            display: flex;
+            gap: 8px;
+            align-items: center;
+            justify-content: flex-end;
+            margin-top: 12px;
+            font-size: 13px;
+            color: #6c757d;
+        }}
+        
+        .cases-pager button {{
+            padding: 4px 12px;
+            border: 1px solid #ced4da;
+            background: white;
+            border-radius: 6px;
+            cursor: pointer;
+        }}
+        
+        .cases-pager button:disabled {{
+            cursor: default;
+            opacity: 0.5;
+        }}
+        
         .footer {{
             background: #f8f9fa;
             padding: 24px;
@@ -588,7 +760,7 @@ class CustomReportGenerator:
             <!-- 数据统计图表 -->
             <div class="charts-section">
                 <h2>📊 数据统计分析</h2>
-                <p class="data-source-note">📌 数据来源：本次执行结果 + 历史测试数据（最近30天，来自test_results/目录和数据库）</p>
+                <p class="data-source-note">📌 数据来源：本次执行结果 + 历史测试数据（最近30天，来自本地结果库 test_results/results.db）</p>
                 
                 <div class="charts-grid">
                     <!-- 饼图：本次执行结果分布 -->
@@ -609,7 +781,7 @@ class CustomReportGenerator:
                     <div class="chart-container">
                         <h3>各测试用例执行时长对比</h3>
                         <canvas id="barChart"></canvas>
-                        <p class="chart-note">各测试用例执行时长（秒），便于识别性能瓶颈</p>
+                        <p class="chart-note">{bar_note}</p>
                     </div>
                     
                     <!-- 热力图：各模块通过率 -->
@@ -622,7 +794,11 @@ class CustomReportGenerator:
             </div>
 """
         
-        html_content += f"""
+        # 用例明细写入单独的数据文件，报告页面中分页渲染
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        data_path = CustomReportGenerator._write_case_data(test_cases, output_path)
+        
+        footer_content = f"""
             </div>
         </div>
         
@@ -918,17 +1094,263 @@ class CustomReportGenerator:
             }}
         }});
     </script>
+    
+    <!-- 用例明细：数据文件与报告放在同一目录 -->
+    <script src="{html.escape(data_path.name)}"></script>
+    <script>
+{CustomReportGenerator._CASES_SCRIPT}
+    </script>
 </body>
 </html>
 """
-        
-        # 保存文件
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        # 按顺序直接写入文件，不在内存中拼接整个报告
+        with open(output_path, 'w', encoding='utf-8') as report_file:
+            report_file.write(html_content)
+            report_file.write(CustomReportGenerator._build_network_section(test_cases))
+            report_file.write(CustomReportGenerator._build_vitals_section(test_cases))
+            report_file.write(CustomReportGenerator._build_budget_section(test_cases))
+            report_file.write(CustomReportGenerator._build_trace_section(test_results.get('traces') or {}))
+            report_file.write(CustomReportGenerator._build_cases_section())
+            report_file.write(footer_content)
         
         return output_path
     
+    @staticmethod
+    def _case_row(test_case: Dict[str, Any], report_dir: Path, module_cache: Dict[str, Optional[str]]) -> list:
+        """用例明细数据文件中的一行（字段顺序见 CASE_FIELDS）"""
+        from utils.module_helper import ModuleHelper
+        name = test_case.get('name', '')
+        file_part = name.split('::')[0]
+        if file_part not in module_cache:
+            module_cache[file_part] = ModuleHelper.extract_module_cn_name_from_path(file_part)
+        
+        screenshots = []
+        for shot in test_case.get('screenshots') or []:
+            shot_path = Path(shot)
+            if not shot_path.is_absolute():
+                shot_path = Path.cwd() / shot_path
+            # 缩略图命名规则与 utils.screenshot_utils.thumbnail_path_for 一致
+            thumbnail = shot_path.with_name(f"{shot_path.stem}.thumb.jpg")
+            full = os.path.relpath(shot_path, report_dir).replace('\\', '/')
+            thumb = os.path.relpath(thumbnail, report_dir).replace('\\', '/') if thumbnail.exists() else full
+            screenshots.append([full, thumb])
+        
+        # Playwright追踪文件（zip），报告中显示下载链接
+        traces = []
+        for trace in test_case.get('traces') or []:
+            trace_path = Path(trace)
+            if not trace_path.is_absolute():
+                trace_path = Path.cwd() / trace_path
+            traces.append(os.path.relpath(trace_path, report_dir).replace('\\', '/'))
+        
+        return [
+            name,
+            module_cache[file_part] or '',
+            test_case.get('status', 'passed'),
+            round(float(test_case.get('duration') or 0), 2),
+            test_case.get('reruns', 0),
+            (test_case.get('error') or '')[:MAX_CASE_ERROR_LENGTH],
+            screenshots,
+            traces,
+            # 用例明细只保存汇总值，各路由分段汇总在性能区域中
+            {key: value for key, value in (test_case.get('vitals') or {}).items() if key != 'segments'}
+        ]
+    
+    @staticmethod
+    def _write_case_data(test_cases: List[Dict], output_path: Path) -> Path:
+        """逐行写入用例明细数据文件（<报告名>.data.js）
+        
+        使用脚本文件而不是JSON文件：报告通过 file:// 打开时浏览器不允许读取本地JSON，
+        但可以加载同目录的脚本。
+        
+        Args:
+            test_cases: 测试用例列表
+            output_path: 报告路径
+            
+        Returns:
+            数据文件路径
+        """
+        data_path = output_path.with_name(f"{output_path.stem}.data.js")
+        module_cache: Dict[str, Optional[str]] = {}
+        with open(data_path, 'w', encoding='utf-8') as f:
+            f.write(f"window.REPORT_CASE_FIELDS = {json.dumps(list(CASE_FIELDS))};\n")
+            f.write("window.REPORT_CASES = [\n")
+            for index, test_case in enumerate(test_cases):
+                row = CustomReportGenerator._case_row(test_case, output_path.parent, module_cache)
+                # JSON中的 </ 转义，避免错误信息中的 </script> 提前结束脚本
+                line = json.dumps(row, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+                f.write(("," if index else "") + line + "\n")
+            f.write("];\n")
+        return data_path
+    
+    @staticmethod
+    def _build_cases_section() -> str:
+        """用例明细区域（内容由页面脚本从数据文件分页渲染）"""
+        return """
+            <div class="charts-section">
+                <h2>📋 用例明细</h2>
+                <div class="cases-toolbar">
+                    <input id="caseSearch" type="search" placeholder="搜索用例名称、模块或错误信息">
+                    <select id="caseStatus">
+                        <option value="">全部状态</option>
+                        <option value="failed">失败</option>
+                        <option value="error">错误</option>
+                        <option value="skipped">跳过</option>
+                        <option value="passed">通过</option>
+                    </select>
+                    <select id="caseSort">
+                        <option value="">默认（失败在前）</option>
+                        <option value="duration">按耗时（长→短）</option>
+                    </select>
+                    <select id="casePageSize">
+                        <option value="50">每页 50 条</option>
+                        <option value="100">每页 100 条</option>
+                        <option value="200">每页 200 条</option>
+                    </select>
+                </div>
+                <table class="cases-table">
+                    <thead>
+                        <tr>
+                            <th style="width: 40%;">用例</th>
+                            <th style="width: 12%;">模块</th>
+                            <th style="width: 8%;">状态</th>
+                            <th style="width: 8%;">耗时</th>
+                            <th>错误信息 / 截图</th>
+                        </tr>
+                    </thead>
+                    <tbody id="caseRows"></tbody>
+                </table>
+                <div class="cases-pager">
+                    <span id="caseSummary"></span>
+                    <button id="casePrev">上一页</button>
+                    <span id="casePage"></span>
+                    <button id="caseNext">下一页</button>
+                </div>
+            </div>
+"""
+    
+    # 用例明细的分页、筛选和搜索（只渲染当前页，截图使用缩略图并延迟加载）
+    _CASES_SCRIPT = """
+        (function() {
+            const fields = window.REPORT_CASE_FIELDS || [];
+            const rows = (window.REPORT_CASES || []).map(function(row) {
+                const item = {};
+                fields.forEach(function(field, i) { item[field] = row[i]; });
+                item.searchText = (item.name + ' ' + item.module + ' ' + item.error).toLowerCase();
+                return item;
+            });
+            const statusText = {passed: '通过', failed: '失败', error: '错误', skipped: '跳过'};
+            const tbody = document.getElementById('caseRows');
+            const search = document.getElementById('caseSearch');
+            const status = document.getElementById('caseStatus');
+            const sort = document.getElementById('caseSort');
+            const pageSize = document.getElementById('casePageSize');
+            let filtered = rows;
+            let page = 0;
+            
+            function cell(tr, text, className) {
+                const td = document.createElement('td');
+                td.textContent = text;
+                if (className) td.className = className;
+                tr.appendChild(td);
+                return td;
+            }
+            
+            function render() {
+                const size = parseInt(pageSize.value, 10);
+                const pages = Math.max(1, Math.ceil(filtered.length / size));
+                page = Math.min(page, pages - 1);
+                tbody.textContent = '';
+                if (!window.REPORT_CASES) {
+                    const tr = document.createElement('tr');
+                    const td = cell(tr, '未找到用例明细数据文件（应与报告位于同一目录）');
+                    td.colSpan = 5;
+                    tbody.appendChild(tr);
+                }
+                filtered.slice(page * size, (page + 1) * size).forEach(function(item) {
+                    const tr = document.createElement('tr');
+                    cell(tr, item.name + (item.reruns ? '（重试 ' + item.reruns + ' 次）' : ''));
+                    cell(tr, item.module || '-');
+                    cell(tr, statusText[item.status] || item.status, 'case-status ' + item.status);
+                    cell(tr, item.duration.toFixed(2) + 's');
+                    const detail = cell(tr, '');
+                    if (item.error) {
+                        const pre = document.createElement('div');
+                        pre.className = 'case-error';
+                        pre.textContent = item.error;
+                        detail.appendChild(pre);
+                    }
+                    item.screenshots.forEach(function(shot) {
+                        const link = document.createElement('a');
+                        link.href = shot[0];
+                        link.target = '_blank';
+                        const img = document.createElement('img');
+                        img.loading = 'lazy';
+                        img.src = shot[1];
+                        img.className = 'case-shot';
+                        link.appendChild(img);
+                        detail.appendChild(link);
+                    });
+                    if (item.vitals && Object.keys(item.vitals).length) {
+                        const v = item.vitals;
+                        const ms = function(value) { return value === null || value === undefined ? '-' : value + 'ms'; };
+                        const line = document.createElement('div');
+                        line.className = 'case-vitals';
+                        line.textContent = 'LCP ' + ms(v.lcp_ms) + ' · CLS ' + (v.cls === null ? '-' : v.cls)
+                            + ' · INP ' + ms(v.inp_ms) + ' · 长任务 ' + v.long_tasks + ' 个（' + v.long_task_ms + 'ms）'
+                            + ' · 路由切换 ' + v.navigations + ' 次';
+                        detail.appendChild(line);
+                    }
+                    (item.traces || []).forEach(function(trace) {
+                        const link = document.createElement('a');
+                        link.href = trace;
+                        link.className = 'case-trace';
+                        link.title = '使用 playwright show-trace 或 trace.playwright.dev 打开';
+                        link.textContent = '追踪: ' + trace.split('/').pop();
+                        detail.appendChild(link);
+                    });
+                    tbody.appendChild(tr);
+                });
+                document.getElementById('caseSummary').textContent = '共 ' + filtered.length + ' 条（全部 ' + rows.length + ' 条）';
+                document.getElementById('casePage').textContent = (page + 1) + ' / ' + pages;
+                document.getElementById('casePrev').disabled = page === 0;
+                document.getElementById('caseNext').disabled = page >= pages - 1;
+            }
+            
+            function applyFilter() {
+                const keyword = search.value.trim().toLowerCase();
+                filtered = rows.filter(function(item) {
+                    return (!status.value || item.status === status.value)
+                        && (!keyword || item.searchText.indexOf(keyword) !== -1);
+                });
+                if (sort.value === 'duration') {
+                    filtered = filtered.slice().sort(function(a, b) { return b.duration - a.duration; });
+                }
+                page = 0;
+                render();
+            }
+            
+            let timer = null;
+            search.addEventListener('input', function() {
+                clearTimeout(timer);
+                timer = setTimeout(applyFilter, 200);
+            });
+            status.addEventListener('change', applyFilter);
+            sort.addEventListener('change', applyFilter);
+            pageSize.addEventListener('change', function() { page = 0; render(); });
+            document.getElementById('casePrev').addEventListener('click', function() { page--; render(); });
+            document.getElementById('caseNext').addEventListener('click', function() { page++; render(); });
+            // 默认先显示失败的用例
+            if (rows.some(function(item) { return item.status === 'failed' || item.status === 'error'; })) {
+                rows.sort(function(a, b) {
+                    const rank = {failed: 0, error: 0, skipped: 1, passed: 2};
+                    return (rank[a.status] || 0) - (rank[b.status] || 0);
+                });
+            }
+            applyFilter();
+        })();
+"""
+    
     @staticmethod
     def _get_trend_data(count: int = 10) -> List[Dict]:
         """获取历史趋势数据
@@ -941,22 +1363,188 @@ class CustomReportGenerator:
         """
         try:
             from core.test_result_analyzer import TestResultAnalyzer
-            from core.db_client import DBClient
-            
-            try:
-                db_client = DBClient()
-                db_client.connect()
-                analyzer = TestResultAnalyzer(db_client)
-            except:
-                analyzer = TestResultAnalyzer()
-            
-            # 获取最近30天的数据，然后取前N次
-            trend_data = analyzer.get_trend_data(30)
-            return trend_data[:count] if trend_data else []
+            
+            # 只读取本地结果存储，不需要连接MySQL
+            analyzer = TestResultAnalyzer(json_sink=False)
+            return analyzer.store.query(datetime.now() - timedelta(days=30), limit=count)
         except Exception as e:
             # 如果获取失败，返回空列表
             return []
     
+    @staticmethod
+    def _build_network_section(test_cases: List[Dict]) -> str:
+        """生成网络路由统计区域（没有用例启用网络路由时返回空字符串）
+        
+        Args:
+            test_cases: 测试用例列表（结果流汇总的用例包含 network 字段）
+            
+        Returns:
+            HTML片段
+        """
+        from core.network_router import format_bytes
+        
+        cases = [case for case in test_cases if case.get('network')]
+        if not cases:
+            return ''
+        
+        total_requests = sum(case['network'].get('requests', 0) for case in cases)
+        total_bytes = sum(case['network'].get('bytes_saved', 0) for case in cases)
+        rows = ''
+        for case in sorted(cases, key=lambda c: c['network'].get('bytes_saved', 0), reverse=True):
+            network = case['network']
+            rows += f"""
+                <div class="info-item">
+                    <span class="info-label">{html.escape(case.get('name', '').split('::')[-1])}</span>
+                    <span class="info-value">拦截 {network.get('requests', 0)} 个请求（中止 {network.get('aborted', 0)}，桩数据 {network.get('stubbed', 0)}，缓存命中 {network.get('cache_hits', 0)}），节省约 {format_bytes(network.get('bytes_saved', 0))}</span>
+                </div>"""
+        return f"""
+            <!-- 网络路由统计 -->
+            <div class="info-section">
+                <h2>🌐 网络路由统计</h2>
+                <p class="data-source-note">共拦截 {total_requests} 个请求，节省约 {format_bytes(total_bytes)}（中止和桩数据按之前记录的资源大小估算）</p>{rows}
+            </div>
+"""
+    
+    @staticmethod
+    def _build_vitals_section(test_cases: List[Dict], max_routes: int = 50) -> str:
+        """生成页面性能区域：按路由汇总所有用例的 LCP / CLS / INP（p75）和长任务
+        
+        Args:
+            test_cases: 测试用例列表（结果流汇总的用例包含 vitals 字段）
+            max_routes: 最多展示的路由数（按LCP从慢到快）
+            
+        Returns:
+            HTML片段，没有性能数据时返回空字符串
+        """
+        from core.performance_monitor import route_vitals
+        
+        routes = route_vitals(test_cases)
+        if not routes:
+            return ''
+        
+        def ms(value):
+            return '-' if value is None else f"{value}ms"
+        
+        rows = ''.join(
+            f"<tr><td>{html.escape(route['route'])}</td><td>{route['samples']}（{route['cases']} 个用例）</td>"
+            f"<td>{ms(route['lcp_ms'])}</td><td>{'-' if route['cls'] is None else route['cls']}</td>"
+            f"<td>{ms(route['inp_ms'])}</td><td>{route['long_tasks']} 个，p75 {ms(route['long_task_ms'])}</td>"
+            f"<td>{ms(route['api_max_ms'])}</td></tr>"
+            for route in routes[:max_routes]
+        )
+        return f"""
+            <!-- 页面性能 -->
+            <div class="info-section">
+                <h2>🚦 页面性能（Web Vitals）</h2>
+                <p class="data-source-note">每次页面内路由切换记为一次访问；LCP、CLS、INP 以及单次访问的长任务耗时、最慢接口耗时均为p75（共 {len(routes)} 个路由）</p>
+                <table class="cases-table">
+                    <thead><tr><th>路由</th><th>访问次数</th><th>LCP</th><th>CLS</th><th>INP</th><th>长任务</th><th>最慢接口</th></tr></thead>
+                    <tbody>{rows}</tbody>
+                </table>
+            </div>
+"""
+    
+    @staticmethod
+    def _build_budget_section(test_cases: List[Dict], max_rows: int = 200) -> str:
+        """生成性能预算区域：列出所有超出预算的路由和指标
+        
+        Args:
+            test_cases: 测试用例列表（结果流汇总的用例包含 budget 字段）
+            max_rows: 最多展示的超出项数
+            
+        Returns:
+            HTML片段，没有超出预算时返回空字符串
+        """
+        violations = [(case, violation) for case in test_cases for violation in case.get('budget') or []]
+        if not violations:
+            return ''
+        
+        failed = sum(1 for _, violation in violations if violation.get('mode') == 'fail')
+        rows = ''.join(
+            f"<tr><td>{html.escape(case.get('name', '').split('::')[-1])}</td>"
+            f"<td>{html.escape(violation.get('route', ''))}</td>"
+            f"<td>{html.escape(violation.get('label', ''))}"
+            f"{'（' + html.escape(violation['detail']) + '）' if violation.get('detail') else ''}</td>"
+            f"<td>{violation.get('value')}{violation.get('unit', '')}</td>"
+            f"<td>{violation.get('limit')}{violation.get('unit', '')}</td>"
+            f"<td>{'判定失败' if violation.get('mode') == 'fail' else '告警'}</td></tr>"
+            for case, violation in violations[:max_rows]
+        )
+        return f"""
+            <!-- 性能预算 -->
+            <div class="info-section">
+                <h2>⏱️ 性能预算</h2>
+                <p class="data-source-note">共 {len(violations)} 项超出预算，其中 {failed} 项判定用例失败（预算配置见 config/module_config.yaml 的 performance_budgets）</p>
+                <table class="cases-table">
+                    <thead><tr><th>用例</th><th>路由</th><th>指标</th><th>实际</th><th>预算</th><th>处理</th></tr></thead>
+                    <tbody>{rows}</tbody>
+                </table>
+            </div>
+"""
+    
+    @staticmethod
+    def _build_trace_section(traces: Dict[str, Dict], max_cases: int = 50) -> str:
+        """生成操作时间线区域：每个用例一条时间线，按嵌套深度分行，宽度与耗时成正比
+        
+        Args:
+            traces: {nodeid: 追踪记录}（core/action_tracer.load_traces 的返回值）
+            max_cases: 最多展示的用例数（按耗时从长到短）
+            
+        Returns:
+            HTML片段，没有追踪数据时返回空字符串
+        """
+        if not traces:
+            return ''
+        
+        row_height = 18
+        cases_html = ''
+        for trace in sorted(traces.values(), key=lambda t: t.get('duration_ms', 0), reverse=True)[:max_cases]:
+            spans = trace.get('spans') or []
+            end_ms = max((sp['start_ms'] + sp['duration_ms'] for sp in spans), default=0)
+            total_ms = max(trace.get('duration_ms', 0), end_ms, 1)
+            depth = max((sp['depth'] for sp in spans), default=0) + 1
+            
+            bars = ''
+            for sp in spans:
+                left = sp['start_ms'] / total_ms * 100
+                width = sp['duration_ms'] / total_ms * 100
+                css_class = f"trace-{sp['kind']}" if sp['ok'] else 'trace-failed'
+                title = html.escape(f"{sp['name']} {sp['target']} {sp['duration_ms']:.0f}ms{'' if sp['ok'] else ' 失败'}")
+                # 只有足够宽的时间段显示文字，其余通过鼠标悬停查看
+                label = html.escape(sp['name'].split('.')[-1]) if width > 4 else ''
+                bars += (
+                    f'<div class="trace-span {css_class}" title="{title}" '
+                    f'style="left: {left:.3f}%; width: {width:.3f}%; top: {sp["depth"] * row_height + 2}px;">{label}</div>'
+                )
+            
+            slowest = sorted((sp for sp in spans if sp['depth'] == 0), key=lambda sp: sp['duration_ms'], reverse=True)[:5]
+            slowest_html = ''.join(
+                f"<li>{html.escape(sp['name'])} {html.escape(sp['target'])}：{sp['duration_ms'] / 1000:.2f}秒</li>"
+                for sp in slowest
+            )
+            dropped = f"，另有 {trace['dropped']} 个操作未记录" if trace.get('dropped') else ''
+            cases_html += f"""
+                <details class="trace-case">
+                    <summary>{html.escape(trace['nodeid'].split('::')[-1])} — {total_ms / 1000:.1f}秒，{len(spans)} 个操作{dropped}</summary>
+                    <div class="trace-timeline" style="height: {depth * row_height + 4}px;">{bars}</div>
+                    <ul class="trace-slowest">{slowest_html}</ul>
+                </details>"""
+        
+        return f"""
+            <!-- 操作时间线 -->
+            <div class="info-section">
+                <h2>⏱️ 操作时间线</h2>
+                <p class="data-source-note">
+                    <span class="trace-span trace-legend trace-action">操作</span>
+                    <span class="trace-span trace-legend trace-navigation">导航</span>
+                    <span class="trace-span trace-legend trace-wait">等待</span>
+                    <span class="trace-span trace-legend trace-expect">断言</span>
+                    <span class="trace-span trace-legend trace-failed">失败</span>
+                    展开用例查看时间线，鼠标悬停查看选择器和耗时
+                </p>{cases_html}
+            </div>
+"""
+    
     @staticmethod
     def _format_duration(seconds: float) -> str:
         """格式化执行时长
@@ -0,0 +1,220 @@
+"""
+按历史耗时调度测试用例
+收集阶段根据历史耗时，用LPT（最长处理时间优先）装箱把测试文件分配给xdist worker，
+避免几个耗时很长的导航用例文件在执行末尾集中到同一个worker上
+
+@File  : duration_scheduler.py
+@Author: shenyuan
+"""
+import heapq
+import logging
+import statistics
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+from core.run_context import strip_xdist_group, get_env_flag
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
+# 控制台通过该环境变量开启/关闭按耗时调度（未设置时读取 execution.scheduling.enabled）
+SCHEDULING_ENV = 'ENABLE_DURATION_SCHEDULING'
+
+# xdist分组名前缀（--dist loadgroup 下同一分组的用例在同一个worker上执行）
+GROUP_PREFIX = 'lpt'
+
+
+def scope_of(nodeid: str) -> str:
+    """用例所属的调度单位（测试文件），同一单位的用例分到同一个worker"""
+    return strip_xdist_group(nodeid).split('::')[0]
+
+
+class DurationScheduler:
+    """按历史耗时的用例调度器
+
+    - 历史耗时优先取本地结果库中每个用例通过时的p50，没有时取最近一次pytest-html报告中的耗时
+    - 新用例的耗时估算：同一测试文件已知用例的中位数 → 所有已知用例的中位数 → 配置的默认值
+    - 记录每个worker的实际耗时，执行结束后输出预计与实际的makespan（最慢worker的总耗时）
+    """
+
+    def __init__(self, config_path: str = "config/settings.yaml", history: Optional[Dict[str, float]] = None):
+        """初始化调度器
+
+        Args:
+            config_path: 配置文件路径
+            history: 历史耗时 {nodeid: 秒}，为None时自动加载
+        """
+        self.config = self._load_config(config_path)
+        scheduling_config = self.config.get('execution', {}).get('scheduling', {}) or {}
+        self.default_cost = float(scheduling_config.get('default_cost_seconds', 30))
+        self.history_days = int(scheduling_config.get('history_days', 30))
+        self.history = self.load_history(self.history_days) if history is None else history
+        self._file_medians = self._build_file_medians(self.history)
+        self._global_median = statistics.median(self.history.values()) if self.history else self.default_cost
+        self.predicted_loads: Dict[str, float] = {}
+        self.actual_loads: Dict[str, float] = defaultdict(float)
+
+    @staticmethod
+    def _load_config(config_path: str) -> dict:
+        """加载配置文件"""
+        config_file = Path(config_path)
+        if not config_file.exists():
+            return {}
+
+        with open(config_file, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+
+    @classmethod
+    def is_enabled(cls, config_path: str = "config/settings.yaml") -> bool:
+        """是否启用按耗时调度（环境变量 ENABLE_DURATION_SCHEDULING 优先，其次 execution.scheduling.enabled）"""
+        scheduling_config = cls._load_config(config_path).get('execution', {}).get('scheduling', {}) or {}
+        return bool(get_env_flag(SCHEDULING_ENV, scheduling_config.get('enabled', False)))
+
+    @staticmethod
+    def load_history(days: int = 30) -> Dict[str, float]:
+        """加载历史耗时
+
+        Args:
+            days: 使用最近N天的执行记录
+
+        Returns:
+            {nodeid: 秒}
+        """
+        history: Dict[str, float] = {}
+        try:
+            from core.test_result_analyzer import TestResultAnalyzer
+            for case in TestResultAnalyzer(json_sink=False).get_case_statistics(days):
+                cost = case['p50'] or case['last_duration']
+                if cost:
+                    history[case['nodeid']] = cost
+        except Exception as e:
+            logger.debug(f"[Scheduler] 读取结果库历史耗时失败: {e}")
+
+        if history:
+            return history
+
+        # 结果库没有数据时，使用最近一次pytest-html报告
+        try:
+            from utils.report_parser import ReportParser
+            reports = sorted(Path("reports").glob("pytest自动化测试报告_*.html"), key=lambda p: p.stat().st_mtime)
+            if reports:
+                for case in ReportParser.parse_test_cases_from_html(reports[-1]):
+                    if case.get('duration'):
+                        history[strip_xdist_group(case['name'])] = float(case['duration'])
+        except Exception as e:
+            logger.debug(f"[Scheduler] 读取pytest-html报告耗时失败: {e}")
+        return history
+
+    @staticmethod
+    def _build_file_medians(history: Dict[str, float]) -> Dict[str, float]:
+        """按测试文件计算已知用例耗时的中位数"""
+        by_file: Dict[str, List[float]] = defaultdict(list)
+        for nodeid, cost in history.items():
+            by_file[nodeid.split('::')[0]].append(cost)
+        return {path: statistics.median(costs) for path, costs in by_file.items()}
+
+    def estimate(self, nodeid: str) -> float:
+        """估算用例耗时（秒）"""
+        nodeid = strip_xdist_group(nodeid)
+        if nodeid in self.history:
+            return self.history[nodeid]
+        return self._file_medians.get(nodeid.split('::')[0], self._global_median)
+
+    def plan(self, nodeids: List[str], workers: int) -> Tuple[Dict[str, int], List[float]]:
+        """LPT装箱：以测试文件为单位，按文件预计总耗时从长到短依次分配给当前总耗时最小的worker
+
+        同一文件的用例分到同一个worker（与 --dist loadscope 一样复用该worker的浏览器和登录态，
+        依赖文件内执行顺序的用例也不会被拆开）。
+
+        Args:
+            nodeids: 用例nodeid列表
+            workers: worker数量
+
+        Returns:
+            ({nodeid: worker序号}, 每个worker的预计总耗时)
+        """
+        workers = max(1, workers)
+        units: Dict[str, List[str]] = defaultdict(list)
+        for nodeid in nodeids:
+            units[scope_of(nodeid)].append(nodeid)
+        costs = {scope: sum(self.estimate(nodeid) for nodeid in members) for scope, members in units.items()}
+
+        loads = [0.0] * workers
+        heap = [(0.0, index) for index in range(workers)]
+        assignment: Dict[str, int] = {}
+        # 文件路径作为第二排序键，保证所有worker计算出的分配完全一致
+        for scope in sorted(units, key=lambda name: (-costs[name], name)):
+            load, index = heapq.heappop(heap)
+            for nodeid in units[scope]:
+                assignment[nodeid] = index
+            loads[index] = load + costs[scope]
+            heapq.heappush(heap, (loads[index], index))
+        return assignment, loads
+
+    def schedule_items(self, items: list, workers: int):
+        """对收集到的用例排序并分组（在pytest_collection_modifyitems中调用）
+
+        只在并行执行时生效：以测试文件为单位添加 xdist_group 标记，配合 --dist loadgroup
+        让每个worker执行一个预先均衡好的分组；预计耗时长的文件先执行，文件内保持收集顺序。
+        串行执行时不调整（总耗时不受顺序影响）。
+
+        Args:
+            items: pytest收集到的用例列表（原地修改）
+            workers: worker数量（串行为1）
+        """
+        import pytest
+
+        if workers <= 1:
+            return
+        assignment, loads = self.plan([item.nodeid for item in items], workers)
+        costs: Dict[str, float] = defaultdict(float)
+        for item in items:
+            costs[scope_of(item.nodeid)] += self.estimate(item.nodeid)
+        # 稳定排序：只调整文件之间的顺序，同一文件内的用例保持收集顺序
+        items.sort(key=lambda item: (-costs[scope_of(item.nodeid)], scope_of(item.nodeid)))
+        for item in items:
+            item.add_marker(pytest.mark.xdist_group(name=f"{GROUP_PREFIX}{assignment[item.nodeid]}"))
+        self.predicted_loads = {f"{GROUP_PREFIX}{index}": load for index, load in enumerate(loads)}
+        known = sum(1 for item in items if item.nodeid in self.history)
+        logger.info(
+            f"[Scheduler] 按历史耗时调度 {len(items)} 个用例（{len(costs)} 个测试文件，有历史数据 {known} 个），"
+            f"worker数: {workers}，预计makespan: {max(loads):.1f}秒"
+        )
+
+    def predict_from_ids(self, nodeids: List[str]):
+        """根据worker上报的nodeid（带分组后缀）计算各分组的预计耗时（在xdist主进程中调用）
+
+        Args:
+            nodeids: pytest_xdist_node_collection_finished 中的ids
+        """
+        loads: Dict[str, float] = defaultdict(float)
+        for nodeid in nodeids:
+            group = nodeid.rpartition('@')[2] if strip_xdist_group(nodeid) != nodeid else 'master'
+            loads[group] += self.estimate(nodeid)
+        self.predicted_loads = dict(loads)
+
+    def record(self, worker: str, duration: float):
+        """累加worker的实际耗时
+
+        Args:
+            worker: worker标识
+            duration: 单个测试阶段的耗时（秒）
+        """
+        self.actual_loads[worker] += duration or 0.0
+
+    def summary(self) -> Dict[str, float]:
+        """预计与实际的makespan
+
+        Returns:
+            {predicted_makespan, actual_makespan, predicted_total, actual_total}
+        """
+        return {
+            'predicted_makespan': round(max(self.predicted_loads.values(), default=0.0), 1),
+            'actual_makespan': round(max(self.actual_loads.values(), default=0.0), 1),
+            'predicted_total': round(sum(self.predicted_loads.values()), 1),
+            'actual_total': round(sum(self.actual_loads.values()), 1)
+        }
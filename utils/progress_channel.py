@@ -0,0 +1,244 @@
+"""
+执行进度通道
+pytest子进程通过本地UDP把收集总数、当前用例和每个用例的结果实时发送给控制台，控制台不再依赖解析输出行来更新进度
+
+@File  : progress_channel.py
+@Author: shenyuan
+"""
+import json
+import logging
+import os
+import socket
+import threading
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
+# 控制台通过该环境变量告知pytest进程进度通道的端口
+PROGRESS_PORT_ENV = 'WEBUI_PROGRESS_PORT'
+
+# 单个UDP数据报上限（超出时截断nodeid，避免发送失败）
+MAX_DATAGRAM_SIZE = 8192
+
+
+class ProgressReporter:
+    """进度上报端（pytest进程中使用）
+
+    使用UDP发送，不建立连接、不等待应答：控制台未启动或已退出时发送失败也不影响测试执行。
+    """
+
+    def __init__(self, port: int, host: str = '127.0.0.1'):
+        """初始化上报端
+
+        Args:
+            port: 控制台监听端口
+            host: 控制台监听地址
+        """
+        self.address = (host, port)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    @classmethod
+    def from_env(cls) -> Optional['ProgressReporter']:
+        """根据环境变量创建上报端
+
+        Returns:
+            上报端实例，未设置端口时返回None
+        """
+        port = os.environ.get(PROGRESS_PORT_ENV)
+        if not port:
+            return None
+        try:
+            return cls(int(port))
+        except (ValueError, OSError) as e:
+            logger.warning(f"[Progress] 无法创建进度通道: {e}")
+            return None
+
+    def send(self, event: str, **fields):
+        """发送一个进度事件
+
+        Args:
+            event: 事件类型（collected / start / result / finish）
+            **fields: 事件字段
+        """
+        fields['event'] = event
+        data = json.dumps(fields, ensure_ascii=False).encode('utf-8')
+        if len(data) > MAX_DATAGRAM_SIZE and 'nodeid' in fields:
+            fields['nodeid'] = fields['nodeid'][:MAX_DATAGRAM_SIZE // 8]
+            data = json.dumps(fields, ensure_ascii=False).encode('utf-8')
+        try:
+            self._sock.sendto(data, self.address)
+        except OSError:
+            pass
+
+    def close(self):
+        """关闭套接字"""
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+
+
+class ProgressState:
+    """进度状态（控制台中使用）
+
+    按nodeid记录每个用例的最新结果：teardown错误或重试会修正已有结果，而不会重复计数。
+    """
+
+    COUNTED_OUTCOMES = ('passed', 'failed', 'skipped', 'error')
+
+    def __init__(self):
+        """初始化进度状态"""
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空状态（每次执行开始时调用）"""
+        with self._lock:
+            self.total = 0
+            self.current = ''
+            self.reruns = 0
+            self.finished = False
+            self.counts = {outcome: 0 for outcome in self.COUNTED_OUTCOMES}
+            self._results: Dict[str, str] = {}
+            self.version = 0
+
+    def apply(self, message: Dict[str, Any]):
+        """应用一个进度事件
+
+        Args:
+            message: ProgressReporter 发送的事件字典
+        """
+        event = message.get('event')
+        nodeid = message.get('nodeid', '')
+        with self._lock:
+            if event == 'collected':
+                self.total = int(message.get('total') or 0)
+            elif event == 'start':
+                self.current = nodeid
+            elif event == 'result':
+                outcome = message.get('outcome')
+                previous = self._results.pop(nodeid, None)
+                if previous:
+                    self.counts[previous] -= 1
+                    # 与结果流一致：只有call通过时teardown失败才记为error
+                    if message.get('when') == 'teardown' and previous != 'passed':
+                        outcome = previous
+                if outcome == 'rerun':
+                    # 重试：上一次结果作废，等待新的结果
+                    self.reruns += 1
+                elif outcome in self.COUNTED_OUTCOMES:
+                    self._results[nodeid] = outcome
+                    self.counts[outcome] += 1
+            elif event == 'finish':
+                self.finished = True
+                self.current = ''
+            self.version += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """获取当前进度
+
+        Returns:
+            {total, done, passed, failed, skipped, error, reruns, current, finished, version}
+        """
+        with self._lock:
+            return {
+                'total': self.total,
+                'done': len(self._results),
+                'reruns': self.reruns,
+                'current': self.current,
+                'finished': self.finished,
+                'version': self.version,
+                **self.counts
+            }
+
+
+class ProgressServer:
+    """进度接收端（控制台中使用）：在后台线程中接收UDP事件并更新 ProgressState"""
+
+    def __init__(self, host: str = '127.0.0.1'):
+        """初始化接收端
+
+        Args:
+            host: 监听地址（只监听本机）
+        """
+        self.host = host
+        self.state = ProgressState()
+        self._sock: Optional[socket.socket] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    @property
+    def port(self) -> Optional[int]:
+        """实际监听的端口（启动后可用）"""
+        return self._sock.getsockname()[1] if self._sock else None
+
+    def start(self) -> int:
+        """启动接收线程（已启动时直接返回端口）
+
+        Returns:
+            监听端口
+        """
+        if self._running:
+            return self.port
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # 端口由系统分配，避免与其他控制台实例冲突
+        self._sock.bind((self.host, 0))
+        self._sock.settimeout(0.5)
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, name='progress-channel', daemon=True)
+        self._thread.start()
+        logger.info(f"[Progress] 进度通道已启动，端口: {self.port}")
+        return self.port
+
+    def _serve(self):
+        """接收循环"""
+        while self._running:
+            try:
+                data, _ = self._sock.recvfrom(MAX_DATAGRAM_SIZE)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                self.state.apply(json.loads(data.decode('utf-8')))
+            except (ValueError, UnicodeDecodeError):
+                logger.debug(f"[Progress] 忽略无法解析的进度事件: {data[:100]!r}")
+
+    def stop(self):
+        """停止接收线程"""
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+        if self._sock:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+
+def report_outcome(report) -> Optional[str]:
+    """把单个测试阶段的报告转换为进度结果（不影响进度的阶段返回None）
+
+    Args:
+        report: pytest TestReport
+
+    Returns:
+        passed / failed / skipped / error / rerun 或 None
+    """
+    if report.outcome == 'rerun':
+        return 'rerun'
+    if report.when == 'setup':
+        if report.failed:
+            return 'error'
+        if report.skipped:
+            return 'skipped'
+        return None
+    if report.when == 'call':
+        return report.outcome
+    if report.when == 'teardown' and report.failed:
+        return 'error'
+    return None
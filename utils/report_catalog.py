@@ -0,0 +1,257 @@
+"""
+测试报告目录
+每次执行结束时把报告的时间、模块、用例统计、耗时和文件大小写入索引（SQLite），
+控制台的报告列表和趋势分析直接分页查询索引，不再每次扫描 reports/ 目录并读取每个文件的信息
+
+@File  : report_catalog.py
+@Author: shenyuan
+"""
+import logging
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
+# 报告文件名前缀 -> 报告类型
+REPORT_KINDS = {
+    'WebUI自动化测试报告_': 'webui',
+    'pytest自动化测试报告_': 'pytest',
+}
+
+# 允许排序的列
+SORT_COLUMNS = ('created_at', 'pass_rate', 'duration', 'size', 'total', 'failed')
+
+CATALOG_COLUMNS = (
+    'path', 'kind', 'created_at', 'modules', 'total', 'passed',
+    'failed', 'skipped', 'duration', 'pass_rate', 'size'
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    modules TEXT,
+    total INTEGER,
+    passed INTEGER,
+    failed INTEGER,
+    skipped INTEGER,
+    duration REAL,
+    pass_rate REAL,
+    size INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_reports_created_at ON reports (created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_kind ON reports (kind, created_at);
+"""
+
+_TIMESTAMP_PATTERN = re.compile(r'_(\d{8}_\d{6})$')
+
+
+def report_kind(report_path: Path) -> Optional[str]:
+    """根据文件名判断报告类型，不是测试报告时返回None"""
+    for prefix, kind in REPORT_KINDS.items():
+        if report_path.name.startswith(prefix) and report_path.suffix == '.html':
+            return kind
+    return None
+
+
+def report_time(report_path: Path) -> datetime:
+    """报告的执行时间：优先取文件名中的时间戳（xxx_20250101_120000.html），否则取修改时间"""
+    match = _TIMESTAMP_PATTERN.search(report_path.stem)
+    if match:
+        try:
+            return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(report_path.stat().st_mtime)
+
+
+def report_size(report_path: Path) -> int:
+    """报告占用的空间（自定义报告包含同名的用例明细数据文件）"""
+    size = report_path.stat().st_size
+    data_file = report_path.with_name(f"{report_path.stem}.data.js")
+    if data_file.exists():
+        size += data_file.stat().st_size
+    return size
+
+
+class ReportCatalog:
+    """报告索引
+
+    - 报告生成后调用 add() 写入，删除报告时调用 remove()
+    - 索引文件不存在时（第一次使用）扫描一次 reports/ 目录导入已有报告，之后不再扫描
+    - 查询在数据库中完成分页、排序和筛选，报告数量很多时列表也可以立即打开
+    """
+
+    def __init__(self, reports_dir: str = "reports", db_name: str = "catalog.db"):
+        """初始化索引
+
+        Args:
+            reports_dir: 报告目录
+            db_name: 索引文件名（保存在报告目录中）
+        """
+        self.reports_dir = Path(reports_dir)
+        self.reports_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.reports_dir / db_name
+        first_use = not self.db_path.exists()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        if first_use:
+            self.rebuild()
+
+    @contextmanager
+    def _connect(self):
+        """打开一个连接，正常结束时提交，异常时回滚"""
+        conn = sqlite3.connect(str(self.db_path), timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _key(self, report_path: Path) -> str:
+        """索引中的路径（相对于报告目录，报告目录整体移动后依然有效）"""
+        try:
+            return Path(report_path).resolve().relative_to(self.reports_dir.resolve()).as_posix()
+        except ValueError:
+            return Path(report_path).as_posix()
+
+    def path_of(self, key: str) -> Path:
+        """索引中的路径对应的报告文件"""
+        path = Path(key)
+        return path if path.is_absolute() else self.reports_dir / path
+
+    def add(self, report_path: Path, stats: Optional[Dict[str, Any]] = None, modules: str = '',
+            created_at: Optional[datetime] = None):
+        """写入或更新一个报告
+
+        Args:
+            report_path: 报告文件
+            stats: 用例统计 {total, passed, failed, skipped, duration}，未知时为None
+            modules: 执行的模块
+            created_at: 执行时间，默认从文件名中解析
+        """
+        report_path = Path(report_path)
+        if not report_path.exists():
+            return
+        stats = stats or {}
+        total = stats.get('total')
+        passed = stats.get('passed')
+        pass_rate = (passed / total * 100) if total and passed is not None else None
+        row = {
+            'path': self._key(report_path),
+            'kind': report_kind(report_path) or 'other',
+            'created_at': (created_at or report_time(report_path)).isoformat(timespec='seconds'),
+            'modules': modules,
+            'total': total,
+            'passed': passed,
+            'failed': stats.get('failed'),
+            'skipped': stats.get('skipped'),
+            'duration': stats.get('duration'),
+            'pass_rate': pass_rate,
+            'size': report_size(report_path),
+        }
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO reports ({', '.join(CATALOG_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(CATALOG_COLUMNS))})",
+                [row[column] for column in CATALOG_COLUMNS]
+            )
+
+    def remove(self, report_path: Path):
+        """从索引中删除报告"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM reports WHERE path = ?", (self._key(Path(report_path)),))
+
+    def rebuild(self) -> int:
+        """重新扫描报告目录（索引第一次创建或手动重建时使用）
+
+        已在索引中的报告保留统计信息，只更新文件大小；索引中文件已不存在的报告会被删除。
+
+        Returns:
+            索引中的报告数量
+        """
+        with self._connect() as conn:
+            known = {row['path'] for row in conn.execute("SELECT path FROM reports")}
+        found = set()
+        for report_path in self.reports_dir.glob("*.html"):
+            if report_kind(report_path) is None:
+                continue
+            key = self._key(report_path)
+            found.add(key)
+            try:
+                if key in known:
+                    with self._connect() as conn:
+                        conn.execute("UPDATE reports SET size = ? WHERE path = ?", (report_size(report_path), key))
+                else:
+                    self.add(report_path)
+            except OSError as e:
+                logger.warning(f"[ReportCatalog] 读取报告信息失败 {report_path}: {e}")
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM reports WHERE path = ?", [(key,) for key in known - found])
+        logger.info(f"[ReportCatalog] 报告索引已重建，共 {len(found)} 个报告")
+        return len(found)
+
+    def query(self, page: int = 1, page_size: int = 20, sort_by: str = 'created_at', descending: bool = True,
+              keyword: str = '', kind: Optional[str] = None, outcome: Optional[str] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """分页查询报告
+
+        Args:
+            page: 页码（从1开始）
+            page_size: 每页条数
+            sort_by: 排序列（见 SORT_COLUMNS）
+            descending: 是否倒序
+            keyword: 按文件名或模块搜索
+            kind: 报告类型（webui / pytest），为None时不限制
+            outcome: failed（有失败用例）/ passed（全部通过），为None时不限制
+
+        Returns:
+            (当前页的报告列表, 符合条件的报告总数)
+        """
+        conditions, params = [], []
+        if keyword:
+            conditions.append("(path LIKE ? OR modules LIKE ?)")
+            params += [f"%{keyword}%", f"%{keyword}%"]
+        if kind:
+            conditions.append("kind = ?")
+            params.append(kind)
+        if outcome == 'failed':
+            conditions.append("failed > 0")
+        elif outcome == 'passed':
+            conditions.append("failed = 0")
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        if sort_by not in SORT_COLUMNS:
+            sort_by = 'created_at'
+        order = f" ORDER BY {sort_by} IS NULL, {sort_by} {'DESC' if descending else 'ASC'}, created_at DESC"
+        offset = max(page - 1, 0) * page_size
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM reports{where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {', '.join(CATALOG_COLUMNS)} FROM reports{where}{order} LIMIT ? OFFSET ?",
+                (*params, page_size, offset)
+            ).fetchall()
+        return [dict(row) for row in rows], total
+
+    def recent(self, kind: str, limit: int = 30) -> List[Dict[str, Any]]:
+        """最近的报告（按执行时间倒序）
+
+        Args:
+            kind: 报告类型
+            limit: 最多返回条数
+
+        Returns:
+            报告列表
+        """
+        rows, _ = self.query(page=1, page_size=limit, kind=kind)
+        return rows
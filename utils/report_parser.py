@@ -103,6 +103,37 @@ class ReportParser:
         
         return result
     
+    @staticmethod
+    def parse_xdist_output(output_lines: List[str]) -> List[Dict[str, Any]]:
+        """解析pytest-xdist并行执行的输出，提取测试用例结果
+        
+        并行执行时 -v 输出格式为：[gw0] [ 50%] PASSED test_cases/xxx.py::TestClass::test_method
+        同一用例重试时会出现多行（RERUN ... 最终 PASSED/FAILED），只保留最终结果。
+        
+        Args:
+            output_lines: pytest输出的行列表
+            
+        Returns:
+            测试用例列表 [{'name', 'status', 'duration', 'error', 'worker'}]
+        """
+        pattern = re.compile(
+            r'\[(gw\d+)\]\s+(?:\[\s*\d+%\]\s+)?(PASSED|FAILED|SKIPPED|ERROR|XFAIL|XPASS)\s+(\S+::\S+)'
+        )
+        cases: Dict[str, Dict[str, Any]] = {}
+        for line in output_lines:
+            match = pattern.search(line)
+            if not match:
+                continue
+            worker, status, nodeid = match.groups()
+            cases[nodeid] = {
+                'name': nodeid,
+                'status': status.lower(),
+                'duration': 0.0,
+                'error': '',
+                'worker': worker
+            }
+        return list(cases.values())
+    
     @staticmethod
     def parse_html_report(html_path: Path) -> Dict[str, Any]:
         """解析pytest-html生成的HTML报告
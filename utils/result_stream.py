@@ -0,0 +1,276 @@
+"""
+测试结果流
+pytest执行过程中按测试阶段逐条写入JSONL结果记录，报告生成、趋势分析和通知直接读取，不再解析stdout和HTML
+
+@File  : result_stream.py
+@Author: shenyuan
+"""
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Any, Optional
+
+from core.run_context import strip_xdist_group
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = True
+
+# 控制台通过该环境变量指定本次执行的结果流文件
+RESULT_STREAM_ENV = 'WEBUI_RESULT_STREAM'
+
+# 没有结果流（命令行直接执行）时，会话开始时生成的执行标识保存在该环境变量中，xdist worker继承
+RUN_ID_ENV = 'WEBUI_RUN_ID'
+
+# 错误信息最大长度（完整堆栈仍可在pytest-html报告中查看）
+MAX_ERROR_LENGTH = 4000
+
+
+class ResultStreamWriter:
+    """结果流写入器（每个测试阶段一行JSON，写完立即flush，执行中途也可读取）"""
+
+    def __init__(self, path: str):
+        """初始化写入器
+
+        Args:
+            path: JSONL文件路径
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = Lock()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def write(self, record: Dict[str, Any]):
+        """写入一条记录"""
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def write_report(self, report):
+        """把pytest的TestReport转换为记录并写入"""
+        self.write(build_record(report))
+
+    def close(self):
+        """关闭文件"""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def current_run_id() -> str:
+    """本次执行的标识：结果流文件名（如 results_20250101_120000），命令行直接执行时为 ensure_run_id() 生成的标识"""
+    stream_path = os.environ.get(RESULT_STREAM_ENV)
+    return Path(stream_path).stem if stream_path else os.environ.get(RUN_ID_ENV, '')
+
+
+def ensure_run_id() -> str:
+    """保证本次执行有标识（在主进程的 pytest_sessionstart 中调用，worker启动前写入环境变量）
+
+    产物按 (nodeid, 执行标识) 标记失败，标识为空时会把同一用例之前所有命令行执行的产物都标记为失败。
+
+    Returns:
+        本次执行的标识
+    """
+    if not current_run_id():
+        os.environ[RUN_ID_ENV] = f"cli_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+    return current_run_id()
+
+
+def report_worker(report) -> str:
+    """获取报告来源的worker标识（xdist主进程中report.node为对应的worker）"""
+    node = getattr(report, 'node', None)
+    gateway = getattr(node, 'gateway', None)
+    if gateway is not None and getattr(gateway, 'id', None):
+        return gateway.id
+    return os.environ.get('PYTEST_XDIST_WORKER', 'master')
+
+
+def build_record(report) -> Dict[str, Any]:
+    """把pytest的TestReport转换为一条结果记录
+
+    Args:
+        report: pytest TestReport
+
+    Returns:
+        记录字典：nodeid、阶段、结果、耗时、重试序号、截图、追踪文件、Web Vitals、性能预算超出项、网络拦截统计、错误信息等
+    """
+    error = ''
+    if report.failed and report.longrepr:
+        error = getattr(report, 'longreprtext', '') or str(report.longrepr)
+        error = error[-MAX_ERROR_LENGTH:]
+    elif report.skipped and isinstance(report.longrepr, tuple) and len(report.longrepr) == 3:
+        # 跳过原因：(文件, 行号, 原因)
+        error = str(report.longrepr[2])
+
+    return {
+        # --dist loadgroup 会在nodeid后追加分组名，记录中使用原始nodeid，保证历史记录可以对应
+        'nodeid': strip_xdist_group(report.nodeid),
+        'when': report.when,
+        'outcome': report.outcome,
+        'duration': round(getattr(report, 'duration', 0.0) or 0.0, 3),
+        'rerun': getattr(report, 'rerun', 0) or 0,
+        'worker': report_worker(report),
+        'screenshots': list(getattr(report, 'screenshots', None) or []),
+        'traces': list(getattr(report, 'traces', None) or []),
+        'vitals': dict(getattr(report, 'vitals', None) or {}),
+        'budget': list(getattr(report, 'budget', None) or []),
+        'network': dict(getattr(report, 'network', None) or {}),
+        'error': error,
+        'timestamp': round(time.time(), 3)
+    }
+
+
+def read_records(path: str) -> List[Dict[str, Any]]:
+    """读取结果流中的所有记录（忽略写了一半的最后一行）
+
+    Args:
+        path: JSONL文件路径
+
+    Returns:
+        记录列表
+    """
+    records = []
+    stream_path = Path(path)
+    if not stream_path.exists():
+        return records
+    with open(stream_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.debug(f"[ResultStream] 跳过无法解析的记录: {line[:100]}")
+    return records
+
+
+def summarize_records(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """把阶段记录汇总为每个用例的最终结果和整体统计（单次遍历）
+
+    规则：
+    - setup 失败记为 error，setup 跳过记为 skipped
+    - call 阶段决定 passed / failed / skipped
+    - teardown 失败且 call 通过时记为 error
+    - 结果为 rerun 的记录表示该用例开始重试，累加重试次数并重新计算结果
+
+    Args:
+        records: read_records() 返回的记录列表
+
+    Returns:
+        与控制台 test_stats 结构一致的字典：
+        {total, passed, failed, skipped, error, duration, test_cases, error_details, budget_violations}
+    """
+    cases: Dict[str, Dict[str, Any]] = {}
+    first_ts: Optional[float] = None
+    last_ts: Optional[float] = None
+
+    for record in records:
+        nodeid = record.get('nodeid')
+        if not nodeid:
+            continue
+        ts = record.get('timestamp')
+        if ts:
+            first_ts = ts if first_ts is None else min(first_ts, ts)
+            last_ts = ts if last_ts is None else max(last_ts, ts)
+
+        case = cases.get(nodeid)
+        if case is None:
+            case = cases[nodeid] = {
+                'name': nodeid,
+                'status': 'passed',
+                'duration': 0.0,
+                'error': '',
+                'reruns': 0,
+                'worker': record.get('worker', ''),
+                'screenshots': [],
+                'traces': [],
+                'vitals': {},
+                'budget': [],
+                'network': {}
+            }
+
+        when = record.get('when')
+        outcome = record.get('outcome')
+        case['worker'] = record.get('worker', case['worker'])
+        for shot in record.get('screenshots') or []:
+            if shot not in case['screenshots']:
+                case['screenshots'].append(shot)
+        # 每次执行（包括重试前失败的那次）的追踪文件都保留
+        for trace in record.get('traces') or []:
+            if trace not in case['traces']:
+                case['traces'].append(trace)
+        if record.get('network'):
+            case['network'] = record['network']
+        if record.get('vitals'):
+            case['vitals'] = record['vitals']
+        # 性能预算以最后一次执行为准（重试前失败那次的记录会被覆盖）
+        if when == 'call':
+            case['budget'] = record.get('budget') or []
+
+        if outcome == 'rerun':
+            # 新的一次尝试开始，之前的结果作废
+            case['reruns'] += 1
+            case['status'] = 'passed'
+            case['duration'] = 0.0
+            case['error'] = record.get('error', '') or case['error']
+            continue
+
+        case['duration'] = round(case['duration'] + (record.get('duration') or 0.0), 3)
+        if when == 'setup':
+            if outcome == 'failed':
+                case['status'] = 'error'
+                case['error'] = record.get('error', '')
+            elif outcome == 'skipped':
+                case['status'] = 'skipped'
+                case['error'] = record.get('error', '')
+        elif when == 'call':
+            case['status'] = outcome
+            case['error'] = record.get('error', '') if outcome != 'passed' else ''
+        elif when == 'teardown' and outcome == 'failed' and case['status'] == 'passed':
+            case['status'] = 'error'
+            case['error'] = record.get('error', '')
+
+    test_cases = list(cases.values())
+    counts = {'passed': 0, 'failed': 0, 'skipped': 0, 'error': 0}
+    for case in test_cases:
+        counts[case['status']] = counts.get(case['status'], 0) + 1
+
+    return {
+        'total': len(test_cases),
+        'passed': counts['passed'],
+        'failed': counts['failed'],
+        'skipped': counts['skipped'],
+        'error': counts['error'],
+        'duration': round(last_ts - first_ts, 3) if first_ts is not None else 0.0,
+        'test_cases': test_cases,
+        'error_details': [
+            {'name': case['name'], 'error': case['error']}
+            for case in test_cases if case['status'] in ('failed', 'error')
+        ],
+        'budget_violations': [
+            {'name': case['name'], **violation}
+            for case in test_cases for violation in case['budget']
+        ]
+    }
+
+
+def load_result_stream(path: str) -> Optional[Dict[str, Any]]:
+    """读取并汇总结果流
+
+    Args:
+        path: JSONL文件路径
+
+    Returns:
+        汇总结果，文件不存在或没有记录时返回None
+    """
+    records = read_records(path)
+    if not records:
+        return None
+    return summarize_records(records)
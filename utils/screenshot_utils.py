@@ -1,189 +1,400 @@
 """
 截图工具
-提供统一的截图方法，支持错误截图和成功截图
+提供统一的截图方法，支持错误截图和成功截图。
+截图模式（可视区域/元素/整页）和图片格式（PNG/JPEG/WebP）可配置，
+编码、写文件和生成缩略图在后台线程池中完成，不占用事件循环；
+启用产物存储时截图按内容哈希保存，相同的截图只编码、保存一次
 
 @File  : screenshot_utils.py
 @Author: shenyuan
 """
 import asyncio
+import concurrent.futures
+import io
 import logging
+import os
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional, Any, Tuple
+
+import yaml
 from playwright.async_api import Page
+from core.artifact_store import ArtifactStore, get_artifact_store
+from core.log_pipeline import get_current_test
+from core.run_context import worker_output_dir, strip_xdist_group
+from utils.result_stream import current_run_id
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
 
 # 创建logger用于记录截图日志
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 logger.propagate = True
 
+# 截图模式：viewport（可视区域）/ full_page（整页）/ element（指定元素）
+SCREENSHOT_MODES = ('viewport', 'full_page', 'element')
+
+# 图片格式及对应的扩展名
+SCREENSHOT_FORMATS = {'png': '.png', 'jpeg': '.jpg', 'webp': '.webp'}
+
+# 缩略图的JPEG质量（只用于报告中预览）
+THUMBNAIL_QUALITY = 70
+
+# 后台编码线程池（所有截图共用；Pillow编码时会释放GIL，线程池即可并行）
+_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# 尚未写完的截图（conftest生成报告前等待）
+_pending = set()
+_pending_lock = threading.Lock()
+
+# 截图文件 -> 截图名称（产物存储中的文件按哈希命名，报告按名称区分错误/成功截图）
+_display_names: Dict[str, str] = {}
+
+
+def _get_executor(max_workers: int) -> concurrent.futures.ThreadPoolExecutor:
+    """获取后台编码线程池（首次使用时创建）"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, max_workers), thread_name_prefix='screenshot'
+            )
+        return _executor
+
+
+def thumbnail_path_for(screenshot_path: str) -> Path:
+    """截图对应的缩略图路径：xxx.jpg -> xxx.thumb.jpg
+
+    Args:
+        screenshot_path: 截图路径
+
+    Returns:
+        缩略图路径（未生成缩略图时文件不存在）
+    """
+    path = Path(screenshot_path)
+    return path.with_name(f"{path.stem}.thumb.jpg")
+
+
+def display_name(screenshot_path: str) -> str:
+    """截图名称（如 error_20250101_120000_000_xxx），不是本进程生成的截图时返回文件名
+
+    Args:
+        screenshot_path: 截图路径
+
+    Returns:
+        截图名称
+    """
+    return _display_names.get(str(screenshot_path), Path(screenshot_path).stem)
+
+
+def _encode_and_write(data: bytes, filepath: Path, image_format: str, quality: int,
+                      thumbnail_width: int) -> Tuple[int, float]:
+    """在后台线程中编码并写入截图，同时生成缩略图
+
+    Args:
+        data: Playwright返回的图片数据（PNG或JPEG）
+        filepath: 保存路径
+        image_format: 目标格式（webp时在此转码，png/jpeg已由浏览器编码）
+        quality: JPEG/WebP质量
+        thumbnail_width: 缩略图宽度，为0时不生成
+
+    Returns:
+        (写入的字节数, 编码耗时毫秒)
+    """
+    start = time.perf_counter()
+    image = None
+    if Image is not None and (image_format == 'webp' or thumbnail_width):
+        image = Image.open(io.BytesIO(data))
+    if image_format == 'webp':
+        buffer = io.BytesIO()
+        image.save(buffer, 'WEBP', quality=quality, method=4)
+        data = buffer.getvalue()
+
+    # 缩略图先于原图写入：原图存在即说明缩略图也已生成（产物存储据此判断是否需要重新编码）
+    if image is not None and thumbnail_width and image.width > thumbnail_width:
+        thumbnail = image.convert('RGB')
+        # 只限制宽度，高度按比例缩放（整页截图很长，缩略图也保持比例）
+        thumbnail.thumbnail((thumbnail_width, thumbnail_width * 100))
+        thumbnail.save(thumbnail_path_for(str(filepath)), 'JPEG', quality=THUMBNAIL_QUALITY)
+    # 先写临时文件再替换，并行worker保存相同内容时不会读到写了一半的文件
+    tmp_path = filepath.with_name(f"{filepath.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, filepath)
+    return len(data), (time.perf_counter() - start) * 1000
+
+
+def _save_screenshot(data: bytes, filepath: Path, image_format: str, quality: int, thumbnail_width: int,
+                     store: Optional[ArtifactStore], digest: str, step: str,
+                     nodeid: str) -> Tuple[int, float, bool]:
+    """保存截图（后台线程中执行）：产物存储中已有相同内容时跳过编码，只记录索引
+
+    Returns:
+        (文件字节数, 编码耗时毫秒, 是否为重复截图)
+    """
+    deduped = store is not None and filepath.exists()
+    if deduped:
+        size, encode_ms = filepath.stat().st_size, 0.0
+    else:
+        size, encode_ms = _encode_and_write(data, filepath, image_format, quality, thumbnail_width)
+    if store is not None:
+        store.register(digest, filepath, 'screenshot', step=step, nodeid=nodeid, run_id=current_run_id())
+    return size, encode_ms, deduped
+
+
+def wait_pending(timeout: float = 10.0) -> int:
+    """等待后台尚未写完的截图（同步函数，供pytest hook在生成报告前调用）
+
+    Args:
+        timeout: 最长等待时间（秒）
+
+    Returns:
+        超时仍未写完的截图数量
+    """
+    with _pending_lock:
+        pending = list(_pending)
+    if not pending:
+        return 0
+    _, not_done = concurrent.futures.wait(pending, timeout=timeout)
+    if not_done:
+        logger.warning(f"[ScreenshotHelper] 仍有 {len(not_done)} 张截图未写完")
+    return len(not_done)
+
 
 class ScreenshotHelper:
-    """截图辅助类"""
-    
-    def __init__(self, screenshot_dir: str = "screenshots"):
+    """截图辅助类
+
+    配置（config/settings.yaml 的 playwright.screenshot）：
+    - mode: 普通截图的模式，viewport（默认）/ full_page
+    - error_mode: 错误截图的模式，默认 full_page（失败时需要完整页面）
+    - format: png / jpeg（默认）/ webp（需要Pillow，未安装时按jpeg处理）
+    - quality: JPEG/WebP质量（1-100）
+    - thumbnail_width: 报告缩略图宽度，0表示不生成（需要Pillow）
+    - encode_workers: 后台编码线程数
+    - async_write: 为true时截图后立即返回，不等待文件写完（报告生成前统一等待）
+
+    artifacts.enabled 为true（默认）时截图保存到产物存储（按内容哈希命名），否则保存到 screenshot_dir。
+    """
+
+    def __init__(self, screenshot_dir: str = "screenshots", config_path: str = "config/settings.yaml"):
         """初始化截图辅助类
-        
+
+        Args:
+            screenshot_dir: 截图保存目录（并行执行时每个worker使用独立的子目录）
+            config_path: 配置文件路径
+        """
+        self.screenshot_dir = worker_output_dir(screenshot_dir)
+        config = self._load_config(config_path)
+        self.mode = config.get('mode', 'viewport')
+        self.error_mode = config.get('error_mode', 'full_page')
+        for mode in (self.mode, self.error_mode):
+            if mode not in SCREENSHOT_MODES:
+                logger.warning(f"[ScreenshotHelper] 未知的截图模式 {mode}，按 viewport 处理")
+        self.format = config.get('format', 'jpeg')
+        if self.format not in SCREENSHOT_FORMATS:
+            logger.warning(f"[ScreenshotHelper] 未知的截图格式 {self.format}，按 jpeg 处理")
+            self.format = 'jpeg'
+        if self.format == 'webp' and Image is None:
+            logger.warning("[ScreenshotHelper] 未安装Pillow，无法编码WebP，按 jpeg 保存")
+            self.format = 'jpeg'
+        self.quality = int(config.get('quality', 80))
+        self.thumbnail_width = int(config.get('thumbnail_width', 320)) if Image is not None else 0
+        self.encode_workers = int(config.get('encode_workers', 2))
+        self.async_write = bool(config.get('async_write', False))
+        self.store = get_artifact_store(config_path)
+        self.counters = {'count': 0, 'deduped': 0, 'capture_ms': 0.0, 'max_capture_ms': 0.0,
+                         'encode_ms': 0.0, 'bytes': 0}
+        self._counters_lock = threading.Lock()
+
+    @staticmethod
+    def _load_config(config_path: str) -> dict:
+        """读取 settings.yaml 的 playwright.screenshot 配置"""
+        config_file = Path(config_path)
+        if not config_file.exists():
+            return {}
+        with open(config_file, 'r', encoding='utf-8') as f:
+            return (yaml.safe_load(f) or {}).get('playwright', {}).get('screenshot', {}) or {}
+
+    @staticmethod
+    def _timestamp() -> str:
+        """毫秒级时间戳，防止文件名重复：YYYYMMDD_HHMMSS_mmm"""
+        now = datetime.now()
+        return f"{now.strftime('%Y%m%d_%H%M%S')}_{now.microsecond // 1000:03d}"
+
+    async def _capture(self, page: Page, stem: str, mode: str, target=None, label: str = "截图") -> str:
+        """截图并交给后台线程编码保存
+
         Args:
-            screenshot_dir: 截图保存目录
+            page: Playwright Page 对象
+            stem: 文件名（不含扩展名）
+            mode: 截图模式
+            target: 元素模式下截图的Locator
+            label: 日志中的截图类型
+
+        Returns:
+            截图文件路径，页面已关闭时返回空字符串
+        """
+        # 检查页面是否已关闭
+        if page.is_closed():
+            logger.warning(f"[ScreenshotHelper] 页面已关闭，无法截图")
+            return ""
+
+        # PNG和JPEG由浏览器直接编码；WebP先取PNG，再在后台线程转码
+        options: Dict[str, Any] = {'type': 'jpeg' if self.format == 'jpeg' else 'png'}
+        if self.format == 'jpeg':
+            options['quality'] = self.quality
+
+        start = time.perf_counter()
+        if mode == 'element' and target is not None:
+            data = await target.screenshot(**options)
+        else:
+            data = await page.screenshot(full_page=(mode == 'full_page'), **options)
+        capture_ms = (time.perf_counter() - start) * 1000
+
+        extension = SCREENSHOT_FORMATS[self.format]
+        digest = ''
+        if self.store is not None:
+            # 按原始截图内容寻址：内容相同的截图对应同一个文件
+            digest = ArtifactStore.digest(data)
+            filepath = self.store.blob_path(digest, extension)
+        else:
+            filepath = self.screenshot_dir / f"{stem}{extension}"
+        _display_names[str(filepath)] = stem
+
+        future = _get_executor(self.encode_workers).submit(
+            _save_screenshot, data, filepath, self.format, self.quality, self.thumbnail_width,
+            # 用例nodeid在截图时取得（async_write时写入完成前可能已经开始下一个用例）
+            self.store, digest, stem, strip_xdist_group(get_current_test())
+        )
+        with _pending_lock:
+            _pending.add(future)
+        future.add_done_callback(lambda f: self._on_written(f, filepath, capture_ms, label))
+        if not self.async_write:
+            await asyncio.wrap_future(future)
+        return str(filepath)
+
+    def _on_written(self, future: concurrent.futures.Future, filepath: Path, capture_ms: float, label: str):
+        """截图写完后记录耗时和大小（在后台线程中执行）"""
+        with _pending_lock:
+            _pending.discard(future)
+        error = future.exception()
+        if error is not None:
+            logger.error(f"[ScreenshotHelper] 保存{label}失败 {filepath}: {error}")
+            return
+        size, encode_ms, deduped = future.result()
+        with self._counters_lock:
+            self.counters['count'] += 1
+            self.counters['deduped'] += int(deduped)
+            self.counters['capture_ms'] += capture_ms
+            self.counters['max_capture_ms'] = max(self.counters['max_capture_ms'], capture_ms)
+            self.counters['encode_ms'] += encode_ms
+            self.counters['bytes'] += 0 if deduped else size
+        if deduped:
+            logger.info(f"[ScreenshotHelper] {label}与已有截图相同，复用: {filepath}（截图 {capture_ms:.0f}ms）")
+            return
+        logger.info(f"[ScreenshotHelper] {label}已保存: {filepath}（截图 {capture_ms:.0f}ms，"
+                    f"编码 {encode_ms:.0f}ms，{size / 1024:.0f}KB）")
+
+    def stats(self) -> Dict[str, Any]:
+        """本进程的截图统计
+
+        Returns:
+            {count, deduped, avg_capture_ms, max_capture_ms, avg_encode_ms, total_bytes}
         """
-        self.screenshot_dir = Path(screenshot_dir)
-        self.screenshot_dir.mkdir(parents=True, exist_ok=True)
-    
+        with self._counters_lock:
+            count = self.counters['count']
+            return {
+                'count': count,
+                'deduped': self.counters['deduped'],
+                'avg_capture_ms': round(self.counters['capture_ms'] / count, 1) if count else 0.0,
+                'max_capture_ms': round(self.counters['max_capture_ms'], 1),
+                'avg_encode_ms': round(self.counters['encode_ms'] / count, 1) if count else 0.0,
+                'total_bytes': self.counters['bytes']
+            }
+
     async def take_error_screenshot(self, page: Page, error_message: str = "", prefix: str = "error") -> str:
-        """在发生错误时截图
-        
+        """在发生错误时截图（使用 error_mode）
+
         Args:
             page: Playwright Page 对象
             error_message: 错误信息（用于生成文件名）
             prefix: 文件名前缀，默认为 "error"
-            
+
         Returns:
             截图文件路径
         """
         try:
-            # 生成文件名：error_YYYYMMDD_HHMMSS_错误信息前10个字符.png
-            # 添加毫秒级时间戳，防止文件名重复
-            from datetime import datetime
-            now = datetime.now()
-            timestamp = now.strftime("%Y%m%d_%H%M%S")
-            milliseconds = now.microsecond // 1000  # 毫秒
-            timestamp_with_ms = f"{timestamp}_{milliseconds:03d}"
-            
+            # 生成文件名：error_YYYYMMDD_HHMMSS_mmm_错误信息前20个字符
             # 清理错误信息，只保留安全字符
             safe_error = "".join(c for c in error_message[:20] if c.isalnum() or c in ('_', '-')).strip()
+            stem = f"{prefix}_{self._timestamp()}"
             if safe_error:
-                filename = f"{prefix}_{timestamp_with_ms}_{safe_error}.png"
-            else:
-                filename = f"{prefix}_{timestamp_with_ms}.png"
-            
-            filepath = self.screenshot_dir / filename
-            
-            # 检查页面是否已关闭
-            if page.is_closed():
-                logger.warning(f"[ScreenshotHelper] 页面已关闭，无法截图")
-                return ""
-            
-            # 截图 - 确保在正确的事件循环中执行
-            try:
-                await page.screenshot(path=str(filepath), full_page=True)
-                logger.info(f"[ScreenshotHelper] 错误截图已保存: {filepath}")
-                return str(filepath)
-            except RuntimeError as e:
-                if "different loop" in str(e):
-                    logger.warning(f"[ScreenshotHelper] 事件循环不匹配，无法截图: {e}")
-                    return ""
-                raise
+                stem = f"{stem}_{safe_error}"
+            return await self._capture(page, stem, self.error_mode, label="错误截图")
         except Exception as e:
             logger.error(f"[ScreenshotHelper] 保存错误截图失败: {e}")
             import traceback
             logger.error(traceback.format_exc())
             return ""
-    
+
     async def take_success_screenshot(self, page: Page, step_name: str = "", prefix: str = "success") -> str:
         """在特定步骤成功时截图
-        
+
         Args:
             page: Playwright Page 对象
             step_name: 步骤名称（用于生成文件名）
             prefix: 文件名前缀，默认为 "success"
-            
+
         Returns:
             截图文件路径
         """
         try:
-            # 检查页面是否已关闭
-            if page.is_closed():
-                print(f"[ScreenshotHelper] 页面已关闭，无法截图")
-                return ""
-            
-            # 生成文件名：success_YYYYMMDD_HHMMSS_步骤名称.png
-            # 添加毫秒级时间戳，防止文件名重复
-            from datetime import datetime
-            now = datetime.now()
-            timestamp = now.strftime("%Y%m%d_%H%M%S")
-            milliseconds = now.microsecond // 1000  # 毫秒
-            timestamp_with_ms = f"{timestamp}_{milliseconds:03d}"
-            
+            # 生成文件名：success_YYYYMMDD_HHMMSS_mmm_步骤名称
             # 清理步骤名称，只保留安全字符
             safe_name = "".join(c for c in step_name[:30] if c.isalnum() or c in ('_', '-')).strip()
+            stem = f"{prefix}_{self._timestamp()}"
             if safe_name:
-                filename = f"{prefix}_{timestamp_with_ms}_{safe_name}.png"
-            else:
-                filename = f"{prefix}_{timestamp_with_ms}.png"
-            
-            filepath = self.screenshot_dir / filename
-            
-            # 截图 - 确保在正确的事件循环中执行
-            try:
-                await page.screenshot(path=str(filepath), full_page=True)
-                logger.info(f"[ScreenshotHelper] 成功截图已保存: {filepath}")
-                return str(filepath)
-            except RuntimeError as e:
-                if "different loop" in str(e):
-                    logger.warning(f"[ScreenshotHelper] 事件循环不匹配，无法截图: {e}")
-                    return ""
-                raise
+                stem = f"{stem}_{safe_name}"
+            return await self._capture(page, stem, self.mode, label="成功截图")
         except Exception as e:
             logger.error(f"[ScreenshotHelper] 保存成功截图失败: {e}")
             import traceback
             logger.error(traceback.format_exc())
             return ""
-    
-    async def take_screenshot(self, page: Page, filename: str = None) -> str:
+
+    async def take_screenshot(self, page: Page, filename: str = None, target=None) -> str:
         """通用截图方法
-        
+
         Args:
             page: Playwright Page 对象
             filename: 文件名（可选，如果不提供则自动生成，如果提供则会在文件名中添加时间戳）
-            
+            target: 只截取该元素（Locator，可选）
+
         Returns:
             截图文件路径
         """
         try:
-            # 添加毫秒级时间戳，防止文件名重复
-            from datetime import datetime
-            now = datetime.now()
-            timestamp = now.strftime("%Y%m%d_%H%M%S")
-            milliseconds = now.microsecond // 1000  # 毫秒
-            timestamp_with_ms = f"{timestamp}_{milliseconds:03d}"
-            
-            if filename is None:
-                filename = f"screenshot_{timestamp_with_ms}.png"
-            else:
+            timestamp_with_ms = self._timestamp()
+            stem = f"screenshot_{timestamp_with_ms}"
+            if filename is not None:
                 # 即使提供了自定义文件名，也要添加时间戳
-                # 清理文件名，移除扩展名（如果有）
+                # 移除扩展名（实际扩展名由配置的格式决定）
                 base_name = filename
-                if base_name.endswith('.png'):
-                    base_name = base_name[:-4]
+                for extension in ('.png', '.jpg', '.jpeg', '.webp'):
+                    if base_name.lower().endswith(extension):
+                        base_name = base_name[:-len(extension)]
+                        break
                 # 清理文件名，只保留安全字符
                 safe_name = "".join(c for c in base_name[:50] if c.isalnum() or c in ('_', '-', '，', '。')).strip()
                 if safe_name:
-                    filename = f"{safe_name}_{timestamp_with_ms}.png"
-                else:
-                    filename = f"screenshot_{timestamp_with_ms}.png"
-            
-            # 确保文件名以 .png 结尾
-            if not filename.endswith('.png'):
-                filename += '.png'
-            
-            filepath = self.screenshot_dir / filename
-            
-            # 检查页面是否已关闭
-            if page.is_closed():
-                logger.warning(f"[ScreenshotHelper] 页面已关闭，无法截图")
-                return ""
-            
-            # 截图 - 确保在正确的事件循环中执行
-            try:
-                await page.screenshot(path=str(filepath), full_page=True)
-                logger.info(f"[ScreenshotHelper] 截图已保存: {filepath}")
-                return str(filepath)
-            except RuntimeError as e:
-                if "different loop" in str(e):
-                    logger.warning(f"[ScreenshotHelper] 事件循环不匹配，无法截图: {e}")
-                    return ""
-                raise
+                    stem = f"{safe_name}_{timestamp_with_ms}"
+            mode = 'element' if target is not None else self.mode
+            return await self._capture(page, stem, mode, target=target)
         except Exception as e:
             logger.error(f"[ScreenshotHelper] 保存截图失败: {e}")
             import traceback
@@ -191,45 +402,63 @@ class ScreenshotHelper:
             return ""
 
 
-# 全局实例
-_screenshot_helper = ScreenshotHelper()
+# 全局实例（第一次截图时创建：导入模块时不读取配置、不创建目录、不打开产物存储）
+_screenshot_helper: Optional[ScreenshotHelper] = None
+_helper_lock = threading.Lock()
+
+
+def get_screenshot_helper() -> ScreenshotHelper:
+    """本进程共用的截图工具（第一次使用时创建）"""
+    global _screenshot_helper
+    with _helper_lock:
+        if _screenshot_helper is None:
+            _screenshot_helper = ScreenshotHelper()
+        return _screenshot_helper
+
+
+def screenshot_stats() -> Dict[str, Any]:
+    """便捷函数：本进程的截图统计（没有截过图时不创建截图工具）"""
+    if _screenshot_helper is None:
+        return {'count': 0, 'deduped': 0, 'avg_capture_ms': 0.0, 'max_capture_ms': 0.0,
+                'avg_encode_ms': 0.0, 'total_bytes': 0}
+    return _screenshot_helper.stats()
 
 
 async def take_error_screenshot(page: Page, error_message: str = "") -> str:
     """便捷函数：在发生错误时截图
-    
+
     Args:
         page: Playwright Page 对象
         error_message: 错误信息
-        
+
     Returns:
         截图文件路径
     """
-    return await _screenshot_helper.take_error_screenshot(page, error_message)
+    return await get_screenshot_helper().take_error_screenshot(page, error_message)
 
 
 async def take_success_screenshot(page: Page, step_name: str = "") -> str:
     """便捷函数：在特定步骤成功时截图
-    
+
     Args:
         page: Playwright Page 对象
         step_name: 步骤名称
-        
+
     Returns:
         截图文件路径
     """
-    return await _screenshot_helper.take_success_screenshot(page, step_name)
+    return await get_screenshot_helper().take_success_screenshot(page, step_name)
 
 
-async def take_screenshot(page: Page, filename: str = None) -> str:
+async def take_screenshot(page: Page, filename: str = None, target=None) -> str:
     """便捷函数：通用截图
-    
+
     Args:
         page: Playwright Page 对象
         filename: 文件名（可选）
-        
+        target: 只截取该元素（Locator，可选）
+
     Returns:
         截图文件路径
     """
-    return await _screenshot_helper.take_screenshot(page, filename)
-
+    return await get_screenshot_helper().take_screenshot(page, filename, target)
@@ -8,8 +8,11 @@
 from nicegui import ui
 from pathlib import Path
 from datetime import datetime
+import asyncio
 import yaml
 
+from core.artifact_store import ArtifactStore, run_retention
+
 # 可选依赖导入，如果缺失则功能不可用
 try:
     from core.test_scheduler import TestScheduler
@@ -68,18 +71,13 @@ class AdvancedFeaturesPanel:
         self.element_lib = ElementLibrary() if ELEMENT_LIB_AVAILABLE else None
         self.plan_manager = TestPlanManager() if PLAN_MANAGER_AVAILABLE else None
         
-        # 初始化结果分析器（如果数据库可用）
+        # 初始化结果分析器（趋势查询只读取本地结果存储，不需要连接MySQL）
         self.result_analyzer = None
         if RESULT_ANALYZER_AVAILABLE:
             try:
-                db_client = DBClient()
-                db_client.connect()
-                self.result_analyzer = TestResultAnalyzer(db_client)
+                self.result_analyzer = TestResultAnalyzer()
             except:
-                try:
-                    self.result_analyzer = TestResultAnalyzer()
-                except:
-                    pass
+                pass
         
         # 执行配置（重试次数和超时时间）
         self.config_path = Path("config/settings.yaml")
@@ -146,6 +144,13 @@ class AdvancedFeaturesPanel:
                         icon='settings',
                         on_click=self.show_execution_config
                     ).style('min-height: 80px; font-size: 14px;')
+                    
+                    # 产物清理（截图、视频、报告的保留策略）
+                    ui.button(
+                        '产物清理',
+                        icon='cleaning_services',
+                        on_click=self.show_artifact_cleanup
+                    ).style('min-height: 80px; font-size: 14px;')
     
     def show_scheduler(self):
         """显示测试调度管理"""
@@ -737,11 +742,14 @@ class AdvancedFeaturesPanel:
         
         stats = self.result_analyzer.get_statistics(30)
         trend_data = self.result_analyzer.get_trend_data(30)
+        case_stats = self.result_analyzer.get_case_statistics(30)
+        flaky_cases = self.result_analyzer.get_flaky_cases(30)
+        regressions = self.result_analyzer.detect_regressions(30)
         
         with ui.dialog() as dialog, ui.card().style('width: 1000px; max-width: 95vw; max-height: 90vh; background: rgba(20, 30, 50, 0.95); border: 2px solid rgba(0, 150, 255, 0.5); border-radius: 16px; overflow: hidden; display: flex; flex-direction: column; box-sizing: border-box;'):
             with ui.column().classes('w-full').style('padding: 24px; overflow-y: auto; flex: 1; min-height: 0; box-sizing: border-box; width: 100%; max-width: 100%;'):
                 ui.label('测试结果趋势分析').classes('text-lg font-bold').style('color: #e0e6ed; margin-bottom: 12px;')
-                ui.label('分析历史测试结果，显示趋势统计。数据来源：test_results/ 目录和 reports/ 目录中的报告文件。').style('color: #90caf9; font-size: 12px; margin-bottom: 20px; word-break: break-word; overflow-wrap: break-word; white-space: normal; line-height: 1.6; width: 100%; max-width: 100%; box-sizing: border-box;')
+                ui.label('分析历史测试结果，显示趋势统计。数据来源：本地结果库 test_results/results.db（首次使用时自动导入 test_results/ 目录和 reports/ 目录中的历史数据）。').style('color: #90caf9; font-size: 12px; margin-bottom: 20px; word-break: break-word; overflow-wrap: break-word; white-space: normal; line-height: 1.6; width: 100%; max-width: 100%; box-sizing: border-box;')
                 
                 # 统计信息和刷新按钮区域
                 with ui.row().classes('w-full items-start justify-between').style('margin-bottom: 20px; flex-wrap: wrap; gap: 16px;'):
@@ -777,6 +785,10 @@ class AdvancedFeaturesPanel:
                                         ui.label(f"通过: {result.get('passed', 0)} | 失败: {result.get('failed', 0)} | 跳过: {result.get('skipped', 0)} | 通过率: {result.get('pass_rate', 0):.2f}%").style('color: #e0e6ed; font-size: 12px; word-break: break-word; overflow-wrap: break-word; white-space: normal;')
                                         if result.get('modules') and result['modules'] != 'unknown':
                                             ui.label(f"模块: {result['modules']}").style('color: #90caf9; font-size: 11px; word-break: break-word; overflow-wrap: break-word; white-space: normal;')
+                    
+                    # 用例分析：回归、不稳定用例、耗时最长的用例
+                    if case_stats:
+                        self._render_case_analysis(case_stats, flaky_cases, regressions)
                 else:
                     with ui.column().classes('w-full items-center').style('padding: 40px;'):
                         ui.label('暂无历史数据').style('color: #90caf9; text-align: center; margin-bottom: 16px;')
@@ -788,6 +800,46 @@ class AdvancedFeaturesPanel:
         dialog.open()
 
 
+    def _render_case_analysis(self, case_stats: list, flaky_cases: list, regressions: list):
+        """渲染用例级分析（回归、不稳定用例、耗时p50/p95）"""
+        ui.label('用例分析（最近30天）').style('color: #e0e6ed; font-size: 14px; font-weight: 500; margin-top: 16px; margin-bottom: 12px;')
+        
+        def short_name(nodeid: str) -> str:
+            # 只显示 文件::类::方法 中的文件名和方法名
+            parts = nodeid.split('::')
+            return f"{parts[0].split('/')[-1]}::{parts[-1]}" if len(parts) > 1 else nodeid
+        
+        card_style = 'background: rgba(10, 22, 40, 0.6); border: 1px solid rgba(0, 150, 255, 0.3); padding: 12px; border-radius: 8px; box-shadow: none; box-sizing: border-box; width: 100%; max-width: 100%; overflow: hidden;'
+        text_style = 'color: #e0e6ed; font-size: 12px; word-break: break-word; overflow-wrap: break-word; white-space: normal;'
+        
+        regression_labels = {'new_failure': '新增失败', 'new_error_signature': '新错误类型', 'slowdown': '耗时变长'}
+        with ui.card().classes('w-full').style(card_style):
+            ui.label(f'回归检测（{len(regressions)}）').style('color: #ff6b6b; font-size: 13px; font-weight: 500; margin-bottom: 6px;')
+            if regressions:
+                for item in regressions[:10]:
+                    ui.label(f"[{regression_labels.get(item['type'], item['type'])}] {short_name(item['nodeid'])}：{item['detail']}").style(text_style)
+            else:
+                ui.label('最近一次执行没有发现回归').style('color: #90caf9; font-size: 12px;')
+        
+        with ui.card().classes('w-full').style(card_style):
+            ui.label(f'不稳定用例（{len(flaky_cases)}）').style('color: #ffb74d; font-size: 13px; font-weight: 500; margin-bottom: 6px;')
+            if flaky_cases:
+                for case in flaky_cases[:10]:
+                    ui.label(
+                        f"{short_name(case['nodeid'])} | 不稳定率: {case['flake_rate']:.1f}% | "
+                        f"执行 {case['runs']} 次，重试后通过 {case['flaky_runs']} 次，结果切换 {case['flips']} 次"
+                    ).style(text_style)
+            else:
+                ui.label('暂无不稳定用例（至少执行3次才会统计）').style('color: #90caf9; font-size: 12px;')
+        
+        with ui.card().classes('w-full').style(card_style):
+            ui.label('耗时最长的用例（按p95）').style('color: #90caf9; font-size: 13px; font-weight: 500; margin-bottom: 6px;')
+            for case in case_stats[:10]:
+                ui.label(
+                    f"{short_name(case['nodeid'])} | p50: {case['p50']:.2f}秒 | p95: {case['p95']:.2f}秒 | "
+                    f"通过率: {case['pass_rate']:.1f}%（{case['runs']} 次）"
+                ).style(text_style)
+    
     def _refresh_trend_data(self, dialog):
         """刷新趋势数据"""
         if not self.result_analyzer:
@@ -901,6 +953,67 @@ class AdvancedFeaturesPanel:
         
         dialog.open()
     
+    def _load_artifacts_config(self) -> dict:
+        """读取产物存储配置（artifacts）"""
+        if not self.config_path.exists():
+            return {}
+        with open(self.config_path, 'r', encoding='utf-8') as f:
+            return (yaml.safe_load(f) or {}).get('artifacts', {}) or {}
+    
+    @staticmethod
+    def _directory_size(directory: str) -> int:
+        """目录下所有文件的总大小"""
+        root = Path(directory)
+        if not root.exists():
+            return 0
+        return sum(path.stat().st_size for path in root.rglob('*') if path.is_file())
+    
+    def show_artifact_cleanup(self):
+        """显示产物占用和保留策略，可立即执行一次清理"""
+        config = self._load_artifacts_config()
+        retention = config.get('retention', {}) or {}
+        
+        with ui.dialog() as dialog, ui.card().style('width: 700px; max-width: 95vw; max-height: 90vh; background: rgba(20, 30, 50, 0.95); border: 2px solid rgba(0, 150, 255, 0.5); border-radius: 16px; overflow: hidden; display: flex; flex-direction: column; box-sizing: border-box;'):
+            with ui.column().classes('w-full').style('padding: 24px; overflow-y: auto; flex: 1; min-height: 0; box-sizing: border-box; width: 100%; max-width: 100%;'):
+                ui.label('产物清理').classes('text-lg font-bold').style('color: #e0e6ed; margin-bottom: 20px;')
+                
+                ui.label(
+                    f"保留策略：通过用例 {retention.get('max_age_days', 14)} 天，失败用例 {retention.get('failed_max_age_days', 60)} 天，"
+                    f"截图存储上限 {retention.get('max_total_mb', 2048)}MB，"
+                    f"每 {retention.get('schedule_hours', 0) or '-'} 小时自动清理"
+                ).style('color: #90caf9; font-size: 12px; margin-bottom: 12px;')
+                
+                usage_column = ui.column().classes('w-full').style('gap: 6px;')
+                
+                def render_usage():
+                    usage_column.clear()
+                    with usage_column:
+                        if config.get('enabled', True):
+                            usage = ArtifactStore(config.get('dir', 'artifacts')).usage()
+                            ui.label(
+                                f"截图存储（{config.get('dir', 'artifacts')}）：{usage['blobs']} 个文件 / {usage['size'] / 1024 / 1024:.1f}MB，"
+                                f"共 {usage['artifacts']} 条截图记录（去重节省 {usage['artifacts'] - usage['blobs']} 个文件）"
+                            ).style('color: #e0e6ed; font-size: 13px;')
+                        for directory, max_total_mb in (retention.get('directories') or {}).items():
+                            size = self._directory_size(directory)
+                            ui.label(f"{directory}：{size / 1024 / 1024:.1f}MB（上限 {max_total_mb}MB）").style('color: #e0e6ed; font-size: 13px;')
+                
+                render_usage()
+                
+                async def cleanup_now():
+                    # 清理涉及大量文件操作，在线程池中执行，不阻塞界面
+                    results = await asyncio.get_running_loop().run_in_executor(None, run_retention, str(self.config_path))
+                    removed = sum(item['removed_files'] for item in results.values())
+                    freed = sum(item['freed_bytes'] for item in results.values())
+                    ui.notify(f'清理完成：删除 {removed} 个文件，释放 {freed / 1024 / 1024:.1f}MB', type='positive')
+                    render_usage()
+                
+                with ui.row().classes('w-full justify-end').style('margin-top: 20px; gap: 12px;'):
+                    ui.button('关闭', on_click=dialog.close, icon='close').style('min-height: 36px;')
+                    ui.button('立即清理', on_click=cleanup_now, icon='delete_sweep', color='primary').style('min-height: 36px;')
+        
+        dialog.open()
+    
     def get_retry_count(self):
         """获取重试次数"""
         return self.retry_count
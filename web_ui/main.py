@@ -9,6 +9,7 @@ import subprocess
 import threading
 import os
 import re
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 from nicegui import ui, app
@@ -17,6 +18,14 @@ from web_ui.components.notification_config import NotificationConfig
 from web_ui.components.login_config import LoginConfig
 from web_ui.components.advanced_features import AdvancedFeaturesPanel
 from core.notification import NotificationService
+from utils.result_stream import load_result_stream, RESULT_STREAM_ENV
+from utils.progress_channel import ProgressServer, PROGRESS_PORT_ENV
+from utils.duration_scheduler import DurationScheduler
+from utils.report_catalog import ReportCatalog
+from core.har_archive import HarArchive, HAR_MODE_ENV
+from core.trace_recorder import TraceRecorder, TRACE_MODE_ENV
+from core.video_recorder import VideoRecorder, VIDEO_ENV
+from core.action_tracer import load_traces
 import yaml
 
 
@@ -31,11 +40,19 @@ class WebUIController:
         self.advanced_features = AdvancedFeaturesPanel()
         self.is_running = False
         self.current_process = None
-        self.log_content = []
         self.max_log_lines = 1000
+        # 日志缓冲区：deque限定长度，追加和淘汰都是O(1)
+        self.log_content = deque(maxlen=self.max_log_lines)
+        # 待推送到界面的日志行：后台线程只追加，由界面定时器批量推送
+        self._pending_log_lines = deque()
+        # 进度通道：pytest进程通过UDP实时上报收集总数、当前用例和结果
+        self.progress_server = ProgressServer()
+        self._progress_version = -1
         self.test_duration = 0
         self.test_output = []
         self.current_report_path = None
+        # 报告索引：执行结束时登记报告，报告列表分页查询索引
+        self.report_catalog = ReportCatalog("reports")
         
     def render(self):
         """渲染主界面"""
@@ -776,8 +793,9 @@ class WebUIController:
                     # 状态显示在左侧（限制宽度防止溢出）
                     with ui.column().classes('items-start').style('flex: 0 0 auto; min-width: 80px; max-width: 120px; overflow: hidden;'):
                         self.status_label = ui.label('状态: 就绪').classes('status-ready').style('font-size: 12px; margin: 0; padding: 0; line-height: 1.2; white-space: nowrap; overflow: hidden; text-overflow: ellipsis;')
-                        self.progress_bar = ui.linear_progress(0).classes('w-full mt-1').style('height: 3px; width: 100px; max-width: 100px;')
+                        self.progress_bar = ui.linear_progress(0, show_value=False).classes('w-full mt-1').style('height: 3px; width: 100px; max-width: 100px;')
                         self.progress_bar.set_visibility(False)
+                        self.progress_detail_label = ui.label('').style('font-size: 10px; color: #8b95a5; margin: 0; padding: 0; line-height: 1.2; max-width: 120px; white-space: nowrap; overflow: hidden; text-overflow: ellipsis;')
                     
                     # 执行按钮在中间（压缩尺寸，限制宽度）
                     with ui.row().classes('gap-2').style('flex: 0 0 auto; display: flex; overflow: hidden;'):
@@ -799,7 +817,32 @@ class WebUIController:
                     with ui.row().classes('gap-3').style('flex: 0 0 auto; display: flex; align-items: center; flex-wrap: nowrap; overflow: hidden;'):
                         self.headless_checkbox = ui.checkbox('无头模式', value=False).style('font-size: 12px; flex-shrink: 0;')
                         self.verbose_checkbox = ui.checkbox('详细输出', value=True).style('font-size: 12px; flex-shrink: 0;')
-                        self.video_recording_checkbox = ui.checkbox('视频录制', value=False).style('font-size: 12px; flex-shrink: 0;')
+                        self.video_recording_checkbox = ui.checkbox('视频录制', value=VideoRecorder().enabled).style('font-size: 12px; flex-shrink: 0;')
+                        
+                        # 并行进程数（pytest-xdist，按模块/测试类分组分发，同一测试类的用例在同一进程中执行）
+                        default_workers = os.environ.get('PYTEST_WORKERS', '1')
+                        worker_options = {'1': '串行', '2': '2进程', '4': '4进程', 'auto': '自动'}
+                        if default_workers not in worker_options:
+                            worker_options[default_workers] = f'{default_workers}进程'
+                        self.workers_select = ui.select(
+                            worker_options,
+                            value=default_workers,
+                            label='并行'
+                        ).style('font-size: 12px; min-width: 80px; flex-shrink: 0;').props('dense')
+                        
+                        # 网络模式：实时访问 / 录制HAR / 从HAR回放（离线执行已录制的流程）
+                        self.har_mode_select = ui.select(
+                            {'off': '实时', 'record': '录制HAR', 'replay': 'HAR回放'},
+                            value=HarArchive().mode,
+                            label='网络'
+                        ).style('font-size: 12px; min-width: 80px; flex-shrink: 0;').props('dense')
+                        
+                        # Playwright追踪：不录制 / 全部保留 / 只保留失败 / 只在第一次重试时录制
+                        self.trace_mode_select = ui.select(
+                            {'off': '关闭', 'on': '全部', 'retain-on-failure': '仅失败', 'on-first-retry': '首次重试'},
+                            value=TraceRecorder().mode,
+                            label='追踪'
+                        ).style('font-size: 12px; min-width: 90px; flex-shrink: 0;').props('dense')
                         
                         # 测试报告按钮（放在执行选项同一行）
                         ui.button(
@@ -837,13 +880,16 @@ class WebUIController:
                 # - height: 固定高度，不受其他模块影响（使用calc计算，减去标题和按钮的高度）
                 # - padding: 日志内边距（10px可改为8px、12px等，减少可显示更多内容）
                 # - width: 确保100%宽度，使用calc减去可能的边距
-                self.log_area = ui.log().classes('w-full log-area').style('flex: 1; min-height: 400px; height: calc(100% - 80px); max-height: none; overflow-y: auto; width: 100%; max-width: 100%; box-sizing: border-box; margin: 0;')
+                self.log_area = ui.log(max_lines=self.max_log_lines).classes('w-full log-area').style('flex: 1; min-height: 400px; height: calc(100% - 80px); max-height: none; overflow-y: auto; width: 100%; max-width: 100%; box-sizing: border-box; margin: 0;')
                 
                 # 【可调整参数】日志控制按钮样式（压缩，固定位置，不受其他模块影响）
                 # - margin-top: 按钮顶部间距（mt-2可改为mt-1、mt-3等，减少可增大日志区域）
                 with ui.row().classes('w-full mt-2').style('flex-shrink: 0;'):
                     ui.button('清空日志', on_click=self.clear_log, icon='clear').classes('mr-2').style('min-height: 32px; padding: 4px 12px; font-size: 12px;')
                     ui.button('导出日志', on_click=self.export_log, icon='download').style('min-height: 32px; padding: 4px 12px; font-size: 12px;')
+                
+                # 定时批量推送日志和进度，避免逐行推送导致界面线程负载随日志量增长
+                ui.timer(0.25, self._flush_ui_updates)
     
     def _render_recording_panel(self):
         """渲染录制面板"""
@@ -928,7 +974,17 @@ class WebUIController:
         self.start_btn.set_enabled(False)
         self.stop_btn.set_enabled(True)
         self.progress_bar.set_visibility(True)
-        self.progress_bar.value = 0.1
+        self.progress_bar.value = 0
+        self.progress_detail_label.text = ''
+        
+        # 启动进度通道（端口由系统分配，通过环境变量传给pytest进程）
+        self.progress_server.state.reset()
+        self._progress_version = -1
+        try:
+            os.environ[PROGRESS_PORT_ENV] = str(self.progress_server.start())
+        except OSError as e:
+            os.environ.pop(PROGRESS_PORT_ENV, None)
+            self.log(f'进度通道启动失败，仅显示日志输出: {e}')
         
         # 保存通知配置
         self.notification_config.save_config()
@@ -960,23 +1016,38 @@ class WebUIController:
         else:
             cmd_parts = ['pytest', '-v']
         
-        if self.headless_checkbox.value:
-            self._update_headless_config(True)
+        # 无头模式通过环境变量传递给本次执行，不改写settings.yaml（并行worker共享同一份配置）
+        os.environ['WEBUI_HEADLESS'] = '1' if self.headless_checkbox.value else '0'
         
         if self.verbose_checkbox.value:
             cmd_parts.append('-s')
         
         # 视频录制控制（通过环境变量传递）
         if self.video_recording_checkbox.value:
-            os.environ['ENABLE_VIDEO_RECORDING'] = '1'
+            os.environ[VIDEO_ENV] = '1'
         else:
-            os.environ['ENABLE_VIDEO_RECORDING'] = '0'
+            os.environ[VIDEO_ENV] = '0'
+        
+        # HAR录制/回放模式（通过环境变量传递，覆盖 playwright.har.mode）
+        har_mode = self.har_mode_select.value or 'off'
+        os.environ[HAR_MODE_ENV] = har_mode
+        if har_mode != 'off':
+            self.log(f"🌐 网络模式: {'录制HAR' if har_mode == 'record' else 'HAR回放'}")
+        
+        # Playwright追踪模式（通过环境变量传递，覆盖 playwright.tracing.mode）
+        trace_mode = self.trace_mode_select.value or 'off'
+        os.environ[TRACE_MODE_ENV] = trace_mode
+        if trace_mode != 'off':
+            self.log(f"🔍 Playwright追踪: {trace_mode}")
         
-        # 分布式/并行执行支持（如果启用）
-        # 可以通过环境变量或配置启用
-        parallel_workers = os.environ.get('PYTEST_WORKERS', '1')
+        # 分布式/并行执行（pytest-xdist）
+        # loadscope：同一模块/测试类的用例分到同一个worker，复用该worker的浏览器和登录态
+        # loadgroup：启用按耗时调度时，conftest按历史耗时把测试文件均衡分组（LPT），每个worker执行一组，同一文件不拆开
+        parallel_workers = str(self.workers_select.value or '1')
+        self.parallel_workers = parallel_workers
+        duration_scheduling = DurationScheduler.is_enabled()
         if parallel_workers != '1':
-            cmd_parts.extend(['-n', str(parallel_workers)])
+            cmd_parts.extend(['-n', parallel_workers, '--dist', 'loadgroup' if duration_scheduling else 'loadscope'])
         
         # 生成自定义中文HTML报告
         reports_dir = Path("reports")
@@ -996,8 +1067,7 @@ class WebUIController:
         cmd_parts.extend([
             '--tb=long',  # 使用long格式显示更详细的错误信息
             '--asyncio-mode=auto',
-            '--html', str(pytest_html_report),
-            '--self-contained-html',  # pytest-html报告（仅用于数据解析）
+            '--html', str(pytest_html_report),  # pytest-html报告（仅用于数据解析；截图按路径引用，不内嵌到HTML中）
             '--capture=sys',  # 捕获sys.stdout和sys.stderr，让pytest-html能捕获日志
             '--log-cli-level=INFO',  # 显示INFO级别的日志
             '--log-cli-format=%(message)s',  # 简化的日志格式，避免解析错误
@@ -1008,14 +1078,23 @@ class WebUIController:
         # 设置超时时间（通过环境变量传递给测试用例）
         os.environ['PYTEST_TIMEOUT'] = str(timeout_seconds)
         
+        # 结果流：conftest按测试阶段写入JSONL记录，报告和通知直接读取，无需解析输出
+        result_stream_path = reports_dir / f"results_{timestamp}.jsonl"
+        os.environ[RESULT_STREAM_ENV] = str(result_stream_path)
+        
         # 保存报告路径供后续使用（使用自定义中文报告）
         self.current_report_path = custom_html_report
         self.pytest_html_report_path = pytest_html_report
+        self.result_stream_path = result_stream_path
         
         # 先输出日志信息（在启动线程之前）
         self.log('开始执行测试...')
         self.log(f'执行模块: {", ".join(self.module_selector.get_selected_module_names())}')
         self.log(f'重试次数: {retry_count}, 超时时间: {timeout_seconds}秒')
+        if parallel_workers != '1':
+            self.log(f'并行执行: {parallel_workers} 个进程（截图、视频按worker分目录保存）')
+        if duration_scheduling and parallel_workers != '1':
+            self.log('按历史耗时调度: 测试文件按预计耗时均衡分配到各worker，耗时长的文件先执行')
         # 显示可读的命令格式（对于包含or的表达式，用引号包裹以便阅读）
         cmd_display = ' '.join(cmd_parts)
         if ' or ' in cmd_display:
@@ -1076,24 +1155,15 @@ class WebUIController:
                         # 如果还有编码问题，使用errors='replace'
                         log_line = line.encode('utf-8', errors='replace').decode('utf-8', errors='replace').strip()
                     
-                    # 只调用log()方法，它会自动添加到log_content中，避免重复
                     # 注意：log()方法会自动添加时间戳，所以直接传入log_line即可
                     if log_line:  # 只记录非空行
                         # 检查是否已经包含时间戳格式 [HH:MM:SS]，如果包含说明是pytest的输出，已经格式化过了
-                        # 这种情况下，pytest的输出会被logger捕获并输出，我们不应该再重复添加
-                        # 但是我们需要记录到log_content中以便导出
+                        # 这种情况下只记录到log_content以便导出，不推送到UI
                         if re.match(r'^\[\d{2}:\d{2}:\d{2}\]', log_line):
-                            # 已经包含时间戳，说明是pytest的输出，直接添加到log_content，不调用log()避免重复
-                            if log_line not in self.log_content:
-                                self.log_content.append(log_line)
-                                # 不推送到UI，因为pytest的输出已经通过logger输出了
+                            self.log_content.append(log_line)
                         else:
                             # 没有时间戳，调用log()方法添加（这会添加时间戳并推送到UI）
                             self.log(log_line)
-                        
-                        # 限制日志行数
-                        if len(self.log_content) > self.max_log_lines:
-                            self.log_content.pop(0)
             
             self.current_process.wait()
             
@@ -1103,7 +1173,7 @@ class WebUIController:
             
             # 保存执行时长和输出用于报告生成
             self.test_duration = duration
-            self.test_output = self.log_content.copy()
+            self.test_output = list(self.log_content)
             
             # 生成自定义中文HTML报告
             try:
@@ -1123,15 +1193,38 @@ class WebUIController:
                     'test_cases': []
                 }
                 
-                # 从pytest输出中解析
-                if self.test_output:
+                # 优先使用结果流（每个测试阶段一条结构化记录）
+                stream_stats = None
+                if getattr(self, 'result_stream_path', None):
+                    stream_stats = load_result_stream(str(self.result_stream_path))
+                if stream_stats:
+                    test_stats.update(stream_stats)
+                    test_stats['duration'] = duration
+                    self.log(f'从结果流读取到 {len(stream_stats["test_cases"])} 个测试用例结果')
+                    # 操作时间线（与结果流放在一起的追踪文件），报告中按用例绘制
+                    try:
+                        test_stats['traces'] = load_traces(str(self.result_stream_path))
+                    except Exception as e:
+                        self.log(f'⚠️ 读取操作时间线失败: {e}')
+                # 结果流不可用时，从pytest输出中解析（备用方案）
+                elif self.test_output:
                     parsed = parser.parse_pytest_output(self.test_output)
                     test_stats.update(parsed)
                 
                     # 优先从pytest输出中解析测试用例（不依赖HTML报告）
                     # 这样可以避免HTML解析失败的问题
                     test_cases_from_output = []
-                    if self.test_output:
+                    if getattr(self, 'parallel_workers', '1') != '1':
+                        # 并行执行：pytest-html报告由主进程汇总所有worker的结果生成，直接使用；
+                        # 报告不可用时再解析xdist输出（"[gw0] [ 50%] PASSED nodeid"，状态与用例在同一行）
+                        if self.pytest_html_report_path and self.pytest_html_report_path.exists():
+                            test_cases_from_output = parser.parse_test_cases_from_html(self.pytest_html_report_path)
+                        if not test_cases_from_output:
+                            test_cases_from_output = parser.parse_xdist_output(self.test_output)
+                        if test_cases_from_output:
+                            test_stats['test_cases'] = test_cases_from_output
+                            self.log(f'并行执行：汇总到 {len(test_cases_from_output)} 个测试用例结果')
+                    if self.test_output and not test_cases_from_output:
                         output_text = '\n'.join(self.test_output)
                         # 直接从pytest输出中解析测试用例
                         lines = output_text.split('\n')
@@ -1515,18 +1608,13 @@ class WebUIController:
                         modules=self.module_selector.get_selected_module_names()
                     )
                     self.log(f'自定义中文报告已生成: {self.current_report_path}')
+                self._register_reports(test_stats)
             except Exception as e:
                 error_msg = f'生成自定义报告失败: {e}'
                 self.log(error_msg)
                 import traceback
                 tb_str = traceback.format_exc()
                 self.log(tb_str)
-                # 确保异常信息也被添加到log_content中
-                if error_msg not in self.log_content:
-                    self.log_content.append(error_msg)
-                for line in tb_str.split('\n'):
-                    if line.strip() and line.strip() not in self.log_content:
-                        self.log_content.append(line.strip())
             
             # 执行完成（不在后台线程中使用UI操作，避免客户端断开连接问题）
             # ui.run_javascript('window.location.reload()')  # 已移除，避免客户端断开连接警告
@@ -1537,12 +1625,6 @@ class WebUIController:
                 import traceback
                 tb_str = traceback.format_exc()
                 self.log(tb_str)
-                # 确保异常信息也被添加到log_content中
-                if error_msg not in self.log_content:
-                    self.log_content.append(error_msg)
-                for line in tb_str.split('\n'):
-                    if line.strip() and line.strip() not in self.log_content:
-                        self.log_content.append(line.strip())
                 self.test_duration = 0
                 self.test_output = []
         finally:
@@ -1568,16 +1650,6 @@ class WebUIController:
             self.stop_btn.set_enabled(False)
             self.progress_bar.set_visibility(False)
     
-    def _update_headless_config(self, headless: bool):
-        """更新无头模式配置"""
-        config_path = Path("config/settings.yaml")
-        if config_path.exists():
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-            config['playwright']['headless'] = headless
-            with open(config_path, 'w', encoding='utf-8') as f:
-                yaml.dump(config, f, allow_unicode=True, default_flow_style=False)
-    
     def _update_mobile_config(self, enabled: bool):
         """更新移动端配置"""
         config_path = Path("config/settings.yaml")
@@ -1612,13 +1684,22 @@ class WebUIController:
                 'error_details': []
             }
             
+            # 优先使用结果流（结构化记录，不需要解析输出和HTML）
+            stream_stats = None
+            if getattr(self, 'result_stream_path', None):
+                stream_stats = load_result_stream(str(self.result_stream_path))
+            if stream_stats:
+                test_stats.update(stream_stats)
+                test_stats['duration'] = getattr(self, 'test_duration', 0) or stream_stats['duration']
+                test_stats['error_details'] = stream_stats['error_details'][:10]  # 最多10个
+            
             # 从pytest输出中解析统计信息
-            if hasattr(self, 'test_output') and self.test_output:
+            elif hasattr(self, 'test_output') and self.test_output:
                 parsed = parser.parse_pytest_output(self.test_output)
                 test_stats.update(parsed)
             
             # 如果pytest-html报告存在，优先从中解析（更准确）
-            if hasattr(self, 'pytest_html_report_path') and self.pytest_html_report_path and self.pytest_html_report_path.exists():
+            if not stream_stats and hasattr(self, 'pytest_html_report_path') and self.pytest_html_report_path and self.pytest_html_report_path.exists():
                 html_stats = parser.parse_html_report(self.pytest_html_report_path)
                 if html_stats:
                     # 优先使用pytest-html报告中的统计（更准确）
@@ -1649,7 +1730,8 @@ class WebUIController:
                 skipped=test_stats['skipped'],
                 duration=test_stats['duration'],
                 error_details=test_stats['error_details'],
-                html_report_path=report_path
+                html_report_path=report_path,
+                budget_violations=test_stats.get('budget_violations')
             )
             
             # 记录报告生成信息
@@ -1675,7 +1757,8 @@ class WebUIController:
                     failed=test_stats['failed'],
                     skipped=test_stats['skipped'],
                     duration=test_stats['duration'],
-                    report_path=str(report_path) if report_path else None
+                    report_path=str(report_path) if report_path else None,
+                    test_cases=test_stats.get('test_cases')
                 )
                 self.log('测试结果已保存到趋势分析器')
             except Exception as e:
@@ -1686,12 +1769,6 @@ class WebUIController:
             import traceback
             tb_str = traceback.format_exc()
             self.log(tb_str)
-            # 确保异常信息也被添加到log_content中
-            if error_msg not in self.log_content:
-                self.log_content.append(error_msg)
-            for line in tb_str.split('\n'):
-                if line.strip() and line.strip() not in self.log_content:
-                    self.log_content.append(line.strip())
     
     def show_tutorial_video(self):
         """显示教程视频对话框"""
@@ -2248,18 +2325,47 @@ class WebUIController:
             ui.notify(f'❌ 启动录制工具失败: {e}', type='negative')
     
     def log(self, message: str):
-        """添加日志"""
+        """添加日志（可在后台线程调用，由定时器批量推送到界面）"""
         timestamp = datetime.now().strftime("%H:%M:%S")
         log_message = f"[{timestamp}] {message}"
-        self.log_area.push(log_message)
-        # 确保日志也被添加到log_content中，以便导出
-        if log_message not in self.log_content:
-            self.log_content.append(log_message)
-        if len(self.log_content) > self.max_log_lines:
-            self.log_content.pop(0)
+        # 记录到log_content以便导出
+        self.log_content.append(log_message)
+        self._pending_log_lines.append(log_message)
+    
+    def _flush_ui_updates(self):
+        """定时器回调：批量推送待显示的日志，并根据进度通道更新进度条"""
+        if self._pending_log_lines:
+            batch = []
+            while self._pending_log_lines:
+                batch.append(self._pending_log_lines.popleft())
+            # 积压超过界面保留行数时，只推送最后的部分
+            self.log_area.push('\n'.join(batch[-self.max_log_lines:]))
+        
+        if not self.is_running:
+            return
+        progress = self.progress_server.state.snapshot()
+        if progress['version'] == self._progress_version:
+            return
+        self._progress_version = progress['version']
+        total = progress['total']
+        done = progress['done']
+        if total:
+            self.progress_bar.value = min(done / total, 1.0)
+            self.status_label.text = f'状态: 运行中 {done}/{total}'
+        failed = progress['failed'] + progress['error']
+        detail = f"✓{progress['passed']} ✗{failed}"
+        if progress['skipped']:
+            detail += f" ⊘{progress['skipped']}"
+        if progress['reruns']:
+            detail += f" ↻{progress['reruns']}"
+        if progress['current']:
+            # 只显示用例名，完整nodeid在日志中
+            detail += f" {progress['current'].split('::')[-1]}"
+        self.progress_detail_label.text = detail
     
     def clear_log(self):
         """清空日志"""
+        self._pending_log_lines.clear()
         self.log_area.clear()
         self.log_content.clear()
     
@@ -2277,19 +2383,31 @@ class WebUIController:
         
         ui.notify(f'日志已导出到: {log_file}', type='positive')
 
+    def _register_reports(self, test_stats: dict):
+        """把本次执行生成的报告登记到报告索引
+
+        Args:
+            test_stats: 本次执行的用例统计
+        """
+        modules = '、'.join(self.module_selector.get_selected_module_names() or [])
+        for report_path in (getattr(self, 'current_report_path', None), getattr(self, 'pytest_html_report_path', None)):
+            if not report_path:
+                continue
+            try:
+                self.report_catalog.add(report_path, stats=test_stats, modules=modules)
+            except Exception as e:
+                self.log(f'登记报告索引失败 {report_path}: {e}')
+
     def show_test_reports(self):
-        """显示测试报告列表弹窗"""
-        reports_dir = Path("reports")
-        reports_dir.mkdir(exist_ok=True)
-        
-        # 获取所有HTML报告文件，按时间倒序排列
-        # 支持两种报告类型：WebUI自动化测试报告_*.html 和 pytest自动化测试报告_*.html
-        html_reports = sorted(
-            list(reports_dir.glob("WebUI自动化测试报告_*.html")) + list(reports_dir.glob("pytest自动化测试报告_*.html")),
-            key=lambda p: p.stat().st_mtime,
-            reverse=True
-        )
-        
+        """显示测试报告列表弹窗（分页、排序和筛选都在报告索引中查询，不扫描报告目录）"""
+        page_size = 20
+        state = {'page': 1, 'keyword': '', 'kind': 'all', 'outcome': 'all', 'sort_by': 'created_at', 'descending': True}
+        sort_options = {
+            'created_at': '执行时间', 'pass_rate': '通过率', 'failed': '失败数',
+            'duration': '耗时', 'size': '文件大小', 'total': '用例数'
+        }
+        kind_labels = {'webui': '📊 WebUI报告', 'pytest': '🔧 pytest报告'}
+
         # 添加滚动条样式
         ui.add_head_html('''
         <style>
@@ -2315,115 +2433,122 @@ class WebUIController:
             }
         </style>
         ''')
-        
-        # 存储报告列表容器，用于动态更新
-        report_list_container = None
-        
+
+        def render_report(report: dict):
+            """渲染一条报告"""
+            report_file = self.report_catalog.path_of(report['path'])
+            file_time = report['created_at'].replace('T', ' ')
+            report_type = kind_labels.get(report['kind'], '📄 其他报告')
+            with ui.card().classes('w-full').style('background: rgba(10, 22, 40, 0.6); border: 1px solid rgba(0, 150, 255, 0.3); padding: 16px; transition: all 0.3s;'):
+                with ui.row().classes('w-full items-center justify-between'):
+                    with ui.column().classes('flex-1').style('min-width: 0;'):
+                        with ui.row().classes('gap-2 items-center').style('margin-bottom: 4px;'):
+                            ui.label(report_type).style('color: #4fc3f7; font-size: 11px; padding: 2px 8px; background: rgba(0, 150, 255, 0.2); border-radius: 4px;')
+                            ui.label(report_file.name).style('color: #e0e6ed; font-size: 14px; font-weight: 500;')
+                        with ui.row().classes('gap-4').style('font-size: 12px;'):
+                            ui.label(f'📅 {file_time}').style('color: #90caf9;')
+                            ui.label(f'📦 {(report["size"] or 0) / 1024:.1f} KB').style('color: #90caf9;')
+                            if report['total'] is not None:
+                                failed_color = '#ff5252' if report['failed'] else '#90caf9'
+                                ui.label(f'✅ {report["passed"]}/{report["total"]}').style('color: #90caf9;')
+                                ui.label(f'❌ {report["failed"]}').style(f'color: {failed_color};')
+                                ui.label(f'⏱ {report["duration"] or 0:.1f}s').style('color: #90caf9;')
+                            if report['modules']:
+                                ui.label(f'🧩 {report["modules"]}').style('color: #b0c4de;')
+
+                    with ui.row().classes('gap-2'):
+                        ui.button('打开', icon='open_in_new', on_click=lambda rf=report_file: self._open_report(rf, refresh_report_list)).style('min-height: 32px; padding: 4px 12px; font-size: 12px;')
+                        ui.button('删除', icon='delete', color='red', on_click=lambda rf=report_file: self._delete_report(rf, refresh_report_list)).style('min-height: 32px; padding: 4px 12px; font-size: 12px;')
+
         def refresh_report_list():
-            """刷新报告列表"""
-            nonlocal html_reports
-            # 重新获取报告列表
-            html_reports = sorted(
-                list(reports_dir.glob("WebUI自动化测试报告_*.html")) + list(reports_dir.glob("pytest自动化测试报告_*.html")),
-                key=lambda p: p.stat().st_mtime,
-                reverse=True
+            """按当前页码和筛选条件查询索引并刷新列表"""
+            reports, total = self.report_catalog.query(
+                page=state['page'],
+                page_size=page_size,
+                sort_by=state['sort_by'],
+                descending=state['descending'],
+                keyword=state['keyword'].strip(),
+                kind=None if state['kind'] == 'all' else state['kind'],
+                outcome=None if state['outcome'] == 'all' else state['outcome']
             )
-            
-            # 清空并重新填充列表
-            if report_list_container:
-                report_list_container.clear()
-                with report_list_container:
-                    if not html_reports:
-                        with ui.column().classes('w-full items-center').style('padding: 40px;'):
-                            ui.icon('description', size=64).style('color: #90caf9; opacity: 0.5; margin-bottom: 16px;')
-                            ui.label('暂无测试报告').style('color: #90caf9; font-size: 16px; margin-bottom: 8px;')
-                            ui.label('执行测试后会自动生成报告').style('color: #b0c4de; font-size: 12px;')
-                    else:
-                        for report_file in html_reports:
-                            # 获取文件信息
-                            file_stat = report_file.stat()
-                            file_size = file_stat.st_size / 1024  # KB
-                            file_time = datetime.fromtimestamp(file_stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
-                            
-                            # 判断报告类型
-                            if "WebUI自动化测试报告" in report_file.name:
-                                report_type = "📊 WebUI报告"
-                            elif "pytest自动化测试报告" in report_file.name or "pytest_report" in report_file.name:
-                                report_type = "🔧 pytest报告"
-                            else:
-                                report_type = "📄 其他报告"
-                            
-                            with ui.card().classes('w-full').style('background: rgba(10, 22, 40, 0.6); border: 1px solid rgba(0, 150, 255, 0.3); padding: 16px; transition: all 0.3s;'):
-                                with ui.row().classes('w-full items-center justify-between'):
-                                    with ui.column().classes('flex-1').style('min-width: 0;'):
-                                        with ui.row().classes('gap-2 items-center').style('margin-bottom: 4px;'):
-                                            ui.label(report_type).style('color: #4fc3f7; font-size: 11px; padding: 2px 8px; background: rgba(0, 150, 255, 0.2); border-radius: 4px;')
-                                            ui.label(report_file.name).style('color: #e0e6ed; font-size: 14px; font-weight: 500;')
-                                        with ui.row().classes('gap-4').style('font-size: 12px;'):
-                                            ui.label(f'📅 {file_time}').style('color: #90caf9;')
-                                            ui.label(f'📦 {file_size:.1f} KB').style('color: #90caf9;')
-                                    
-                                    with ui.row().classes('gap-2'):
-                                        ui.button('打开', icon='open_in_new', on_click=lambda rf=report_file: self._open_report(rf)).style('min-height: 32px; padding: 4px 12px; font-size: 12px;')
-                                        ui.button('删除', icon='delete', color='red', on_click=lambda rf=report_file: self._delete_report(rf, refresh_report_list)).style('min-height: 32px; padding: 4px 12px; font-size: 12px;')
-        
-        with ui.dialog() as dialog, ui.card().style('width: 1000px; max-width: 95vw; max-height: 90vh; background: rgba(20, 30, 50, 0.95); border: 2px solid rgba(0, 150, 255, 0.5);'):
-            with ui.column().classes('w-full').style('padding: 24px; display: flex; flex-direction: column; max-height: 90vh;'):
-                ui.label('📊 测试报告列表').classes('text-lg font-bold').style('color: #e0e6ed; margin-bottom: 20px;')
-                
-                if not html_reports:
-                    # 没有报告时显示提示
+            page_count = max((total + page_size - 1) // page_size, 1)
+            if state['page'] > page_count:
+                # 删除最后一页的最后一条报告后回到上一页
+                state['page'] = page_count
+                refresh_report_list()
+                return
+            summary_label.text = f'共 {total} 个测试报告，第 {state["page"]}/{page_count} 页'
+            pagination.max = page_count
+            pagination.value = state['page']
+            report_list_container.clear()
+            with report_list_container:
+                if not reports:
                     with ui.column().classes('w-full items-center').style('padding: 40px;'):
                         ui.icon('description', size=64).style('color: #90caf9; opacity: 0.5; margin-bottom: 16px;')
                         ui.label('暂无测试报告').style('color: #90caf9; font-size: 16px; margin-bottom: 8px;')
                         ui.label('执行测试后会自动生成报告').style('color: #b0c4de; font-size: 12px;')
-                else:
-                    # 显示报告列表
-                    ui.label(f'共找到 {len(html_reports)} 个测试报告（按时间倒序）').style('color: #90caf9; font-size: 12px; margin-bottom: 16px;')
-                    
-                    # 报告列表容器（可滚动）
-                    with ui.column().classes('w-full report-list-container').style('flex: 1; min-height: 0; gap: 12px;') as container:
-                        report_list_container = container
-                        for report_file in html_reports:
-                            # 获取文件信息
-                            file_stat = report_file.stat()
-                            file_size = file_stat.st_size / 1024  # KB
-                            file_time = datetime.fromtimestamp(file_stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
-                            
-                            # 判断报告类型
-                            if "WebUI自动化测试报告" in report_file.name:
-                                report_type = "📊 WebUI报告"
-                            elif "pytest自动化测试报告" in report_file.name or "pytest_report" in report_file.name:
-                                report_type = "🔧 pytest报告"
-                            else:
-                                report_type = "📄 其他报告"
-                            
-                            with ui.card().classes('w-full').style('background: rgba(10, 22, 40, 0.6); border: 1px solid rgba(0, 150, 255, 0.3); padding: 16px; transition: all 0.3s;'):
-                                with ui.row().classes('w-full items-center justify-between'):
-                                    with ui.column().classes('flex-1').style('min-width: 0;'):
-                                        with ui.row().classes('gap-2 items-center').style('margin-bottom: 4px;'):
-                                            ui.label(report_type).style('color: #4fc3f7; font-size: 11px; padding: 2px 8px; background: rgba(0, 150, 255, 0.2); border-radius: 4px;')
-                                            ui.label(report_file.name).style('color: #e0e6ed; font-size: 14px; font-weight: 500;')
-                                        with ui.row().classes('gap-4').style('font-size: 12px;'):
-                                            ui.label(f'📅 {file_time}').style('color: #90caf9;')
-                                            ui.label(f'📦 {file_size:.1f} KB').style('color: #90caf9;')
-                                    
-                                    with ui.row().classes('gap-2'):
-                                        ui.button('打开', icon='open_in_new', on_click=lambda rf=report_file: self._open_report(rf)).style('min-height: 32px; padding: 4px 12px; font-size: 12px;')
-                                        ui.button('删除', icon='delete', color='red', on_click=lambda rf=report_file: self._delete_report(rf, refresh_report_list)).style('min-height: 32px; padding: 4px 12px; font-size: 12px;')
-                
+                for report in reports:
+                    render_report(report)
+
+        def apply_filter(key: str, value):
+            """修改筛选/排序条件后回到第一页"""
+            state[key] = value
+            state['page'] = 1
+            refresh_report_list()
+
+        def change_page(value):
+            if value and value != state['page']:
+                state['page'] = value
+                refresh_report_list()
+
+        def rebuild_catalog():
+            count = self.report_catalog.rebuild()
+            ui.notify(f'报告索引已重建，共 {count} 个报告', type='positive')
+            state['page'] = 1
+            refresh_report_list()
+
+        with ui.dialog() as dialog, ui.card().style('width: 1000px; max-width: 95vw; max-height: 90vh; background: rgba(20, 30, 50, 0.95); border: 2px solid rgba(0, 150, 255, 0.5);'):
+            with ui.column().classes('w-full').style('padding: 24px; display: flex; flex-direction: column; max-height: 90vh;'):
+                ui.label('📊 测试报告列表').classes('text-lg font-bold').style('color: #e0e6ed; margin-bottom: 20px;')
+
+                # 搜索、筛选和排序
+                with ui.row().classes('w-full items-center gap-3').style('margin-bottom: 12px; flex-wrap: wrap;'):
+                    ui.input('搜索文件名/模块', on_change=lambda e: apply_filter('keyword', e.value or '')) \
+                        .props('dense clearable debounce=300').style('min-width: 200px;')
+                    ui.select({'all': '全部类型', 'webui': 'WebUI报告', 'pytest': 'pytest报告'}, value='all',
+                              on_change=lambda e: apply_filter('kind', e.value)).props('dense').style('min-width: 120px;')
+                    ui.select({'all': '全部结果', 'failed': '有失败', 'passed': '全部通过'}, value='all',
+                              on_change=lambda e: apply_filter('outcome', e.value)).props('dense').style('min-width: 110px;')
+                    ui.select(sort_options, value='created_at', label='排序',
+                              on_change=lambda e: apply_filter('sort_by', e.value)).props('dense').style('min-width: 110px;')
+                    ui.select({'desc': '降序', 'asc': '升序'}, value='desc',
+                              on_change=lambda e: apply_filter('descending', e.value == 'desc')).props('dense').style('min-width: 80px;')
+
+                summary_label = ui.label('').style('color: #90caf9; font-size: 12px; margin-bottom: 16px;')
+
+                # 报告列表容器（可滚动）
+                report_list_container = ui.column().classes('w-full report-list-container').style('flex: 1; min-height: 0; gap: 12px;')
+
+                with ui.row().classes('w-full justify-center').style('margin-top: 12px;'):
+                    pagination = ui.pagination(1, 1, direction_links=True, value=1,
+                                               on_change=lambda e: change_page(e.value))
+
                 # 底部操作按钮
                 with ui.row().classes('w-full justify-between').style('margin-top: 20px; padding-top: 16px; border-top: 1px solid rgba(0, 150, 255, 0.2); flex-shrink: 0;'):
-                    ui.button('打开报告目录', icon='folder_open', on_click=lambda: self._open_reports_folder()).style('min-height: 36px; padding: 6px 16px; font-size: 12px;')
+                    with ui.row().classes('gap-2'):
+                        ui.button('打开报告目录', icon='folder_open', on_click=lambda: self._open_reports_folder()).style('min-height: 36px; padding: 6px 16px; font-size: 12px;')
+                        ui.button('重建索引', icon='sync', on_click=rebuild_catalog).style('min-height: 36px; padding: 6px 16px; font-size: 12px;')
                     ui.button('关闭', on_click=dialog.close, icon='close').style('min-height: 36px; padding: 6px 20px; font-size: 12px;')
-        
+
+        refresh_report_list()
         dialog.open()
     
-    def _open_report(self, report_file: Path):
+    def _open_report(self, report_file: Path, refresh_callback=None):
         """打开测试报告
         
         Args:
             report_file: 报告文件路径
+            refresh_callback: 刷新列表的回调函数（报告文件已被手动删除时从索引中移除并刷新）
         """
         try:
             import webbrowser
@@ -2431,6 +2556,9 @@ class WebUIController:
             
             if not report_file.exists():
                 ui.notify(f'报告文件不存在: {report_file.name}', type='negative')
+                self.report_catalog.remove(report_file)
+                if refresh_callback:
+                    refresh_callback()
                 return
             
             # 使用绝对路径打开文件
@@ -2452,6 +2580,11 @@ class WebUIController:
         """
         try:
             report_file.unlink()
+            # 自定义报告的用例明细数据文件一并删除
+            data_file = report_file.with_name(f"{report_file.stem}.data.js")
+            if data_file.exists():
+                data_file.unlink()
+            self.report_catalog.remove(report_file)
             ui.notify(f'已删除报告: {report_file.name}', type='positive')
             # 调用刷新回调，不关闭弹窗
             if refresh_callback: